@@ -0,0 +1,196 @@
+import json
+import os
+import sqlite3
+from time import monotonic
+
+from piidigger import __version__
+
+
+def getFingerprint(dataHandlers: list, startDirs: list) -> str:
+    '''Identifies the scan that a checkpoint belongs to.  A scan can only be resumed with the same settings.'''
+
+    return json.dumps({'version': __version__, 'dataHandlers': sorted(dataHandlers), 'startDirs': sorted(startDirs)})
+
+
+class Checkpoint:
+    '''
+    Records the progress of a scan so that it can be resumed with --resume after the scan was interrupted.
+
+    The discoveryWorkers record every directory that has been listed, along with the subdirectories and files found in it.  The
+    resultsCollector records every file that has been completely scanned, along with its results.  Anything in between -- directories
+    found but not yet listed and files found but not yet scanned -- is the work that's left when the scan is resumed.
+
+    Changes are written in one transaction every interval seconds, so an interruption loses at most that much progress.  A directory
+    and everything found in it are always written together.
+    '''
+
+    _FILESTABLE = 'CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, dir TEXT, done INTEGER, matches TEXT, truncated TEXT)'
+
+    def __init__(self, dbFile: str, interval: int = 60, logger = None):
+        self.dbFile = dbFile
+        self.interval = interval
+        self.logger = logger
+        self.lastSave = monotonic()
+        self.dirsDone: list = []
+        self.dirsFound: list = []
+        self.filesFound: list = []
+        self.filesDone: list = []
+        self.db = None
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(dbFile)), exist_ok=True)
+            self.db = sqlite3.connect(dbFile, timeout=30)
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self.db.execute('CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, done INTEGER)')
+            self.db.execute(self._FILESTABLE)
+            self.db.commit()
+        except (OSError, sqlite3.Error) as e:
+            self._dbError(e)
+
+    def reset(self, fingerprint: str, startDirs: list):
+        '''Starts a new checkpoint for a new scan'''
+
+        self.dirsDone = []
+        self.dirsFound = []
+        self.filesFound = []
+        self.filesDone = []
+        if self.db is None:
+            return
+        try:
+            with self.db:
+                self.db.execute('DELETE FROM dirs')
+                # Dropped rather than emptied, as a checkpoint from another version might not have the same columns
+                self.db.execute('DROP TABLE IF EXISTS files')
+                self.db.execute(self._FILESTABLE)
+                self.db.execute('DELETE FROM meta')
+                self.db.execute("INSERT INTO meta (key, value) VALUES ('fingerprint', ?)", (fingerprint,))
+                self.db.executemany('INSERT OR IGNORE INTO dirs (path, done) VALUES (?, 0)', [(str(d),) for d in startDirs])
+        except sqlite3.Error as e:
+            self._dbError(e)
+
+    def getFingerprint(self) -> str:
+        return self._getMeta('fingerprint')
+
+    def isComplete(self) -> bool:
+        return self._getMeta('complete') == '1'
+
+    def markComplete(self):
+        self._setMeta('complete', '1')
+
+    def addDir(self, d: str, newDirs: list, files: list):
+        '''Records that directory d has been listed, with the subdirectories and (matching) files that were found in it'''
+
+        if self.db is None:
+            return
+        self.dirsDone.append((d,))
+        self.dirsFound.extend((subD,) for subD in newDirs)
+        self.filesFound.extend((f, d) for f in files)
+        self._saveIfDue()
+
+    def completeFile(self, filename: str, matches: dict, truncated: list = None):
+        '''
+        Records that a file has been completely scanned, along with its results and the data handlers that stopped at 
+        [performance]maxMatchesPerFile
+        '''
+
+        if self.db is None:
+            return
+        self.filesDone.append((filename, os.path.dirname(filename), json.dumps(matches) if matches else None, json.dumps(truncated) if truncated else None))
+        self._saveIfDue()
+
+    def isDone(self, filename: str) -> bool:
+        '''Returns True if the file was completely scanned before the scan was interrupted'''
+
+        if self.db is None:
+            return False
+        try:
+            row = self.db.execute('SELECT done FROM files WHERE path = ?', (filename,)).fetchone()
+        except sqlite3.Error as e:
+            self._dbError(e)
+            return False
+        return row is not None and row[0] == 1
+
+    def isDirDone(self, d: str) -> bool:
+        '''Returns True if the directory was listed before the scan was interrupted'''
+
+        rows = self._query('SELECT done FROM dirs WHERE path = ?', (d,))
+        return bool(rows) and rows[0][0] == 1
+
+    def getPendingDirs(self) -> list:
+        '''Returns the directories that were found but never listed'''
+
+        return [row[0] for row in self._query('SELECT path FROM dirs WHERE done = 0')]
+
+    def getPartialDirs(self) -> list:
+        '''Returns the directories that were listed but still had files waiting to be scanned'''
+
+        return [row[0] for row in self._query('SELECT DISTINCT dir FROM files WHERE done = 0')]
+
+    def getResults(self) -> list:
+        '''Returns (filename, matches, truncated) for every file that had been scanned and had matches'''
+
+        return [(row[0], json.loads(row[1]), json.loads(row[2]) if row[2] else [])
+                for row in self._query('SELECT path, matches, truncated FROM files WHERE done = 1 AND matches IS NOT NULL')]
+
+    def save(self):
+        '''Writes all changes since the last save in a single transaction'''
+
+        self.lastSave = monotonic()
+        if self.db is None:
+            return
+        try:
+            with self.db:
+                self.db.executemany('INSERT OR REPLACE INTO dirs (path, done) VALUES (?, 1)', self.dirsDone)
+                self.db.executemany('INSERT OR IGNORE INTO dirs (path, done) VALUES (?, 0)', self.dirsFound)
+                self.db.executemany('INSERT OR IGNORE INTO files (path, dir, done) VALUES (?, ?, 0)', self.filesFound)
+                self.db.executemany('INSERT INTO files (path, dir, done, matches, truncated) VALUES (?, ?, 1, ?, ?) '
+                                    'ON CONFLICT(path) DO UPDATE SET done = 1, matches = excluded.matches, truncated = excluded.truncated', self.filesDone)
+        except sqlite3.Error as e:
+            self._dbError(e)
+        self.dirsDone = []
+        self.dirsFound = []
+        self.filesFound = []
+        self.filesDone = []
+
+    def close(self):
+        self.save()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def _saveIfDue(self):
+        if monotonic() - self.lastSave >= self.interval:
+            self.save()
+
+    def _query(self, sql: str, params: tuple = ()) -> list:
+        if self.db is None:
+            return []
+        try:
+            return self.db.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            self._dbError(e)
+            return []
+
+    def _getMeta(self, key: str) -> str:
+        rows = self._query('SELECT value FROM meta WHERE key = ?', (key,))
+        return rows[0][0] if rows else None
+
+    def _setMeta(self, key: str, value: str):
+        if self.db is None:
+            return
+        try:
+            with self.db:
+                self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+        except sqlite3.Error as e:
+            self._dbError(e)
+
+    def _dbError(self, e: Exception):
+        # Checkpoints are a convenience.  If the database can't be used, the scan carries on without them.
+        if self.logger:
+            self.logger.error('Checkpoint database disabled: %s', str(e))
+        try:
+            self.db.close()
+        except Exception:
+            pass
+        self.db = None
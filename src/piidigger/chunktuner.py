@@ -0,0 +1,166 @@
+import os
+from time import monotonic, perf_counter
+
+from piidigger import classes
+from piidigger import globalfuncs
+from piidigger import scanengine
+from piidigger.filescan import scanDir
+from piidigger.logmanager import LogManager
+
+# Content sizes (in characters) that are tried for each call to the data handlers.  The largest one stands for anything larger.
+candidateSizes = [16_384, 65_536, 262_144, 1_048_576]
+# A smaller size is preferred unless a larger one is faster by more than this, as smaller chunks also use less memory
+_TOLERANCE = 0.05
+# Limits on finding text to benchmark with
+_SAMPLECHARS = 1_048_576
+_SAMPLESECONDS = 5
+_MINSAMPLECHARS = 4096
+_REPEATS = 2
+
+
+def autoTuneChunks(config: classes.Config,
+                   dataHandlerModules: list,
+                   logManager: LogManager,) -> int:
+    '''
+    Picks the amount of text handed to the data handlers in one go ([performance]chunkSize * chunkCount) for this machine and corpus.
+
+    A sample of text is read from the files under the startDirs that are read in chunks (see getSample), then the enabled data handlers 
+    are timed over the same text cut into chunks of each of the candidateSizes.  Each file is cut separately, as the file handlers would.
+    chunkCount is set so that chunkSize * chunkCount is the fastest size.  If the largest candidate wins and the configured size is 
+    larger still, the configured size is kept.
+
+    Returns the chosen size, or 0 if not enough text was found to benchmark with.  The configuration is left unchanged in that case.
+    '''
+
+    logger = logManager.getLogger('chunktuner')
+
+    samples = getSample(config, dataHandlerModules, logManager)
+    sampleChars = sum(len(text) for _, text in samples)
+    if sampleChars < _MINSAMPLECHARS:
+        logger.info('Chunk auto-tune: Only %d characters of text found.  Keeping chunkSize=%d, chunkCount=%d.', sampleChars, config.getChunkSize(), config.getChunkCount())
+        return 0
+
+    # Repeat a small sample so that the timings aren't lost in the noise
+    samples = samples * -(-_SAMPLECHARS // sampleChars)
+
+    timings = dict()
+    for size in candidateSizes:
+        timings[size] = benchmarkChunks(samples, size, dataHandlerModules)
+        logger.info('Chunk auto-tune: %d characters per chunk took %.3f seconds', size, timings[size])
+
+    fastest = min(timings.values())
+    best = min(size for size in candidateSizes if timings[size] <= fastest * (1 + _TOLERANCE))
+
+    configured = config.getChunkSize() * config.getChunkCount()
+    if best == candidateSizes[-1] and configured > best:
+        best = configured
+    config.setChunkCount(max(1, best // config.getChunkSize()))
+
+    logger.info('Chunk auto-tune: Using chunkSize=%d, chunkCount=%d', config.getChunkSize(), config.getChunkCount())
+    return best
+
+
+def getSample(config: classes.Config,
+              dataHandlerModules: list,
+              logManager: LogManager,) -> list:
+    '''
+    Returns a list of (file handler name, text) for the files under the startDirs, with the text as the file handler would pass it to
+    the data handlers, up to _SAMPLECHARS in all.  Stops after _SAMPLESECONDS, so that a large directory tree with few suitable files 
+    doesn't hold up the scan.
+
+    Only files that are read in chunks are sampled.  Plain text files in ASCII-compatible encodings, which covers most log files, are 
+    memory-mapped and scanned in windows of a fixed size instead (see plaintext.mapFile), so chunkSize and chunkCount don't apply to 
+    them.  Files are picked by their extension only, as looking up MIME types would take longer than the sample is worth.
+    '''
+
+    logger = logManager.getLogger('chunktuner')
+    exts = frozenset(config.getFileExts())
+    deadline = monotonic() + _SAMPLESECONDS
+
+    sample = list()
+    sampleChars = 0
+    dirs = [str(d) for d in config.getStartDirs()]
+    while dirs and sampleChars < _SAMPLECHARS and monotonic() < deadline:
+        d = dirs.pop()
+        subDirs, files = scanDir(d, logger)
+        dirs.extend(subD for subD in subDirs if config.getExcludeMatch(subD) is None)
+
+        for f, fStat in files:
+            if sampleChars >= _SAMPLECHARS or monotonic() >= deadline:
+                break
+            ext = os.path.splitext(f.name)[1]
+            if fStat.st_size == 0 or ext not in exts:
+                continue
+            fileHandlerName = globalfuncs.getFileHandlerName(ext, None)
+            if fileHandlerName is None or isMapped(f.path, fileHandlerName, dataHandlerModules, logManager):
+                continue
+            contents = globalfuncs.getFileHandlerModule(fileHandlerName).readFile(f.path, logManager, maxChunkCount=1, maxChunkSize=_SAMPLECHARS - sampleChars)
+            content = next(contents, '')
+            contents.close()
+            if content:
+                sample.append((fileHandlerName, content))
+                sampleChars += len(content)
+
+    return sample
+
+
+def isMapped(filename: str,
+             fileHandlerName: str,
+             dataHandlerModules: list,
+             logManager: LogManager,) -> bool:
+    '''True if the file would be memory-mapped rather than read in chunks.  The same test as getMappedText in piidigger.py.'''
+
+    fileHandlerModule = globalfuncs.getFileHandlerModule(fileHandlerName)
+    dataHandlerModules = globalfuncs.getDataHandlersForFile(dataHandlerModules, fileHandlerName)
+    if not hasattr(fileHandlerModule, 'mapFile') or not all(hasattr(handler, 'findMatchBytes') for handler in dataHandlerModules):
+        return False
+    mappedText = fileHandlerModule.mapFile(filename, logManager)
+    if mappedText is None:
+        return False
+    mappedText.close()
+    return True
+
+
+def benchmarkChunks(samples: list,
+                    size: int,
+                    dataHandlerModules: list,) -> float:
+    '''
+    Returns the best time of _REPEATS runs of the data handlers over each of the samples from getSample, handed to them size characters
+    at a time.  Each sample only goes to the data handlers for its file handler.
+    '''
+
+    files = list()
+    for fileHandlerName, text in samples:
+        fileDataHandlers = globalfuncs.getDataHandlersForFile(dataHandlerModules, fileHandlerName)
+        files.append((splitText(text, size), fileDataHandlers, globalfuncs.getMaxMatchLength(fileDataHandlers)))
+
+    best = None
+    for _ in range(_REPEATS):
+        start = perf_counter()
+        for chunks, fileDataHandlers, overlap in files:
+            # The same carry-over as scanContent, so that smaller chunks also pay for their share of the overlap
+            carry = ''
+            for content in chunks:
+                if carry:
+                    content = carry + ' ' + content
+                scanengine.findMatches(content, fileDataHandlers)
+                carry = globalfuncs.getOverlap(content, overlap)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def splitText(text: str, size: int) -> list:
+    '''Cuts text into chunks of about size characters at the first space after each cut, like the file handlers do'''
+
+    chunks = list()
+    start = 0
+    while start < len(text):
+        end = text.find(' ', start + size)
+        if end < 0:
+            end = len(text)
+        chunks.append(text[start:end])
+        start = end + 1
+
+    return chunks
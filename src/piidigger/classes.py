@@ -1,8 +1,11 @@
 import datetime
+import fnmatch
+import hashlib
 import multiprocessing as mp
 import os
 import pathlib
 import platform
+import re
 import string
 
 import tomli
@@ -12,30 +15,108 @@ from piidigger import globalfuncs
 from piidigger.getmime import testMagic
 from piidigger.logmanager import LogManager
 
+class ExcludeMatcher:
+    '''
+    Compiled form of the excludeDirs patterns so that each directory can be checked without looping over every pattern.
+
+    Plain patterns keep their original meaning -- a case-insensitive match from the beginning of the path -- and are stored in a 
+    character trie, so a path is checked in a single pass no matter how many patterns there are.
+
+    Patterns containing glob characters (*, ?, [) are combined into a single case-insensitive regex that must match the whole path,
+    such as "**/node_modules" or "*/.git".  Path separators are normalized to "/" for glob matching so the same patterns work on Windows.
+    '''
+
+    _GLOBCHARS = ('*', '?', '[')
+
+    def __init__(self, patterns: list):
+        self.trie: dict = {}
+        self.globPatterns: list = []
+
+        for pattern in patterns:
+            if any(c in pattern for c in self._GLOBCHARS):
+                self.globPatterns.append(pattern)
+            else:
+                node=self.trie
+                for c in pattern.lower():
+                    node=node.setdefault(c, {})
+                # The None key marks the end of a pattern.  Keep the pattern itself for logging.
+                node.setdefault(None, pattern)
+
+        if self.globPatterns:
+            self.globRegex=re.compile('|'.join('(?P<g%d>%s)' % (i, fnmatch.translate(self._normalizeGlob(p))) 
+                                               for i, p in enumerate(self.globPatterns)))
+        else:
+            self.globRegex=None
+
+    def match(self, path: str) -> str:
+        '''
+        Returns the first exclude pattern that matches the path, or None if the path isn't excluded
+        '''
+
+        path=path.lower()
+        node=self.trie
+        for c in path:
+            if None in node:
+                return node[None]
+            node=node.get(c)
+            if node is None:
+                break
+        else:
+            if None in node:
+                return node[None]
+
+        if self.globRegex:
+            m=self.globRegex.match(self._normalizeGlob(path))
+            if m:
+                return self.globPatterns[int(m.lastgroup[1:])]
+
+        return None
+
+    def _normalizeGlob(self, s: str) -> str:
+        return s.lower().replace('\\', '/')
+
+
 class File:
-    def __init__(self, f: pathlib.Path, mimeType: str):
-        self.filename=f.name
-        self.path=f.parent
-        self.ext=f.suffix
+    # Millions of these are created and pickled between processes, so keep them small: plain strings and numbers in fixed slots.
+    __slots__ = ('fullPath', 'ext', 'mimeType', 'handler', 'atime', 'mtime', 'size', 'mtimeNs', 'ino', 'cachedMatches', 'cachedTruncated', 'duplicateOf', 'keepResults', 'encoding')
+
+    def __init__(self, f: str, mimeType: str, fStat: os.stat_result = None):
+        # fStat is normally the stat result already collected while walking the directory.  Only stat the file if we weren't given one.
+        if fStat is None:
+            fStat=os.stat(f)
+        self.fullPath=str(f)
+        self.ext=os.path.splitext(self.fullPath)[1]
         self.mimeType=mimeType
         self.handler=globalfuncs.getFileHandlerName(self.ext, self.mimeType)
-        self.times=(f.stat().st_atime, f.stat().st_mtime)
-        self.size=f.stat().st_size
+        self.atime=fStat.st_atime
+        self.mtime=fStat.st_mtime
+        self.size=fStat.st_size
+        self.mtimeNs=fStat.st_mtime_ns
+        self.ino=fStat.st_ino
+        # Set by the discovery workers when the scan index already has the results for this file
+        self.cachedMatches=None
+        self.cachedTruncated=None
+        # Set by the fileScheduler when this file looks like a copy of another file that will be scanned instead
+        self.duplicateOf=None
+        # Set by the fileScheduler when a copy of this file could still be found, so the collector holds on to its results
+        self.keepResults=False
+        # Set by a file handler that has detected the file's encoding, so that it isn't detected again before the file is read
+        self.encoding=None
         
     def __lt__(self, other):
         return self.getFullPath() < other.getFullPath()
 
     def getFullPath(self):
-        return os.path.join(self.path, self.filename)
+        return self.fullPath
     
     def getExtension(self):
         return self.ext
     
     def getOldAccessTime(self):
-        return self.times[0]
+        return self.atime
     
     def getOldModTime(self):
-        return self.times[1]
+        return self.mtime
     
     def getFileHandlerName(self) -> str:
         return self.handler
@@ -44,8 +125,96 @@ class File:
     def getFileSize(self):
         return self.size
     
+    def getCachedMatches(self) -> dict:
+        return self.cachedMatches
+
+    def getCachedTruncated(self) -> list:
+        return self.cachedTruncated
+
+    def getDuplicateOf(self) -> str:
+        return self.duplicateOf
+
+    def getKeepResults(self) -> bool:
+        return self.keepResults
+
+    def getEncoding(self) -> str:
+        return self.encoding
+
+    def getIndexKey(self) -> tuple:
+        return (self.size, self.mtimeNs, self.ino)
+
     def getTimeStamps(self) -> tuple:
-        return self.times
+        return (self.atime, self.mtime)
+
+    def setCachedMatches(self, matches: dict, truncated: list = None):
+        self.cachedMatches=matches
+        self.cachedTruncated=truncated
+
+    def setDuplicateOf(self, path: str):
+        self.duplicateOf=path
+
+    def setEncoding(self, encoding: str):
+        self.encoding=encoding
+
+    def setKeepResults(self, keepResults: bool):
+        self.keepResults=keepResults
+
+class FileRange:
+    '''
+    One part of a large file that has been split into byte ranges so that several file handlers can scan it at the same time.
+    
+    Each part covers start to end, plus up to overlap bytes past the end so that matches crossing into the next part aren't lost.  
+    The file handler moves both ends of the range forward to the next whitespace, so words are never cut in half.
+    '''
+
+    __slots__ = ('file', 'part', 'parts', 'start', 'end', 'overlap', 'encoding')
+
+    def __init__(self, fObj: File, part: int, parts: int, start: int, end: int, overlap: int, encoding: str):
+        self.file=fObj
+        self.part=part
+        self.parts=parts
+        self.start=start
+        self.end=end
+        self.overlap=overlap
+        self.encoding=encoding
+
+    def getFullPath(self):
+        return self.file.getFullPath()
+
+    def getFileHandlerName(self) -> str:
+        return self.file.getFileHandlerName()
+
+    def getRangeSize(self):
+        # Only count the part's own bytes so that the parts add up to the file size
+        return self.end - self.start
+
+class CappedFiles:
+    '''
+    The split files whose merged results have already reached [performance]maxMatchesPerFile for every data handler.  The 
+    resultsCollector adds them as it merges the parts, and the file handlers skip any parts of these files that are still waiting
+    on rangeQ.
+
+    Shared between processes, so the files are kept as a 64-bit hash of their path in a fixed number of slots.  Only the last few are
+    needed, as the remaining parts of a file are near the front of rangeQ by the time it reaches the limit.
+    '''
+
+    def __init__(self, slots: int = 64):
+        self.keys=mp.Array('Q', slots)
+        self.next=mp.Value('i', 0)
+
+    def add(self, path: str):
+        with self.keys.get_lock():
+            self.keys[self.next.value]=self._key(path)
+            self.next.value=(self.next.value + 1) % len(self.keys)
+
+    def __contains__(self, path: str) -> bool:
+        key=self._key(path)
+        with self.keys.get_lock():
+            return key in self.keys[:]
+
+    def _key(self, path: str) -> int:
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(path.encode('utf-8', errors='surrogateescape'), digest_size=8).digest(), 'little') or 1
 
 class Config:
     def __init__(self, configFile: str, useDefault: bool=False,):
@@ -66,8 +235,26 @@ class Config:
                 console.error(str(e))
                 exit(globalfuncs.errorCodes['invalidConfig'])
         
+        # Older configuration files won't have a [performance] section.  Fill in anything that's missing from the defaults.
+        self.config['performance']={**globalfuncs.getDefaultConfig()['performance'], **self.config.get('performance', {})}
+        if self.config['performance']['schedule'] not in globalfuncs.scheduleModes:
+            console.error("Unexpected schedule mode found in configuration file (%s)" % (configFile))
+            console.error("Expected one of %s.  Using %s." % (str(globalfuncs.scheduleModes), globalfuncs.scheduleModes[0]))
+            self.config['performance']['schedule']=globalfuncs.scheduleModes[0]
+        # The smallest valid value of each of the numeric settings.  A batch or range size of 0 would hand out empty batches or ranges
+        # forever.
+        for key, minimum in [('chunkSize', 1), ('chunkCount', 1), ('discoveryProcs', 0), ('encodingSampleBytes', 1), ('filesBatchSize', 1),
+                             ('scheduleBatchBytes', 1), ('splitFileBytes', 0), ('splitRangeBytes', 1)]:
+            if not isinstance(self.config['performance'][key], int) or self.config['performance'][key] < minimum:
+                console.error("Invalid %s found in configuration file (%s).  Using %d." % (key, configFile, globalfuncs.getDefaultConfig()['performance'][key]))
+                self.config['performance'][key]=globalfuncs.getDefaultConfig()['performance'][key]
+        if not isinstance(self.config['performance']['maxMatchesPerFile'], int) or self.config['performance']['maxMatchesPerFile'] < 0:
+            console.error("Invalid maxMatchesPerFile found in configuration file (%s).  Using %d." % (configFile, globalfuncs.getDefaultConfig()['performance']['maxMatchesPerFile']))
+            self.config['performance']['maxMatchesPerFile']=globalfuncs.getDefaultConfig()['performance']['maxMatchesPerFile']
+
         self.config['rootPath']=str(pathlib.Path(os.getcwd()).absolute())
         self.config['maxProcs']=os.cpu_count()
+        self.config['resume']=False
         hostname=str(platform.node())
         self.config['hostname']=hostname
         timeStamp=datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
@@ -140,7 +327,25 @@ class Config:
         # Add Results and Log folders to the list of folders to exlude
         self.config['excludeDirs'][globalfuncs.getOSType()].append(str(pathlib.Path(self.getRootPath()) / outpath))
         self.config['excludeDirs'][globalfuncs.getOSType()].append(str(pathlib.Path(pathlib.Path(self.getRootPath()) / self.getLogFile()).parent))
+
+        # Compile the exclude patterns once so that the discovery workers don't have to loop over every pattern for every directory
+        self.excludeMatcher=ExcludeMatcher(self.getExcludeDirs())
  
+    def getCheckpointFile(self):
+        return self.config['performance']['checkpointFile']
+
+    def getCheckpointInterval(self):
+        return self.config['performance']['checkpointInterval']
+
+    def getChunkAutoTune(self):
+        return self.config['performance']['chunkAutoTune']
+
+    def getChunkCount(self):
+        return self.config['performance']['chunkCount']
+
+    def getChunkSize(self):
+        return self.config['performance']['chunkSize']
+
     def getDataHandlers(self):
         return self.config['dataHandlers']
     
@@ -148,9 +353,22 @@ class Config:
         #return [key for key in self.config['results'].keys()]
         return self.config['results'].keys()
  
+    def getDedup(self):
+        return self.config['performance']['dedup']
+
+    def getDedupMinBytes(self):
+        return self.config['performance']['dedupMinBytes']
+
     def getExcludeDirs(self):
         return self.config['excludeDirs'][globalfuncs.getOSType()]
  
+    def getExcludeMatch(self, path: str) -> str:
+        '''Returns the excludeDirs pattern that matches the path, or None if the path should be included'''
+        return self.excludeMatcher.match(path)
+ 
+    def getFilesBatchSize(self):
+        return self.config['performance']['filesBatchSize']
+ 
     def getFileExts(self):
         return self.config['includeFiles']['ext']
  
@@ -167,12 +385,24 @@ class Config:
         return self.config['logging']['logFile']
 
     def getMaxFilesScanProcs(self):
-        #return max(self.getMaxProcs() // 4, 1)
-        return 1
+        # Zero (the default) scales the number of directory/file discovery processes with the number of file handler processes
+        procs=self.config['performance']['discoveryProcs']
+        if procs > 0:
+            return procs
+        return max(self.getMaxProcs() // 4, 1)
+
+    def getEncodingSampleBytes(self):
+        return self.config['performance']['encodingSampleBytes']
+
+    def getMaxMatchesPerFile(self):
+        return self.config['performance']['maxMatchesPerFile']
 
     def getMaxProcs(self):
         return self.config['maxProcs']
 
+    def getMimeCacheFile(self):
+        return self.config['performance']['mimeCacheFile']
+
     def getMimeTypes(self):
         return self.config['includeFiles']['mime']
 
@@ -182,15 +412,48 @@ class Config:
         else:
             return self.config['results']
 
+    def getResume(self):
+        return self.config['resume']
+
     def getRootPath(self):
         return self.config['rootPath']
 
+    def getScanIndexFile(self):
+        return self.config['performance']['scanIndexFile']
+
+    def getSchedule(self):
+        return self.config['performance']['schedule']
+
+    def getScheduleBatchBytes(self):
+        return self.config['performance']['scheduleBatchBytes']
+
+    def getSplitFileBytes(self):
+        return self.config['performance']['splitFileBytes']
+
+    def getSplitRangeBytes(self):
+        return self.config['performance']['splitRangeBytes']
+
     def getStartDirs(self):
         return self.config['includeFiles']['startDirs'][globalfuncs.getOSType()]
     
+    def setChunkAutoTune(self, autoTune: bool):
+        self.config['performance']['chunkAutoTune']=autoTune
+
+    def setChunkCount(self, count: int):
+        self.config['performance']['chunkCount']=count
+
+    def setChunkSize(self, size: int):
+        self.config['performance']['chunkSize']=size
+
+    def setMaxFilesScanProcs(self, procs):
+        self.config['performance']['discoveryProcs']=procs
+
     def setMaxProcs(self, procs):
         self.config['maxProcs']=procs
 
+    def setResume(self, resume: bool):
+        self.config['resume']=resume
+
 class ProcessManager:
     def __init__(self, 
                  name: str,
@@ -198,6 +461,8 @@ class ProcessManager:
         
         self.processes: list = []
         self.name = name
+        # Set if the processes had to be terminated, such as after a KeyboardInterrupt
+        self.interrupted = False
         self.logger = logManager.getLogger(name=name,)
         
     def register(self, 
@@ -252,6 +517,7 @@ class ProcessManager:
 
     def terminate_all_processes(self):
         self.logger.debug(f'{self.name}: Terminating all processes.')
+        self.interrupted = True
         self.processes.sort(key=lambda x: x['shutdown_order'],)
         for process in self.processes:
             for p in process['processes']:
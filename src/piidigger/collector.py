@@ -0,0 +1,278 @@
+import multiprocessing as mp
+
+from piidigger import classes
+from piidigger import globalfuncs
+from piidigger import queuefuncs
+from piidigger.checkpoint import Checkpoint
+from piidigger.globalvars import SENTINEL
+from piidigger.logmanager import LogManager
+from piidigger.scanindex import ScanIndex, getFingerprint
+
+
+def resultsCollector(config: classes.Config,
+                     queues: dict,
+                     totals: dict,
+                     stopEvent: mp.Event,
+                     logManager: LogManager,):
+    '''
+    Sits between the file handlers (collectQ) and the output handlers (*_resultsQ).
+
+    The file handlers send one record per file, in batches.  Large files that were split into byte ranges come back as one record per
+    part, possibly from different file handlers and in any order.  The parts are merged here so that the output handlers still receive
+    a single record for each file.
+
+    Files that were found to be exact copies of another file arrive with only the path of the original.  They're given the original's
+    results as soon as those are available.
+
+    If [performance]scanIndexFile is set, the results for every scanned file are also written to the scan index.  Completed files are
+    also recorded in the checkpoint ([performance]checkpointFile).  When resuming a scan, the results from the checkpoint are sent to 
+    the output handlers first.
+
+    If [performance]maxMatchesPerFile is set, the results of a data handler that stopped at that many matches in a file, with more of the
+    file left to scan or more matches than it kept, are marked as truncated.  Once the merged parts of a split file have that many
+    matches for every data handler, the file handlers are told to skip the rest of its parts.
+    '''
+
+    checkpoint=None
+    try:
+        logger = logManager.getLogger(name=mp.current_process().name,)
+        logger.info('Starting %s', mp.current_process().name)
+        resultsQs = [qName for qName in queues.keys() if qName.endswith('_resultsQ')]
+        maxMatches = config.getMaxMatchesPerFile()
+
+        scanIndex=ScanIndex(config.getScanIndexFile(), getFingerprint(config.getDataHandlers(), config.getMaxMatchesPerFile()), readOnly=False, logger=logger) if config.getScanIndexFile() else None
+
+        # Parts received so far for each split file, keyed by filename
+        pending=dict()
+
+        # For copying results to duplicates: the results of files that could have a copy, and the duplicates waiting on their original
+        duplicates=DuplicateResults() if config.getDedup() else None
+
+        if config.getCheckpointFile():
+            checkpoint=Checkpoint(config.getCheckpointFile(), config.getCheckpointInterval(), logger)
+            if config.getResume():
+                replayResults(checkpoint, queues, totals, resultsQs, logger)
+
+        # Each file handler sends a sentinel when it's done
+        activeFileHandlers=config.getMaxProcs()
+        while not stopEvent.is_set():
+            records=queuefuncs.getItem(queues['collectQ'])
+            if records == SENTINEL:
+                activeFileHandlers-=1
+                if activeFileHandlers == 0:
+                    break
+                continue
+            if records is None:
+                continue
+
+            for record in records:
+                if record.get('duplicateOf') is not None:
+                    # duplicates is never None here, as only the fileScheduler marks duplicates
+                    completed=duplicates.addDuplicate(record)
+                elif record.get('parts', 1) > 1:
+                    filename=record['filename']
+                    record=mergePart(pending, record, maxMatches)
+                    completed=[] if record is None else [record]
+                    if record is None and maxMatches and isCapped(pending[filename], maxMatches):
+                        logger.info('%s: Skipping the remaining byte ranges after %d matches for each data handler ([performance]maxMatchesPerFile)', filename, maxMatches)
+                        totals['cappedFiles'].add(filename)
+                else:
+                    completed=[record]
+
+                for record in completed:
+                    results=submitResult(record, queues, totals, resultsQs, scanIndex, checkpoint, logger)
+                    if duplicates is not None and record.get('keepResults'):
+                        for duplicate in duplicates.addOriginal(record['filename'], results['matches'], results.get('truncated')):
+                            submitResult(duplicate, queues, totals, resultsQs, scanIndex, checkpoint, logger)
+
+        # Only happens if a file handler failed part way through a split file.  Keep what was found.
+        for filename, record in pending.items():
+            logger.error('%s: Only %d of %d byte ranges were scanned', filename, record['received'], record['parts'])
+            submitResult(record, queues, totals, resultsQs, None, None, logger)
+
+        # Any duplicates still waiting belong to originals that were scanned before them and had no matches
+        if duplicates is not None:
+            for duplicate in duplicates.getWaiting():
+                submitResult(duplicate, queues, totals, resultsQs, scanIndex, checkpoint, logger)
+
+        if scanIndex is not None:
+            scanIndex.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Keep the results collected up to here, even if the scan was interrupted
+        if checkpoint is not None:
+            checkpoint.close()
+        # Put the sentinel on the results queues
+        for q in [qName for qName in queues.keys() if qName.endswith('_resultsQ')]:
+            queues[q].put(SENTINEL)
+        logger.info('Stopping %s (PID=%d)', mp.current_process().name, mp.current_process().pid)
+
+
+def mergePart(pending: dict,
+              record: dict,
+              maxMatches: int = 0,) -> dict:
+    '''
+    Adds the matches from one part of a split file to the file's combined record, up to maxMatches for each data handler if it's set.
+    A data handler is truncated if it was in any of the parts, or if matches from this part are left out.  Returns the combined record
+    once every part has been received, otherwise None.
+    '''
+
+    filename=record['filename']
+    if filename not in pending:
+        pending[filename]={
+            'filename': filename,
+            'matches': {},
+            'fileKey': record.get('fileKey'),
+            'parts': record['parts'],
+            'received': 0,
+        }
+    merged=pending[filename]
+    # A part that couldn't be scanned has no fileKey.  The file's results are incomplete, so they aren't saved to the scan index.
+    if record.get('fileKey') is None:
+        merged['fileKey']=None
+    if record.get('keepResults'):
+        merged['keepResults']=True
+    if record.get('truncated'):
+        merged.setdefault('truncated', set()).update(record['truncated'])
+    if record.get('dataHandlers') is not None:
+        merged['dataHandlers']=record['dataHandlers']
+    # Only parts of a file that had reached the limit for every data handler are skipped, so all of them are cut short
+    if record.get('skipped'):
+        merged.setdefault('truncated', set()).update(merged['matches'])
+
+    for dhName in record['matches']:
+        merged=globalfuncs.processMatches(merged, record['matches'][dhName], dhName, maxMatches)
+    merged['received']+=1
+
+    if merged['received'] < merged['parts']:
+        return None
+    return pending.pop(filename)
+
+
+def isCapped(merged: dict, maxMatches: int) -> bool:
+    '''
+    True if every data handler has maxMatches in the merged parts of a split file, so the rest of the parts don't need to be scanned.
+    Only returns True the first time, so the file handlers are only told once.
+    '''
+
+    if merged.get('capped') or not merged.get('dataHandlers'):
+        return False
+    merged['capped']=all(globalfuncs.countMatches(merged['matches'].get(dhName, {})) >= maxMatches for dhName in merged['dataHandlers'])
+    return merged['capped']
+
+
+class DuplicateResults:
+    '''
+    Pairs up duplicate files with the results of their original, which could arrive at the collector before or after the duplicate.
+
+    Only the results of files that the fileScheduler marked with keepResults are added, and only if there are matches.  A duplicate whose
+    original hasn't been seen yet waits for it.  If the original never arrives, it had already been reported without matches before 
+    the duplicate was found, so any duplicates still waiting at the end of the scan have no matches either.
+    '''
+
+    def __init__(self):
+        # filename -> (matches, truncated)
+        self.matches: dict = {}
+        self.waiting: dict = {}
+
+    def addOriginal(self, filename: str, matches: dict, truncated: list = None) -> list:
+        '''Records the results of a scanned file and returns any duplicates that were waiting for them'''
+
+        if matches:
+            self.matches[filename]=(matches, truncated)
+        return [self._copyResults(duplicate, matches, truncated) for duplicate in self.waiting.pop(filename, [])]
+
+    def addDuplicate(self, record: dict) -> list:
+        '''Returns the duplicate with its original's results, or an empty list if it has to wait for them'''
+
+        original=record['duplicateOf']
+        if original in self.matches:
+            return [self._copyResults(record, *self.matches[original])]
+        self.waiting.setdefault(original, []).append(record)
+        return []
+
+    def getWaiting(self) -> list:
+        waiting=[duplicate for duplicates in self.waiting.values() for duplicate in duplicates]
+        self.waiting=dict()
+        return waiting
+
+    def _copyResults(self, record: dict, matches: dict, truncated: list) -> dict:
+        record={**record, 'matches': matches}
+        if truncated:
+            record['truncated']=truncated
+        return record
+
+
+def replayResults(checkpoint: Checkpoint,
+                  queues: dict,
+                  totals: dict,
+                  resultsQs: list,
+                  logger,):
+    '''
+    Sends the results of the files that were scanned before the scan was interrupted to the output handlers.  The discovery workers skip
+    these files, so they can't be the original of a duplicate found in this run.
+    '''
+
+    count=0
+    for filename, matches, truncated in checkpoint.getResults():
+        results={
+            'filename': filename,
+            'matches': matches,
+        }
+        if truncated:
+            results['truncated']=truncated
+        with totals['totalResults'].get_lock():
+            totals['totalResults'].value += globalfuncs.countResults(matches)
+        for q in resultsQs:
+            queues[q].put(results)
+        count+=1
+
+    logger.info('Resumed results for %d files from the checkpoint', count)
+
+
+def submitResult(record: dict,
+                 queues: dict,
+                 totals: dict,
+                 resultsQs: list,
+                 scanIndex: ScanIndex,
+                 checkpoint: Checkpoint,
+                 logger,) -> dict:
+    '''
+    Updates the counters for a completely scanned file, saves its results to the scan index and the checkpoint, and sends any matches
+    on to the output handlers.  Returns the results as sent to the output handlers.
+
+    The names of the data handlers whose results were cut short by [performance]maxMatchesPerFile are listed in 'truncated'.
+    '''
+
+    with totals['filesScanned'].get_lock():
+        totals['filesScanned'].value+=1
+
+    filename=record['filename']
+
+    # Since Python sets aren't serializable as a JSON object type, we'll convert our results to Lists now.
+    results={
+        'filename': filename,
+        'matches': {handler: {key: list(values) for key, values in matches.items()} for handler, matches in record['matches'].items()},
+    }
+    if record.get('truncated'):
+        results['truncated']=sorted(record['truncated'])
+
+    # Files that came from the scan index are already in it.  Files without matches are saved too, as they're most of the savings.
+    if scanIndex is not None and not record.get('cached') and record.get('fileKey') is not None:
+        scanIndex.store(filename, record['fileKey'], results['matches'], results.get('truncated'))
+    if checkpoint is not None:
+        checkpoint.completeFile(filename, results['matches'], results.get('truncated'))
+
+    if len(results['matches']) == 0:
+        return results
+
+    logger.debug('%s: %s matches found', filename, str(results['matches'].keys()))
+
+    # Update the results totals
+    with totals['totalResults'].get_lock():
+        totals['totalResults'].value += globalfuncs.countResults(results['matches'])
+    for q in resultsQs:
+        queues[q].put(results)
+
+    return results
@@ -1,2 +1,21 @@
+# Each data handler must have the following:
+#   "dhName" -          The name of the data handler, as shown in the results
+#   "findMatch" -       Function that receives a chunk of text (and optionally the windows of it to look at, see "prefilter") and returns
+#                       a dictionary of {'brand': set(matches)}, with each match already validated and redacted
+#
+# Data handlers can optionally provide the following.  The scan engine uses them to skip work it can tell won't find anything.
+#   "findMatchBytes" -  Same as findMatch, but for the raw bytes of an ASCII-compatible file.  Only used if every data handler has one.
+#   "requiredChars" -   Characters that every match contains at least one of, such as the "@" of an email address.  A chunk of text
+#                       without any of them is skipped.
+#   "minMatchLength" -  The shortest text that can match.  Shorter chunks of text are skipped.
+#   "maxMatchLength" -  The longest text that can match.  The end of each chunk is carried over into the next one by this much, so that
+#                       a match that was cut in two is still found.  Data handlers without it get globalvars.rangeOverlap.
+#   "fileHandlers" -    The names of the file handlers whose text could hold a match.  Files handled by any other file handler are not
+#                       given to this data handler.  None (the default) for all of them.
+#   "prefilter" -       A scanengine.Prefilter that describes where in the text a match can be.  findMatch is then only given those
+#                       windows of the text.
+#   "matchCache" -      A scanengine.MatchCache that findMatch uses to check and redact each distinct match only once.  Its hits and
+#                       misses are logged when each file handler process stops.
+
 from piidigger.datahandlers import email
 from piidigger.datahandlers import pan
\ No newline at end of file
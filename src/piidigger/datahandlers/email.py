@@ -1,67 +1,112 @@
 import re
 
+from piidigger.scanengine import MatchCache, Prefilter, findWindows
+
 dhName='Email Address'
+# Hints for the scan engine (see datahandlers/__init__.py)
+requiredChars='@'
+# The shortest address that _isValid accepts is like "a@b.co".  The longest has 64 characters before the "@" and 253 after it.
+minMatchLength=6
+maxMatchLength=318
+fileHandlers=None
+
+# An address that's any longer than maxMatchLength either side of its "@" isn't valid, so the regex only needs to see that much.
+# It doesn't need to look past whitespace either, as an address can only contain a space or a tab if it's escaped inside a quoted
+# local part (such as "john\ doe"@example.com), which isn't worth a longer window for.
+prefilter=Prefilter(anchors=requiredChars, span=maxMatchLength, stopChars=' \t\n\r')
+# The same addresses tend to appear throughout a file, and only need to be checked and redacted once
+matchCache=MatchCache()
 
 # Compiled once at module scope to avoid repeated compilation overhead on every call.
 # RFC5322 compliant email regex
 _EMAIL_REGEX = re.compile(r'(?:[a-zA-Z0-9!#$%&\'*+/=?^_`{|}~-]+(?:\.[a-zA-Z0-9!#$%&\'*+/=?^_`{|}~-]+)*|"(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21\x23-\x5b\x5d-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])*")@(?:(?:[a-zA-Z0-9](?:[a-zA-Z0-9-]*[a-zA-Z0-9])?\.)+[a-zA-Z0-9](?:[a-zA-Z0-9-]*[a-zA-Z0-9])?|\[(?:(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)\.){3}(?:25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?|[a-zA-Z0-9-]*[a-zA-Z0-9]:(?:[\x01-\x08\x0b\x0c\x0e-\x1f\x21-\x5a\x53-\x7f]|\\[\x01-\x09\x0b\x0c\x0e-\x7f])+)\])')
 
-def findMatch(line: str) -> dict:
+_EMAIL_BYTES_REGEX = re.compile(_EMAIL_REGEX.pattern.encode('ascii'))
+
+# Used by _isValid, which searches from just after the "@" rather than splitting the address
+_LONG_LABEL = re.compile(r'[^.]{64}')
+_TLD = re.compile(r'\.[a-zA-Z]{2,63}$')
+
+def findMatch(line: str, windows: list = None) -> dict:
     '''
     Matches a line of text against email address formats consistent with RFC5322.
-    Should receive the text from "filehandler" as raw text.
+    Should receive the text from "filehandler" as raw text.  If the scan engine has already found the windows of the text around
+    each "@", only those are matched.
 
     Returns a dictionary of:
         'brand': set(matches)
     '''
 
     # Cheap prefilter: every valid email address must contain '@'.
-    # Skip the expensive regex entirely if the character is absent.
-    if '@' not in line:
-        return {}
+    # Only run the expensive regex over the word around each one.
+    if windows is None:
+        windows=findWindows(line, 0, len(line), (prefilter,))[0]
 
     results=dict()
-    matches=_EMAIL_REGEX.findall(line)
-    if matches:
-        for match in matches:
-            match=match.strip()
-            if _isValid(match):
-                try:
-                    results['email'].add(_redact(match))
-                except KeyError:
-                    results['email'] = set()
-                    results['email'].add(_redact(match))
+    for windowStart, windowEnd in windows:
+        for m in _EMAIL_REGEX.finditer(line, windowStart, windowEnd):
+            redacted=_check(m.group().strip())
+            if redacted:
+                results.setdefault('email', set()).add(redacted)
     return results
 
+def findMatchBytes(buffer,
+                   start: int = 0,
+                   end: int = None,
+                   decode = None,
+                   windows: list = None,) -> dict:
+    '''
+    Same as findMatch, but matches the raw bytes of an ASCII-compatible file (such as a memory-mapped file) from start to end without 
+    decoding it first.  "decode(start, end)" returns the text of a span of the buffer, and is only called for the matches.
+
+    Returns a dictionary of:
+        'brand': set(matches)
+    '''
+
+    if end is None:
+        end=len(buffer)
+    if decode is None:
+        decode=lambda s, e: bytes(buffer[s:e]).decode('ascii', errors='replace')
+    if windows is None:
+        windows=findWindows(buffer, start, end, (prefilter,))[0]
+
+    results=dict()
+    for windowStart, windowEnd in windows:
+        for m in _EMAIL_BYTES_REGEX.finditer(buffer, windowStart, windowEnd):
+            redacted=_check(decode(m.start(), m.end()).strip())
+            if redacted:
+                results.setdefault('email', set()).add(redacted)
+    return results
+
+def _check(match: str) -> str:
+    '''Returns the redacted match, or '' if it isn't valid.  The result is taken from the matchCache if the match is in it.'''
+
+    redacted=matchCache.get(match)
+    if redacted is None:
+        redacted=_redact(match) if _isValid(match) else ''
+        matchCache.put(match, redacted)
+    return redacted
+
 def _isValid(text: str) -> bool:
     """
     Validate if the text is a valid email address
-    Additional validations to test edge cases that might get past the regex
+    Additional validations to test edge cases that might get past the regex.  This is called for every match, so it works on
+    positions in the text rather than splitting it.
     """
 
-    is_valid = dict()
-    try:
-        local_part, domain_part = text.split('@', 1)
-    except ValueError:                              # If the cannot be split at an @ symbol (this should only happen during unit testing, but added just in case)
+    at = text.find('@')
+    # There's exactly one @ symbol, with text before and after it
+    if at <= 0 or at == len(text) - 1 or text.find('@', at + 1) != -1:
+        return False
+    # Neither the local part nor the domain part is too long
+    if at > 64 or len(text) - at - 1 > 253:
         return False
+    # No domain label is too long
+    if _LONG_LABEL.search(text, at + 1) is not None:
+        return False
+    # The domain ends in a valid TLD (e.g., .com, .org, .net)
+    return _TLD.search(text, at + 1) is not None
 
-    # Check if the text contains an @ symbol and is not empty
-    is_valid['contains_at'] = '@' in text and len(text) > 0
-    # Check if the text contains only one @ symbol
-    is_valid['single_at'] = text.count('@') == 1
-    # Check if there is text before and after the @ symbol
-    is_valid['text_before_after_at'] = len(local_part) > 0 and len(domain_part) > 0
-    # Check if the local part is not too long
-    is_valid['local_part_length'] = len(local_part) <= 64
-    # Check if the domain part is not too long
-    is_valid['domain_part_length'] = len(domain_part) <= 253
-    # Check if any domain labels are too long
-    is_valid['domain_labels_length'] = all(len(label) <= 63 for label in domain_part.split('.'))
-    # Check if the text contains a valid TLD (e.g., .com, .org, .net)
-    is_valid['valid_tld'] = bool(re.search(r'\.[a-zA-Z]{2,63}$', domain_part))
-        
-    return all(is_valid.values())
-    
 def _redact(text: str, replaceWith: str = '*') -> str:
     '''
     Redacts email address according to this rule:
@@ -1,59 +1,175 @@
 import re
 
-dhName='Primary Account Number'
+try:
+    import numpy
+except ImportError:
+    # Optional.  Without NumPy, the Luhn checks are done one at a time.
+    numpy=None
+
+from piidigger.scanengine import MatchCache, Prefilter, findWindows
 
-def findMatch(line: str) -> dict:
+dhName='Primary Account Number'
+# Hints for the scan engine (see datahandlers/__init__.py)
+requiredChars='0123456789'
+# The shortest text that findMatch can match is a 15-digit PAN.  The longest is 16 digits with a separator between each group of four, 
+# plus the character either side.
+minMatchLength=15
+maxMatchLength=21
+fileHandlers=None
+
+# A PAN is made up of at least 15 digits, separated by "-" or whitespace.  The regex is only run over runs of those characters with
+# enough digits.  A date, a time or an IP address never gets that far, and most text doesn't have a digit at all.
+prefilter=Prefilter(anchors=requiredChars, runChars='0123456789 \t\n\v\f\r-', minAnchors=15)
+# The same card numbers tend to appear throughout a file, and only need to be checked and redacted once
+matchCache=MatchCache()
+
+# Batches smaller than this are checked one number at a time, as setting up the arrays would take longer
+_LUHNBATCHMIN=64
+# A digit doubled, with the digits of the result added together (e.g. 7 -> 14 -> 5)
+_LUHN_DOUBLED_STR={str(d): sum(divmod(d*2, 10)) for d in range(10)}
+_LUHN_DOUBLED=numpy.array([_LUHN_DOUBLED_STR[str(d)] for d in range(10)], dtype=numpy.uint8) if numpy is not None else None
+_NON_DIGITS=re.compile(r'[^0-9]+')
+
+# Regexes provided by https://github.com/citypay/citypay-pan-search/tree/master/src/test/resources
+# If you know of more, or can shed light on any corrections, please submit an issue at https://github.com/kirkpatrickprice/PIIDigger/issues or submit a PR on the repo
+#
+# Every brand is matched in the same pass over the text.  The name of the group that matched is the brand.  A PAN can't be preceded
+# or followed by a digit, "." or "-" (to reduce UUID false positives in log files without missing legit PAN).  The whole pattern is a
+# lookahead, so each match is empty and the search carries on from the next character.  That way, the boundary character between 
+# two PANs counts for both of them and a PAN that starts inside a longer candidate is still found.  The leading (?=[1-6]) isn't needed
+# for the match, but it lets the regex engine skip straight to the digits that can start a PAN.
+_BRANDS=r'''
+    (?=[1-6])
+    (?<![\d.-])
+    (?=
+        (?:
+            (?P<visa>4[0-9]{3}SEP[0-9]{4}SEP[0-9]{4}SEP[0-9]{4})
+            |(?P<mc>5[1-5][0-9]{2}SEP[0-9]{4}SEP[0-9]{4}SEP[0-9]{4})
+            |(?P<discover>6011SEP[0-9]{4}SEP[0-9]{4}SEP[0-9]{4})
+            |(?P<jcb>(?:2131|1800|35[0-9]{3})[0-9]{11})
+            |(?P<amex>3[47][0-9]{2}SEP[0-9]{6}SEP[0-9]{5})
+        )
+        (?![\d.-])
+    )
+'''
+_PAN_REGEX=re.compile(_BRANDS.replace('SEP', r'[ -]?'), re.VERBOSE)
+# The file handlers pass findMatch text where every run of whitespace has been replaced by a single space.  The raw bytes for
+# findMatchBytes haven't been, so a run of whitespace is allowed wherever findMatch allows a space.
+_PAN_BYTES_REGEX=re.compile(_BRANDS.replace('SEP', r'(?:-|\s+)?').encode('ascii'), re.VERBOSE)
+
+def findMatch(line: str, windows: list = None) -> dict:
     '''
     Matches a line of text against known credit card number formats.  Should receive the text from "filehandler" as raw text.
+    If the scan engine has already found the windows of the text that could hold a PAN, only those are matched.
 
     Returns a dictionary of:
         'brand': set(matches)
     '''
 
-    # Regexes provided by https://github.com/citypay/citypay-pan-search/tree/master/src/test/resources
-    
-    # If you know of more, or can shed light on any corrections, please submit an issue at https://github.com/kirkpatrickprice/PIIDigger/issues or submit a PR on the repo
-    # Added the |[^-] to exclude strings anchored on a hyphen.  Hopefully reduce UUID false positives in log files without missing legit PAN.
-    regexes={
-        'visa': re.compile(r'(?:^|[^\d.-])4[0-9]{3}[ -]?[0-9]{4}[ -]?[0-9]{4}[ -]?[0-9]{4}(?:$|[^\d.-])'),
-        'mc': re.compile(r'(?:^|[^\d.-])5[1-5][0-9]{2}[ -]?[0-9]{4}[ -]?[0-9]{4}[ -]?[0-9]{4}(?:$|[^\d.-])'),
-        'discover': re.compile(r'(?:^|[^\d.-])6011[ -]?[0-9]{4}[ -]?[0-9]{4}[ -]?[0-9]{4}(?:$|[^\d.-])'),
-        'jcb': re.compile(r'(?:^|[^\d.-])(?:2131|1800|35[0-9]{3})[0-9]{11}(?:$|[^\d.-])'),
-        'amex': re.compile(r'(?:^|[^\d.-])3[47][0-9]{2}[ -]?[0-9]{6}[ -]?[0-9]{5}(?:$|[^\d.-])'),
-        }
-    
+    # Each distinct match and its brand.  The same card number tends to appear many times, but only needs to be validated once.
+    candidates=dict()
+    if windows is None:
+        windows=findWindows(line, 0, len(line), (prefilter,))[0]
+    for windowStart, windowEnd in windows:
+        for m in _PAN_REGEX.finditer(line, windowStart, windowEnd):
+            brand=m.lastgroup
+            start, end=m.span(brand)
+            # Matches are reported with the boundary character either side, if there is one
+            candidates.setdefault(line[max(start-1, 0):end+1].strip(), brand)
+    return _validMatches(candidates)
+
+
+def findMatchBytes(buffer,
+                   start: int = 0,
+                   end: int = None,
+                   decode = None,
+                   windows: list = None,) -> dict:
+    '''
+    Same as findMatch, but matches the raw bytes of an ASCII-compatible file (such as a memory-mapped file) from start to end without 
+    decoding it first.  "decode(start, end)" returns the text of a span of the buffer, and is only called for the matches.
+
+    Returns a dictionary of:
+        'brand': set(matches)
+    '''
+
+    if end is None:
+        end=len(buffer)
+    if decode is None:
+        decode=lambda s, e: bytes(buffer[s:e]).decode('ascii', errors='replace')
+
+    # Each distinct match (as raw bytes) with its brand and where it was found.  Only these are decoded.
+    spans=dict()
+    if windows is None:
+        windows=findWindows(buffer, start, end, (prefilter,))[0]
+    for windowStart, windowEnd in windows:
+        for m in _PAN_BYTES_REGEX.finditer(buffer, windowStart, windowEnd):
+            brand=m.lastgroup
+            matchStart, matchEnd=m.span(brand)
+            matchStart, matchEnd=max(matchStart-1, start), min(matchEnd+1, end)
+            spans.setdefault(buffer[matchStart:matchEnd], (brand, matchStart, matchEnd))
+
+    candidates=dict()
+    for brand, matchStart, matchEnd in spans.values():
+        # Make the match look like it would to findMatch, with single spaces
+        candidates.setdefault(' '.join(decode(matchStart, matchEnd).split()), brand)
+    return _validMatches(candidates)
+
+
+def _validMatches(candidates: dict) -> dict:
+    '''
+    Returns the redacted candidates ({match: brand}) that pass the Luhn check, as a dictionary of 'brand': set(matches).  Only the
+    candidates that aren't in the matchCache are checked.
+    '''
+
     results=dict()
-    for brand in regexes.keys():
-        matches=regexes[brand].findall(line)
-        if matches:
-            for match in matches:
-                match=match.strip()
-                if _isValid(match):
-                    results[brand]=set()
-                    try:
-                        results[brand].add(_redact(match))
-                    except KeyError:
-                        results[brand]=[]
-                        results[brand]+=[_redact(match)]
+    unchecked=list()
+    for match, brand in candidates.items():
+        redacted=matchCache.get(match)
+        if redacted is None:
+            unchecked.append(match)
+        elif redacted:
+            results.setdefault(brand, set()).add(redacted)
+
+    for match, valid in zip(unchecked, _isValidBatch(unchecked)):
+        redacted=_redact(match) if valid else ''
+        matchCache.put(match, redacted)
+        if redacted:
+            results.setdefault(candidates[match], set()).add(redacted)
     return results
 
 
 def _isValid(text: str) -> bool:
+    return _isValidBatch([text])[0]
 
-    def luhn(n) -> bool:
-        # Luhn check taken from https://rosettacode.org/wiki/Luhn_test_of_credit_card_numbers#Python
 
-        # Invert the number string for the Luhn formula
-        r = [int(ch) for ch in str(n)][::-1]
+def _isValidBatch(texts: list) -> list:
+    '''
+    Runs the Luhn check on all of the texts at once.  Returns a list with True for each text whose digits pass it, and False for the 
+    others.
 
-        # Double every other digit and add the others.  Modulo 10 on the result and it should equal 0
-        return (sum(r[0::2]) + sum(sum(divmod(d*2,10)) for d in r[1::2])) % 10 == 0
+    With NumPy, the digits of a large batch go into a single array, with one row per text.  The texts are padded with leading zeros
+    to the same length, which doesn't change the result.  Starting from the right, every other digit is doubled (with the digits of
+    the result added together) using a lookup table, and each row is summed.
+    '''
 
     # Eliminate any non-numeric characters (such as hyphen and space) from the text
-    if not text.isdigit():
-        text = ''.join(i for i in text if i.isdigit())
-    
-    return luhn(text)
+    numbers=[_NON_DIGITS.sub('', text) for text in texts]
+
+    if numpy is None or len(numbers) < _LUHNBATCHMIN:
+        return [_luhn(number) for number in numbers]
+
+    width=max(2, max(len(number) for number in numbers))
+    digits=numpy.frombuffer(''.join(number.rjust(width, '0') for number in numbers).encode('ascii'), dtype=numpy.uint8)
+    digits=digits.reshape(len(numbers), width) - 48
+    # The doubled digits are every other one, counting back from the second to last
+    digits[:, width-2::-2]=_LUHN_DOUBLED[digits[:, width-2::-2]]
+    return (digits.sum(axis=1, dtype=numpy.int64) % 10 == 0).tolist()
+
+
+def _luhn(number: str) -> bool:
+    # Double every other digit, counting back from the second to last, and add the others.  Modulo 10 on the result and it should
+    # equal 0.  The doubled digits are looked up, with their digits already added together.
+    return (sum(map(int, number[::-2])) + sum(_LUHN_DOUBLED_STR[ch] for ch in number[-2::-2])) % 10 == 0
 
 def _redact(text: str, replaceWith: str = '*') -> str:
     '''
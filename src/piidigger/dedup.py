@@ -0,0 +1,113 @@
+import functools
+import hashlib
+import os
+
+# Bytes hashed from each end of the file for the partial hash
+_PARTIALBYTES = 65_536
+_BLOCKSIZE = 1_048_576
+# Full hashes of original files kept by each file handler, as every copy of a file is compared with the same original
+_HASHCACHESIZE = 1024
+
+
+class DuplicateFinder:
+    '''
+    Finds files that are likely copies of a file that has already been seen, so that only one of them needs to be scanned.
+
+    Files are grouped by size first, which costs nothing as the size is already known.  The first file of each size is never read here.
+    Every later file of the same size is read to compare a partial hash (the first and last 64KB) with the files of that size seen
+    before, which is a single dictionary lookup.  Reading whole files would hold up every other file waiting to be scheduled, so the 
+    full hash is left to the file handler that picks up the copy (see isDuplicate).
+
+    The first file of each size is sent on before anything else of that size is found, so it can't be an original.  If a copy of it 
+    turns up, the copy is scanned too and becomes the original for any further copies.  A file only becomes the original of a copy if
+    it's still waiting to be sent to the file handlers, so that it can be marked to keep its results (see findOriginal), or if it
+    already was.  Otherwise the copy replaces it as the original.
+
+    Memory use is one entry per distinct file (path and partial hash).  Files smaller than minBytes are always treated as unique, as
+    they're about as cheap to scan as they are to hash.
+    '''
+
+    def __init__(self, minBytes: int, logger = None):
+        self.minBytes = minBytes
+        self.logger = logger
+        # size -> path of the first file of that size, which isn't hashed
+        self.firsts: dict = {}
+        # size -> {partialHash: path} for the other unique files of that size
+        self.originals: dict = {}
+        # Paths of the files that are the original of at least one copy, whose results are kept by the collector
+        self.kept: set = set()
+        self.duplicates = 0
+
+    def findOriginal(self, path: str, size: int, waiting = ()) -> str:
+        '''
+        Returns the path of a file that was seen before with the same size and partial hash, or None if this file has to be scanned.
+        
+        waiting holds the paths of the files that haven't been sent to the file handlers yet.  A file found there is returned as the
+        original, and the caller has to mark it to keep its results before it's sent.
+        '''
+
+        if size < self.minBytes:
+            return None
+
+        if size not in self.firsts:
+            self.firsts[size] = path
+            return None
+
+        partialHash = hashFile(path, partial=True, logger=self.logger)
+        if partialHash is None:
+            return None
+
+        group = self.originals.setdefault(size, {})
+        original = group.get(partialHash)
+        if original is not None and (original in self.kept or original in waiting):
+            self.kept.add(original)
+            self.duplicates += 1
+            return original
+
+        group[partialHash] = path
+        return None
+
+
+def isDuplicate(path: str, original: str, logger = None) -> bool:
+    '''
+    Compares the full BLAKE2 hashes of a file and the original that the fileScheduler matched it with.  Called by the file handlers,
+    which keep the hashes of the last few originals.
+    '''
+
+    try:
+        fStat = os.stat(original)
+    except OSError:
+        return False
+    originalHash = _originalHash(original, fStat.st_size, fStat.st_mtime_ns)
+    return originalHash is not None and originalHash == hashFile(path, logger=logger)
+
+
+@functools.lru_cache(maxsize=_HASHCACHESIZE)
+def _originalHash(path: str, size: int, mtimeNs: int) -> bytes:
+    # size and mtimeNs are only part of the cache key, so that a file that changes is hashed again
+    return hashFile(path)
+
+
+def hashFile(path: str, partial: bool = False, logger = None) -> bytes:
+    '''Returns the BLAKE2 digest of the file (or just both ends of it), or None if it can't be read'''
+
+    h = hashlib.blake2b(digest_size=32)
+    try:
+        with open(path, 'rb') as f:
+            if partial:
+                h.update(f.read(_PARTIALBYTES))
+                f.seek(0, 2)
+                end = f.tell()
+                if end > 2 * _PARTIALBYTES:
+                    f.seek(end - _PARTIALBYTES)
+                else:
+                    f.seek(min(end, _PARTIALBYTES))
+                h.update(f.read(_PARTIALBYTES))
+            else:
+                while block := f.read(_BLOCKSIZE):
+                    h.update(block)
+    except OSError as e:
+        if logger:
+            logger.debug('%s: Unable to hash file: %s', path, str(e))
+        return None
+    return h.digest()
@@ -2,14 +2,24 @@
 ############ Shared File Handler Functions ###########
 ######################################################
 
-from collections import deque
+import re
+
+_WHITESPACE = re.compile(r'\s+')
 
 class ContentHandler:
+    '''
+    Collects the text from a file handler and hands it back in chunks of about maxContentSize characters for the data handlers.
+
+    Every run of whitespace becomes a single space and the text is kept as whole lines, not as individual words.  Chunks are cut at 
+    the first space at or after maxContentSize - 1 characters, so a chunk never ends part way through a word.
+    '''
+
     def __init__(self, 
                  maxContentSize: int
                 ):
         self.maxContentSize = maxContentSize
-        self.contentBuffer = deque()
+        self.contentBuffer = list()
+        # Length of the buffered lines once joined with spaces, plus one for the space that would follow them
         self.bufferLength = 0
         self.totalBytes = 0
     
@@ -17,12 +27,11 @@ class ContentHandler:
         '''Appends a line of text to the content buffer'''
 
         line = self.replaceChars(line)
-        words = line.split()
         self.totalBytes += len(line)
 
-        for word in words:
-            self.contentBuffer.append(word)
-            self.bufferLength += len(word) + 1
+        if line:
+            self.contentBuffer.append(line)
+            self.bufferLength += len(line) + 1
     
     def contentBufferFull(self) -> bool:
         '''Returns True if the content buffer is full, False otherwise'''
@@ -31,29 +40,32 @@ class ContentHandler:
 
     def replaceChars(self, content: str) -> str:
         '''Replaces characters in a string to make the it simpler for data handler regexes.  
-        Replaces newlines, carriage returns, and tabs with spaces.  Strips the string of leading and trailing whitespace.'''
+        Replaces each run of whitespace (newlines, carriage returns, tabs and so on) with a single space.  Strips the string of leading and trailing whitespace.'''
         
-        return content.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ').strip()
+        return _WHITESPACE.sub(' ', content).strip()
     
     def getContent(self) -> str:
         '''Returns up to maxContentSize amount of data from the buffer'''
 
-        content: list = []
-        contentLength: int = 0
+        content = ' '.join(self.contentBuffer)
 
-        while self.contentBuffer and contentLength < self.maxContentSize:
-            word = self.contentBuffer.popleft()
-            content.append(word)
-            self.bufferLength -= len(word) + 1
-            contentLength += len(word) + 1
+        # Every space is the end of a word.  Cut after the first word that reaches the limit.
+        cut = content.find(' ', max(self.maxContentSize - 1, 0))
+        if cut == -1:
+            self.contentBuffer = list()
+            self.bufferLength = 0
+            return content
 
-        return ' '.join(content)
+        rest = content[cut + 1:]
+        self.contentBuffer = [rest]
+        self.bufferLength = len(rest) + 1
+        return content[:cut]
     
     def finalizeContent(self) -> str:
         '''Returns the remaining content in the buffer'''
 
         content = ' '.join(self.contentBuffer)
         self.bufferLength = 0
-        self.contentBuffer = []
+        self.contentBuffer = list()
         
         return content
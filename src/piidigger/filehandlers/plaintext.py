@@ -1,10 +1,17 @@
 import codecs
+import mmap
+import os
+import re
 from collections.abc import Iterator
+from typing import BinaryIO
 
-from piidigger.getencoding import getEncoding
+# classes imports the file handlers through globalfuncs, so only import the module here
+from piidigger import classes
+from piidigger.getencoding import getEncoding, isAsciiCompatible, readSample
 from piidigger.filehandlers._sharedfuncs import ContentHandler
 from piidigger.globalvars import maxChunkSize
 from piidigger.globalvars import defaultChunkCount
+from piidigger.globalvars import rangeOverlap
 from piidigger.logmanager import LogManager
 
 # Each filehandler must have the following:
@@ -12,6 +19,19 @@ from piidigger.logmanager import LogManager
 #                   This will be read by globals upon initial load to build the full list of supported mime types and file extensions
 #   "processFile" - Function that manages opening and reading of the file.  The main module will call this handler wtih the "processFile(filename)" function.
 #                   processFile should provide the lines of text to each of the dataHandlers
+#
+# File handlers can optionally provide:
+#   "splitFile" -   Function that splits a large file into FileRange parts, which are then read by "readRange" on any of the file handler processes.
+#   "mapFile" -     Function that returns the raw bytes of the file (or of a FileRange) for the data handlers' "findMatchBytes", without decoding 
+#                   it to text.  Returns None if the file can't be scanned that way, in which case it's read with readFile/readRange instead.
+#
+# File handlers that detect the encoding save it on the File object, and readFile takes it back as "encoding" so it's only detected once.
+
+# Block size for reading text files and byte ranges
+_BLOCKSIZE = 1_048_576
+_WHITESPACE = re.compile(rb'[ \t\n\r\x0b\x0c]')
+# Memory-mapped files are scanned in windows of this size
+_WINDOWBYTES = 16_777_216
 
 handles={
     'ext': [
@@ -45,22 +65,18 @@ handles={
 def readFile(filename: str, 
             logManager: LogManager,
             maxChunkCount: int = defaultChunkCount,
+            maxChunkSize: int = maxChunkSize,
+            encoding: str = None,
             ) -> Iterator[str]:
     ''''
-    Handle all file IO and text extraction operations for this file type.  Returns a generator object tied to maxChunkSize (650) * maxChunkCount bytes of text.  
-    "filename" is a string of the path and filename to process.
+    Handle all file IO and text extraction operations for this file type.  Returns a generator of chunks of up to maxChunkSize * maxChunkCount characters of text.  
+    "filename" is a string of the path and filename to process.  "encoding" is the file's encoding if splitFile or mapFile has
+    already detected it.
     '''
 
     logger = logManager.getLogger('plaintext_handler')
-    
-    enc = getEncoding(filename=filename, logManager=logManager)
+    enc = encoding
 
-    if enc == None:
-        logger.info('%s: Unknown encoding type', filename)
-        return ['']
-    else:
-        logger.debug('%s: Encoding %s', filename, enc)
-    
     # After getting the encoding from chardet, replace any unexpected characters with a plain ASCII "?"
     # The risk is we could lose something important, but if that's the one piece of data anywhere on the file system that would have matched,
     # then it's a risk worth taking for a more stable discovery tool.  More likely is that we might miss ONE INSTANCE of data in a file system that has 
@@ -69,32 +85,279 @@ def readFile(filename: str,
     # File IO is the bottle neck but we could also hit some really big files.
     # By returning (through yield) the content in chunks, we can strike a balance between memory consumption and file IO speed.
 
-    # First we open the file, then we add each line so long as the resulting line length remains less than maxContentSize.  
-    # For the last line, we add one word at a time until we reach the limit.  
+    # The file is opened once.  The sample that the encoding is detected from is also the first block of text.
 
     try:
-        with codecs.open(filename, 'r', encoding=enc, errors='replace') as f:
+        with open(filename, 'rb') as f:
+            if enc is None:
+                sample, enc = readSample(f)
+            else:
+                sample = b''
+
+            if enc == None:
+                logger.info('%s: Unknown encoding type', filename)
+                return
+            else:
+                logger.debug('%s: Encoding %s', filename, enc)
+
+            decoder = codecs.getincrementaldecoder(enc)(errors='replace')
             handler: ContentHandler = ContentHandler(maxContentSize = maxChunkSize * maxChunkCount)
-            for line in f:
-                handler.appendContent(line)
-                if handler.contentBufferFull():
-                    yield handler.getContent()
+            yield from _readLines(f, decoder, handler, sample)
 
-    # Once we've processed the entire file, it's time to send that last bit of info that hasn't already been sent.
+        # Once we've processed the entire file, it's time to send that last bit of info that hasn't already been sent.
         logger.debug('%s: Read %d lines', filename, handler.totalBytes)
 
         # Return the last chunk of content    
         yield handler.finalizeContent()
 
     except FileNotFoundError:
-        logger.error('Previously discovered file no longer exists: %s. File skipped', f.absolute())
+        logger.error('Previously discovered file no longer exists: %s. File skipped', filename)
     except PermissionError as e:
-        logger.error('PermissionError adding %s.  File skipped.  Error message: %s', f.absolute(), str(e))
+        logger.error('PermissionError adding %s.  File skipped.  Error message: %s', filename, str(e))
     except OSError as e:
-        logger.error('OSError adding %s.  File skipped.  Error message: %s', f.absolute(), str(e))
+        logger.error('OSError adding %s.  File skipped.  Error message: %s', filename, str(e))
     except UnicodeDecodeError as e:
         logger.error('Unicode error processing file %s (enc=%s): %s', filename, enc, e)
     except LookupError as e:
         logger.error('Codec lookup error processing file %s (enc=%s)', filename, enc)
     except Exception as e:
-        logger.error('Unknown exception on file %s.  File skipped.  Error message: %s', filename, str(e))
\ No newline at end of file
+        logger.error('Unknown exception on file %s.  File skipped.  Error message: %s', filename, str(e))
+
+
+def splitFile(fObj: 'classes.File',
+              rangeBytes: int,
+              logManager: LogManager,
+              ) -> list['classes.FileRange']:
+    '''
+    Splits a large file into FileRange parts of about rangeBytes each.  Returns an empty list if the file can't be split, in which
+    case it should be read with readFile as usual.  Only encodings where whitespace is always a single ASCII byte can be split, 
+    as each part has to be decoded on its own.
+    '''
+
+    logger = logManager.getLogger('plaintext_handler')
+    filename=fObj.getFullPath()
+    size=fObj.getFileSize()
+    
+    enc = fObj.getEncoding()
+    if enc is None:
+        enc = getEncoding(filename=filename, logManager=logManager)
+        # For mapFile and readFile if the file isn't split after all
+        fObj.setEncoding(enc)
+    if not isAsciiCompatible(enc):
+        logger.debug('%s: Encoding %s can\'t be split into byte ranges', filename, enc)
+        return []
+
+    parts=-(-size // rangeBytes)
+    if parts < 2:
+        return []
+
+    logger.info('%s: Splitting %d bytes into %d byte ranges', filename, size, parts)
+    return [classes.FileRange(fObj, part, parts, part * rangeBytes, min((part + 1) * rangeBytes, size), rangeOverlap, enc)
+            for part in range(parts)]
+
+
+def readRange(fileRange: 'classes.FileRange',
+              logManager: LogManager,
+              maxChunkCount: int = defaultChunkCount,
+              maxChunkSize: int = maxChunkSize,
+              ) -> Iterator[str]:
+    '''
+    Reads one FileRange part from splitFile and returns the same chunks of text as readFile would for that part of the file.
+
+    Except for the first part, reading starts at the first whitespace at or after the start of the range.  The word that crosses the 
+    start belongs to the previous part, which reads past its own end by the overlap and then on to the next whitespace.
+    '''
+
+    logger = logManager.getLogger('plaintext_handler')
+    filename = fileRange.getFullPath()
+
+    try:
+        with open(filename, 'rb') as f:
+            start = _nextWhitespace(f, fileRange.start) if fileRange.part > 0 else 0
+            if fileRange.part < fileRange.parts - 1:
+                end = _nextWhitespace(f, fileRange.end + fileRange.overlap)
+            else:
+                end = _nextWhitespace(f, fileRange.end)
+            logger.debug('%s: Reading byte range %d-%d (part %d of %d)', filename, start, end, fileRange.part + 1, fileRange.parts)
+
+            f.seek(start)
+            decoder = codecs.getincrementaldecoder(fileRange.encoding)(errors='replace')
+            handler: ContentHandler = ContentHandler(maxContentSize = maxChunkSize * maxChunkCount)
+            yield from _readLines(f, decoder, handler, remaining=end - start)
+        
+        logger.debug('%s: Read %d bytes', filename, handler.totalBytes)
+        yield handler.finalizeContent()
+
+    except FileNotFoundError:
+        logger.error('Previously discovered file no longer exists: %s. File skipped', filename)
+    except PermissionError as e:
+        logger.error('PermissionError adding %s.  File skipped.  Error message: %s', filename, str(e))
+    except OSError as e:
+        logger.error('OSError adding %s.  File skipped.  Error message: %s', filename, str(e))
+    except LookupError:
+        logger.error('Codec lookup error processing file %s (enc=%s)', filename, fileRange.encoding)
+    except Exception as e:
+        logger.error('Unknown exception on file %s.  File skipped.  Error message: %s', filename, str(e))
+
+
+def mapFile(filename: str,
+            logManager: LogManager,
+            fileRange: 'classes.FileRange' = None,
+            fObj: 'classes.File' = None,
+            ) -> 'MappedText':
+    '''
+    Memory-maps the file (or just the FileRange part of it) so that the data handlers can match the raw bytes with findMatchBytes. 
+    Only ASCII-compatible encodings such as ASCII, UTF-8 and Latin-1 can be scanned this way.  Returns None for anything else, or 
+    if the file can't be mapped, in which case the file should be read with readFile or readRange as usual.
+
+    If fObj is given, the encoding saved on it by splitFile is used, and otherwise the encoding that's detected is saved on it for
+    readFile.
+    '''
+
+    logger = logManager.getLogger('plaintext_handler')
+
+    try:
+        with open(filename, 'rb') as f:
+            if fileRange is not None:
+                enc = fileRange.encoding
+            elif fObj is not None and fObj.getEncoding() is not None:
+                enc = fObj.getEncoding()
+            else:
+                enc = readSample(f)[1]
+                if fObj is not None:
+                    fObj.setEncoding(enc)
+            if not isAsciiCompatible(enc) or os.fstat(f.fileno()).st_size == 0:
+                return None
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        logger.debug('%s: Unable to map file: %s', filename, str(e))
+        return None
+
+    mappedText = MappedText(buffer, enc)
+    if fileRange is not None:
+        if fileRange.part > 0:
+            mappedText.start = mappedText.nextWhitespace(fileRange.start)
+        if fileRange.part < fileRange.parts - 1:
+            mappedText.end = mappedText.nextWhitespace(fileRange.end + fileRange.overlap)
+        logger.debug('%s: Mapped byte range %d-%d (part %d of %d)', filename, mappedText.start, mappedText.end, fileRange.part + 1, fileRange.parts)
+    else:
+        logger.debug('%s: Mapped %d bytes (enc=%s)', filename, mappedText.end, enc)
+
+    return mappedText
+
+
+class MappedText:
+    '''
+    A memory-mapped text file in an ASCII-compatible encoding, as returned by mapFile.  The data handlers match the bytes of 
+    "buffer" directly, one window at a time, and only decode the matches.
+
+    Every window after the first starts at a whitespace byte and reads on past its nominal end by the overlap, and then to the next
+    whitespace, so that a match crossing from one window into the next is still found.  Matches in the overlap can be found twice, 
+    which doesn't matter as the results are sets.
+    '''
+
+    def __init__(self, buffer: mmap.mmap, encoding: str, windowBytes: int = _WINDOWBYTES, overlap: int = rangeOverlap):
+        self.buffer = buffer
+        self.encoding = encoding
+        self.windowBytes = windowBytes
+        self.overlap = overlap
+        self.start = 0
+        self.end = len(buffer)
+        # A match can start or end next to a multi-byte character, which has to be decoded whole
+        self.utf8 = codecs.lookup(encoding).name in ('utf-8', 'utf-8-sig')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.buffer.close()
+
+    def windows(self) -> Iterator[tuple[int, int]]:
+        '''Yields the (start, end) offsets of each window'''
+
+        pos = self.start
+        while pos < self.end:
+            # Reading a mapped page past the end of a file that has been truncated (log rotation, for one) kills the process
+            if self.buffer.size() < len(self.buffer):
+                raise OSError('File was truncated while it was being scanned')
+            nominalEnd = pos + self.windowBytes
+            if nominalEnd >= self.end:
+                yield pos, self.end
+                return
+            yield pos, min(self.nextWhitespace(nominalEnd + self.overlap), self.end)
+            pos = self.nextWhitespace(nominalEnd)
+
+    def decode(self, start: int, end: int) -> str:
+        '''Returns the text from start to end, widened to whole characters'''
+
+        if self.utf8:
+            # UTF-8 continuation bytes are 10xxxxxx.  No character has more than three of them.
+            for _ in range(3):
+                if start > 0 and 0x80 <= self.buffer[start] < 0xc0:
+                    start -= 1
+                if end < len(self.buffer) and 0x80 <= self.buffer[end] < 0xc0:
+                    end += 1
+        return self.buffer[start:end].decode(self.encoding, errors='replace')
+
+    def nextWhitespace(self, pos: int) -> int:
+        '''Returns the offset of the first whitespace byte at or after pos, or the end of the file if there isn't one'''
+
+        m = _WHITESPACE.search(self.buffer, pos)
+        return m.start() if m else len(self.buffer)
+
+
+def _readLines(f: BinaryIO,
+               decoder: codecs.IncrementalDecoder,
+               handler: ContentHandler,
+               block: bytes = b'',
+               remaining: int = None,
+               ) -> Iterator[str]:
+    '''
+    Decodes the file in large blocks and passes the text to the ContentHandler one line at a time, yielding a chunk whenever the
+    handler is full.  Lines are split the same way as the codecs line reader did, so the chunks are the same as before.  "block" is
+    text that has already been read from the file (such as the encoding sample) and "remaining" limits how many more bytes are read.
+    '''
+
+    carry = ''
+    while True:
+        if not block and remaining != 0:
+            block = f.read(_BLOCKSIZE if remaining is None else min(_BLOCKSIZE, remaining))
+            if remaining is not None:
+                remaining -= len(block)
+        final = not block
+
+        # The last line is held back, as it may continue in the next block (even a "\r" could still be followed by "\n")
+        lines = (carry + decoder.decode(block, final=final)).splitlines(keepends=True)
+        carry = '' if final or not lines else lines.pop()
+        block = b''
+
+        # Don't let a file without line breaks pile up in memory.  Hold back just the last word instead.
+        if len(carry) > _BLOCKSIZE:
+            words = carry.rsplit(None, 1)
+            carry = words.pop() if len(words) == 2 else ''
+            lines.extend(words)
+
+        for line in lines:
+            handler.appendContent(line)
+            if handler.contentBufferFull():
+                yield handler.getContent()
+
+        if final:
+            return
+
+
+def _nextWhitespace(f, pos: int) -> int:
+    '''Returns the offset of the first whitespace byte at or after pos, or the end of the file if there isn't one'''
+
+    f.seek(pos)
+    while True:
+        block = f.read(4096)
+        if not block:
+            return f.tell()
+        m = _WHITESPACE.search(block)
+        if m:
+            return pos + m.start()
+        pos += len(block)
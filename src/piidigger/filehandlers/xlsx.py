@@ -38,6 +38,7 @@ handles={
 def readFile(filename: str, 
              logManager: LogManager,
              maxChunkCount: int = defaultChunkCount,
+             maxChunkSize: int = maxChunkSize,
             ) -> Iterator[str]:
     ''''
     Handle all file IO and text extraction operations for this file type.  Returns a list of results that have been validated by each datahandler.  
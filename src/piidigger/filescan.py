@@ -1,4 +1,5 @@
-import pathlib
+import os
+import stat
 from queue import Empty
 import multiprocessing as mp
     
@@ -6,7 +7,9 @@ import multiprocessing as mp
 from piidigger import classes
 from piidigger import globalfuncs
 from piidigger import queuefuncs
-from piidigger.getmime import getMime
+from piidigger.checkpoint import Checkpoint
+from piidigger.getmime import MimeCache
+from piidigger.scanindex import ScanIndex, getFingerprint
 from piidigger.globalvars import SENTINEL
 from piidigger.logmanager import LogManager
 
@@ -17,165 +20,251 @@ except ModuleNotFoundError:
     win32apiLoaded=False
 
 
-def findDirsWorker(config: classes.Config, 
-                   queues: dict, 
-                   totals: dict,
-                   stopEvent: mp.Event,
-                   logManager: LogManager,) -> list:
+def seedDirs(config: classes.Config,
+             queues: dict,
+             totals: dict,
+             checkpoint: Checkpoint = None,):
     '''
-    Expects a config object to start from (to get the startDirs paths)
+    Places the configured startDirs on the shared crawlQ so that the discoveryWorker processes have somewhere to start.
 
-    Populates a queue of all directories that aren't on the excludedDirs list
+    When resuming from a checkpoint, the directories that hadn't been listed yet are used instead.  Directories that had been listed
+    but still had files waiting to be scanned are listed again for their files only, as (directory, False).
+
+    Must be called before the discoveryWorker processes are started.  Otherwise, they'll find no pending work and exit immediately.
     '''
-    
-    
-    try:
-        ctrlc=False
-        logger = logManager.getLogger('findDirsWorker')        
-        
-        logger.info('Starting findDirsWorker')
-
-        localQ=list()
-        i=0
-
-        for d in config.getStartDirs():
-            localQ.append(pathlib.Path(d))
-            queues['dirsQ'].put(pathlib.Path(d))
-            with totals['dirsFound'].get_lock():
-                totals['dirsFound'].value+=1
-
-        while not stopEvent.is_set() or not ctrlc:
-            try:
-                p=localQ[i]
-            except IndexError:
-                break
-            else:
-                i+=1
 
-            
-            try:
-                for subD in p.iterdir():
-                    if stopEvent.is_set():
-                        break
-                    excludeDir=False
-                    try:
-                        if subD.is_dir() and not subD.is_symlink():
-                            for pattern in config.getExcludeDirs():
-                                if str(subD).lower().startswith(pattern.lower()):
-                                    logger.debug('Excluding directory %s matched pattern %s', str(subD), pattern)
-                                    excludeDir=True
-                                    break
-                            if not excludeDir:
-                                logger.debug('Including directory %s', str(subD))
-                                localQ.append(subD)
-                                queues['dirsQ'].put(subD)
-                                with totals['dirsFound'].get_lock():
-                                    totals['dirsFound'].value+=1
-                    except FileNotFoundError:
-                        pass
-                    except OSError as e:
-                        logger.debug('OSError: %s', str(e))
-            except PermissionError as e:
-                logger.debug('PermissionError: %s', str(e))
-            except FileNotFoundError as e:
-                logger.debug('FileNotFoundError: %s', str(e))
-        
-        # All directories have been scanned.  Put the sentinel on the queue for the fileHandlers
-        queues['dirsQ'].put(SENTINEL)
-        queuefuncs.waitOnQ(queues['dirsQ'])
-    except KeyboardInterrupt:
-        logger.info('KeyboardInterrupt received in findDirsWorker')
-        queuefuncs.clearQ(queues['dirsQ'])
-    finally:
-        # All directories have been scanned.  Send the sentinel message to shutdown the consumer threads
-        logger.info('Found %d folders', totals['dirsFound'].value)
-        logger.info('Stopping %s (PID=%d)', mp.current_process().name, mp.current_process().pid)
+    if checkpoint is None:
+        seeds=[str(d) for d in config.getStartDirs()]
+    else:
+        seeds=checkpoint.getPendingDirs() + [(d, False) for d in checkpoint.getPartialDirs()]
 
-        
-def findFilesWorker(config: classes.Config, 
+    for d in seeds:
+        queues['crawlQ'].put(d)
+        with totals['dirsPending'].get_lock():
+            totals['dirsPending'].value+=1
+        with totals['dirsFound'].get_lock():
+            totals['dirsFound'].value+=1
+
+
+def discoveryWorker(config: classes.Config, 
                     queues: dict, 
                     totals: dict,
                     stopEvent: mp.Event,
-                    logManager: LogManager,) -> list:
+                    logManager: LogManager,):
     '''
-    Inputs: Config(config), dirsQ as consumer, filesQ as producer
+    Consumes the shared crawlQ (see seedDirs) and places identified files on the filesQ for one of the file handler workers to pick up.
 
-    Places identified files on the filesQ for one of the file handler workers to pick it up
+    Each directory is listed exactly once.  That single listing provides both the subdirectories to crawl next (unless they're on the 
+    excludedDirs list) and the candidate files in the directory.
+
+    Several discoveryWorker processes share the crawl.  Each one works depth-first from a private stack and, whenever the shared 
+    crawlQ runs dry, donates the shallowest half of its stack (the biggest pending subtrees) back to crawlQ for idle workers to steal.
+    totals['dirsPending'] counts directories that have been found but not yet listed.  When it reaches zero, discovery is complete.
     '''
     
-    
+    checkpoint=None
     try:
         logger = logManager.getLogger(name=mp.current_process().name,)
         
         logger.info('Starting %s', mp.current_process().name)
 
-        while True:
-            if stopEvent.is_set():
-                break
-            item=queuefuncs.getItem(queues['dirsQ'])
-            if item == SENTINEL:
-                break
-            if item == None:
-                continue
-
-            # Path-ify the directory name
-            d=pathlib.Path(item)
+        localStack=list()
+        batch=list()
+        batchSize=config.getFilesBatchSize()
+        fileExts=frozenset(config.getFileExts())
+        mimeTypes=frozenset(config.getMimeTypes())
+        mimeCache=MimeCache(config.getMimeCacheFile() if mimeTypes else '', logger)
+        scanIndex=ScanIndex(config.getScanIndexFile(), getFingerprint(config.getDataHandlers(), config.getMaxMatchesPerFile()), readOnly=True, logger=logger) if config.getScanIndexFile() else None
+        unchangedFiles=0
+        checkpoint=Checkpoint(config.getCheckpointFile(), config.getCheckpointInterval(), logger) if config.getCheckpointFile() else None
+        resume=checkpoint is not None and config.getResume()
+        resumedFiles=0
+
+        while not stopEvent.is_set():
+            if localStack:
+                d=localStack.pop()
+            else:
+                # Don't hold on to a partial batch while waiting for more work
+                if batch:
+                    batch=sendBatch(batch, queues, totals)
+                d=queuefuncs.getItem(queues['crawlQ'])
+                if d is None:
+                    if totals['dirsPending'].value == 0:
+                        break
+                    continue
+            
+            # Directories from seedDirs that only need their files listed again after resuming a scan
+            listDirs=True
+            if isinstance(d, tuple):
+                d, listDirs=d
+
+            logger.info('Scanning directory: %s', d)
+            subDirs, files = scanDir(d, logger, listDirs=listDirs)
             with totals['dirsScanned'].get_lock():
                 totals['dirsScanned'].value+=1
-            
-            try: 
-                logger.info('Scanning directory: %s', str(d))
-                for f in d.iterdir():
-                    screenItem=fileChecks(f, config)           
-                    if all(screenItem):
-                        mimeType = getMime(f)
-                        match=fileMatches(f, config.getFileExts(), config.getMimeTypes())
-                        if match:
-                            fObj=classes.File(f, mimeType)
-                            logger.debug('Initialized File object for %s, mimeType=%s, times=%s, handler=%s', 
-                                         fObj.getFullPath(), 
-                                         mimeType, 
-                                         str(fObj.getTimeStamps()), 
-                                         fObj.getFileHandlerName())
-                            queues['filesQ'].put(fObj)
-                            with totals['filesFound'].get_lock():
-                                totals['filesFound'].value+=1
-                            with totals['bytesFound'].get_lock():
-                                totals['bytesFound'].value+=fObj.getFileSize()
-                        else:
-                            logger.debug('%s: Item not added (suffix: %s | mime: %s)', f, f.suffix, mimeType)
+
+            newDirs=list()
+            for subD in subDirs:
+                pattern=config.getExcludeMatch(subD)
+                if resume and checkpoint.isDirDone(subD):
+                    # Already listed before the scan was interrupted.  Anything left to do below it was seeded by seedDirs.
+                    logger.debug('Skipping directory %s already listed before resuming', subD)
+                elif pattern is None:
+                    logger.debug('Including directory %s', subD)
+                    newDirs.append(subD)
+                else:
+                    logger.debug('Excluding directory %s matched pattern %s', subD, pattern)
+
+            # Count the children as pending before this directory is marked as done so that dirsPending can't drop to zero early
+            if newDirs:
+                with totals['dirsFound'].get_lock():
+                    totals['dirsFound'].value+=len(newDirs)
+                with totals['dirsPending'].get_lock():
+                    totals['dirsPending'].value+=len(newDirs)
+                localStack.extend(newDirs)
+
+            # Share work with any idle workers
+            if len(localStack) > 1 and queues['crawlQ'].empty():
+                half=len(localStack) // 2
+                for subD in localStack[:half]:
+                    queues['crawlQ'].put(subD)
+                del localStack[:half]
+
+            foundFiles=list()
+            for f, fStat in files:
+                screenItem=fileChecks(f, fStat, config)
+                if all(screenItem):
+                    match, mimeType = fileMatches(f.path, fStat, fileExts, mimeTypes, mimeCache)
+                    if match and resume and checkpoint.isDone(f.path):
+                        logger.debug('%s: Already scanned before resuming', f.path)
+                        resumedFiles+=1
+                    elif match:
+                        foundFiles.append(f.path)
+                        fObj=classes.File(f.path, mimeType, fStat)
+                        if scanIndex is not None:
+                            # Unchanged files still go down the pipeline so that their previous results are reported, but they won't be read again
+                            cached=scanIndex.lookup(f.path, fStat)
+                            if cached is not None:
+                                fObj.setCachedMatches(*cached)
+                                unchangedFiles+=1
+                        logger.debug('Initialized File object for %s, mimeType=%s, times=%s, handler=%s', 
+                                     fObj.getFullPath(), 
+                                     mimeType, 
+                                     str(fObj.getTimeStamps()), 
+                                     fObj.getFileHandlerName())
+                        batch.append(fObj)
+                        if len(batch) >= batchSize:
+                            batch=sendBatch(batch, queues, totals)
                     else:
-                        logger.debug('%s: Item failed file checks (isFile=%s, isNotZero=%s, isLocalFile=%s)', f, screenItem[0], screenItem[1], screenItem[2])
-            except PermissionError as e:
-                logger.debug('PermissionError: %s', str(e))
-            except FileNotFoundError:
-                pass
-            except OSError as e:
-                logger.debug('OSError: %s', str(e))
-
-        # All files have been identified.  Put the sentinel on the queue for the fileHandlers 
-        queues['filesQ'].put(SENTINEL)
-        queuefuncs.waitOnQ(queues['filesQ'])
+                        logger.debug('%s: Item not added (suffix: %s | mime: %s)', f.path, os.path.splitext(f.name)[1], mimeType)
+                else:
+                    logger.debug('%s: Item failed file checks (isFile=%s, isNotZero=%s, isLocalFile=%s)', f.path, screenItem[0], screenItem[1], screenItem[2])
+
+            # The directory is only recorded once everything in it has been found
+            if checkpoint is not None:
+                checkpoint.addDir(d, newDirs, foundFiles)
+
+            with totals['dirsPending'].get_lock():
+                totals['dirsPending'].value-=1
+        
+        if batch:
+            batch=sendBatch(batch, queues, totals)
+        mimeCache.close()
+        if scanIndex is not None:
+            scanIndex.close()
+            logger.info('%d unchanged files found in the scan index', unchangedFiles)
+        if resume:
+            logger.info('%d files already scanned before resuming', resumedFiles)
     except KeyboardInterrupt:
-        logger.info('KeyboardInterrupt received in findFilesWorker')
-        queuefuncs.clearQ(queues['dirsQ'])
+        logger.info('KeyboardInterrupt received in %s', mp.current_process().name)
+        queuefuncs.clearQ(queues['crawlQ'])
         queuefuncs.clearQ(queues['filesQ'])
+    else:
+        # Only the last discoveryWorker to finish puts the sentinel on the queue for the fileHandlers
+        with totals['discoveryWorkersDone'].get_lock():
+            totals['discoveryWorkersDone'].value+=1
+            lastWorker=totals['discoveryWorkersDone'].value == config.getMaxFilesScanProcs()
+        if lastWorker:
+            queues['filesQ'].put(SENTINEL)
+            queuefuncs.waitOnQ(queues['filesQ'])
     finally:
-        logger.info('Found %d files', totals['filesFound'].value)
+        # Keep everything that was found up to here, even if the scan was interrupted
+        if checkpoint is not None:
+            checkpoint.close()
+        logger.info('Found %d folders and %d files', totals['dirsFound'].value, totals['filesFound'].value)
         logger.info('Stopping %s (PID=%d)', mp.current_process().name, mp.current_process().pid)
 
 
-def fileChecks(f: pathlib.Path, 
+def sendBatch(batch: list,
+              queues: dict,
+              totals: dict,) -> list:
+    '''
+    Puts a batch of File objects on the filesQ as a single item and updates the totals.  Sending files in batches means one 
+    pickle, one lock and one pipe write per batch instead of per file.
+
+    Returns a new, empty batch.
+    '''
+
+    queues['filesQ'].put(batch)
+    with totals['filesFound'].get_lock():
+        totals['filesFound'].value+=len(batch)
+    with totals['bytesFound'].get_lock():
+        totals['bytesFound'].value+=sum(fObj.getFileSize() for fObj in batch)
+
+    return list()
+
+
+def scanDir(d: str,
+            logger,
+            listDirs: bool = True,
+            listFiles: bool = True,) -> tuple:
+    '''
+    Lists a single directory with os.scandir, relying on the DirEntry type cache so that most entries need no extra syscalls.
+
+    Returns a tuple of (subDirs, files) where:
+        subDirs is a list of directory paths (symlinked directories are skipped)
+        files is a list of (DirEntry, stat_result) tuples.  Each file is stat'ed exactly once and the result is reused downstream.
+    '''
+
+    subDirs=list()
+    files=list()
+
+    try:
+        with os.scandir(d) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if listDirs:
+                            subDirs.append(entry.path)
+                    elif listFiles and entry.is_file():
+                        files.append((entry, entry.stat()))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.debug('OSError: %s', str(e))
+    except PermissionError as e:
+        logger.debug('PermissionError: %s', str(e))
+    except FileNotFoundError as e:
+        logger.debug('FileNotFoundError: %s', str(e))
+    except OSError as e:
+        logger.debug('OSError: %s', str(e))
+
+    return (subDirs, files)
+
+
+def fileChecks(f: os.DirEntry, 
+               fStat: os.stat_result,
                config: classes.Config) -> tuple:
     '''
     Performs initial checks to see if the item is a file, has content, and is local (e.g. OneDrive file already local file system)
+    Uses the stat result already collected by scanDir instead of stat'ing the file again.
     Returns a tuple of (isFile, isNotZero, isLocalFile)
     '''
     recallMask=0x400000
     offlineMask=0x1000
 
-    isFile = f.is_file() 
-    isNotZero = f.stat().st_size > 0
+    isFile = stat.S_ISREG(fStat.st_mode)
+    isNotZero = fStat.st_size > 0
 
     # Checks if the file is local.  Non-local OneDrive and Dropbox files will be skipped.
     # https://superuser.com/questions/1718444/determining-if-a-onedrive-file-is-synced-locally-via-a-terminal
@@ -185,7 +274,7 @@ def fileChecks(f: pathlib.Path,
     # And the Dropbox behavior is from direct observation
     if win32apiLoaded and config.getLocalFilesOnly():
         try:
-            attr=GetFileAttributes(str(f))
+            attr=GetFileAttributes(f.path)
         except Exception:
             # The most common exception is that the file is in use, which means its local. But, when in doubt, assume it's a local file.
             isLocalFile=True
@@ -200,11 +289,25 @@ def fileChecks(f: pathlib.Path,
 
     return (isFile, isNotZero, isLocalFile)
 
-def fileMatches(f: pathlib.Path, fileExts: list, mimeTypes: list) -> bool:
-    extFound = f.suffix in fileExts
-    mimeFound = getMime(f) in mimeTypes
-
-    return extFound or mimeFound
+def fileMatches(f: str, 
+                fStat: os.stat_result,
+                fileExts: frozenset, 
+                mimeTypes: frozenset,
+                mimeCache: MimeCache) -> tuple:
+    '''
+    Decides whether a file should be scanned.  Returns a tuple of (match, mimeType)
 
+    The extension is checked first and, if it's a supported extension, the file content is never read.  Only when the extension 
+    doesn't match (and MIME detection is enabled) is the content sniffed -- once, and through the MIME cache.  mimeType is None
+    whenever the decision was made from the extension alone.
+    '''
 
+    if os.path.splitext(f)[1] in fileExts:
+        return (True, None)
+    
+    if not mimeTypes:
+        return (False, None)
+    
+    mimeType = mimeCache.getMime(f, fStat)
 
+    return (mimeType in mimeTypes, mimeType)
@@ -1,28 +1,46 @@
+import codecs
+import functools
+import re
 from logging import INFO
+from typing import BinaryIO
 
 from chardet import UniversalDetector
 
+from piidigger.globalvars import encodingSampleBytes
 from piidigger.logmanager import LogManager
 
+# Checked in order, as the UTF-32 LE BOM starts with the UTF-16 LE BOM.  The names are the ones chardet uses.
+_BOMS = (
+    (codecs.BOM_UTF8, 'UTF-8-SIG'),
+    (codecs.BOM_UTF32_LE, 'UTF-32'),
+    (codecs.BOM_UTF32_BE, 'UTF-32'),
+    (codecs.BOM_UTF16_LE, 'UTF-16'),
+    (codecs.BOM_UTF16_BE, 'UTF-16'),
+)
+# NUL bytes and the escape sequences that chardet looks for always go to chardet
+_NOTTEXT = re.compile(rb'\x00|\x1b|~\{')
+_FEEDBYTES = 4096
+# How much of each file the encoding is detected from.  Each file handler process sets this from [performance]encodingSampleBytes.
+_sampleBytes = encodingSampleBytes
+
+def setSampleBytes(sampleBytes: int):
+    '''Sets the sample size used by getEncoding and readSample when they aren't given one'''
+
+    global _sampleBytes
+    _sampleBytes = sampleBytes
+
 def getEncoding(filename: str,
-                logManager: LogManager,) -> str:
+                logManager: LogManager,
+                sampleBytes: int = None,) -> str:
     '''
-    Uses chardet to indenty the file encoding by reading MAXLINES of data.
-
+    Identifies the file encoding from the first sampleBytes of the file (see setSampleBytes for the default).  See detectEncoding.
     '''
 
     logger = logManager.getLogger('getEncoding')
-    detector = UniversalDetector()
-    detector.logger.level=INFO
-        
+
     try:
         with open(filename, 'rb') as f:
-            for line in f.readlines():
-                detector.feed(line)
-                if detector.done: 
-                    break
-        detector.close()
-        guess=detector.result['encoding']
+            _, guess = readSample(f, sampleBytes)
     except Exception as e:
         logger.info('%s: %s', filename, str(e))
         # Mimic the chardet.detector output to preserve code integrety for function consumers
@@ -30,4 +48,83 @@ def getEncoding(filename: str,
     
     logger.debug('Filename %s chardet results: %s', filename, str(guess))
 
-    return guess
\ No newline at end of file
+    return guess
+
+def readSample(f: BinaryIO,
+               sampleBytes: int = None,) -> tuple[bytes, str]:
+    '''
+    Reads up to sampleBytes from a file opened in binary mode and identifies the encoding from them.  Returns the sample along with
+    the encoding, so that the caller can carry on reading the file from where the sample ended instead of reading it all again.
+    '''
+
+    if sampleBytes is None:
+        sampleBytes = _sampleBytes
+    sample = f.read(sampleBytes)
+    return sample, detectEncoding(sample, complete=len(sample) < sampleBytes)
+
+def detectEncoding(sample: bytes,
+                   complete: bool = True,) -> str:
+    '''
+    Identifies the encoding of a sample of bytes from the start of a file.  complete is False if the file continues past the sample.
+
+    Most files are settled without chardet:
+        - A byte order mark identifies the UTF encodings, exactly as chardet would.
+        - Pure ASCII text is "ascii", which is also what chardet would say.  If there's more to the file than the sample, it's 
+          "utf-8" instead, which decodes the ASCII the same way but doesn't lose any non-ASCII characters further on.
+        - Text that decodes cleanly as UTF-8 is "utf-8".
+    Anything else (including NUL bytes, which could be UTF-16 without a BOM, and escape sequences, which could be ISO-2022) is left 
+    to chardet.  Returns None if the encoding can't be identified, which includes empty files.
+    '''
+
+    if not sample:
+        return None
+
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    if not _NOTTEXT.search(sample):
+        if sample.isascii():
+            return 'ascii' if complete else 'utf-8'
+        try:
+            # A multi-byte character could be cut in half at the end of the sample
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            pass
+
+    detector = UniversalDetector()
+    detector.logger.level=INFO
+    for i in range(0, len(sample), _FEEDBYTES):
+        detector.feed(sample[i:i + _FEEDBYTES])
+        if detector.done: 
+            break
+    detector.close()
+    return detector.result['encoding']
+
+def isAsciiCompatible(encoding: str) -> bool:
+    '''
+    Returns True if every ASCII character, and whitespace in particular, is encoded as the same single byte in this encoding and 
+    that byte is never part of a longer character.  Files in these encodings can be split on any whitespace byte and each piece
+    decoded on its own.  This covers ASCII, UTF-8 and the single-byte code pages, but not UTF-16/32, the East Asian multi-byte 
+    encodings or the stateful ISO-2022 family.
+    '''
+
+    try:
+        name=codecs.lookup(encoding).name
+    except (LookupError, TypeError):
+        return False
+    return _isAsciiCompatible(name)
+
+# Called for every plain text file, but only depends on the codec
+@functools.lru_cache(maxsize=None)
+def _isAsciiCompatible(name: str) -> bool:
+    if name in ('ascii', 'utf-8', 'utf-8-sig'):
+        return True
+
+    # Any byte that the decoder holds on to is the start of a multi-byte sequence (or an escape sequence for the stateful encodings)
+    decoder=codecs.getincrementaldecoder(name)(errors='replace')
+    if not all(len(decoder.decode(bytes([b]))) == 1 for b in range(256)):
+        return False
+    ascii=bytes(range(128))
+    return codecs.decode(ascii, name, 'replace') == ascii.decode('ascii')
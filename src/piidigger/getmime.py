@@ -4,7 +4,9 @@
 moduleName='getmime'
 
 import os
+import sqlite3
 import sys
+import time
 
 try:
     import puremagic 
@@ -20,14 +22,132 @@ def getMime(filename: str) -> str:
     if os.path.isdir(filename):
         return "Directory"
     
+    return _fromFile(filename)
+
+def _fromFile(filename: str) -> str:
     try:
         mimeType = puremagic.from_file(filename, mime=True) if testMagic() else None
     except Exception: 
         mimeType = None
-        
     
     return mimeType
 
+
+class MimeCache:
+    '''
+    Caches MIME sniffing results so that each file's content is sniffed at most once.
+
+    Results are keyed by (device, inode, mtime, size) rather than by path, so hard links share a single entry and any change to the
+    file invalidates it.  If dbFile is provided, results are also kept in a SQLite database so they survive between runs.  
+    Each process should create its own MimeCache.
+
+    Every entry records when it was last used.  A modified or deleted file leaves an entry behind that's never used again, so when
+    the cache is closed, only the maxEntries most recently used entries are kept.
+    '''
+
+    _NOTFOUND = object()
+    _SAVEINTERVAL = 1000
+    _MAXENTRIES = 250_000
+
+    def __init__(self, dbFile: str = '', logger = None, maxEntries: int = _MAXENTRIES):
+        self.cache: dict = {}
+        self.pending: list = []
+        # Entries read from the database, whose last use needs updating
+        self.used: list = []
+        self.logger = logger
+        self.maxEntries = maxEntries
+        self.now = int(time.time())
+        self.db = None
+
+        if dbFile:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(dbFile)), exist_ok=True)
+                self.db = sqlite3.connect(dbFile, timeout=30)
+                self.db.execute('PRAGMA journal_mode=WAL')
+                # Caches from older versions don't record when each entry was used.  They're only a cache, so start again.
+                if 'used' not in [row[1] for row in self.db.execute('PRAGMA table_info(mime)')]:
+                    self.db.execute('DROP TABLE IF EXISTS mime')
+                self.db.execute('CREATE TABLE IF NOT EXISTS mime (key TEXT PRIMARY KEY, mime TEXT, used INTEGER)')
+                self.db.execute('CREATE INDEX IF NOT EXISTS mime_used ON mime (used)')
+                self.db.commit()
+            except (OSError, sqlite3.Error) as e:
+                self._dbError(e)
+
+    def getMime(self, filename: str, fStat: os.stat_result) -> str:
+        '''Returns the MIME type of the file, sniffing the file content only if it hasn't been seen before'''
+
+        # Some platforms (e.g. os.scandir on Windows) don't provide inode numbers.  Without one, the key isn't unique, so don't cache.
+        if not fStat.st_ino:
+            return _fromFile(filename)
+
+        key = '%d:%d:%d:%d' % (fStat.st_dev, fStat.st_ino, fStat.st_mtime_ns, fStat.st_size)
+        mimeType = self.cache.get(key, self._NOTFOUND)
+        if mimeType is not self._NOTFOUND:
+            return mimeType
+        
+        if self.db is not None:
+            try:
+                row = self.db.execute('SELECT mime FROM mime WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error as e:
+                self._dbError(e)
+                row = None
+            if row is not None:
+                self.cache[key] = row[0]
+                self.used.append((self.now, key))
+                return row[0]
+
+        mimeType = _fromFile(filename)
+        self.cache[key] = mimeType
+        if self.db is not None:
+            self.pending.append((key, mimeType, self.now))
+        if len(self.pending) + len(self.used) >= self._SAVEINTERVAL:
+            self.save()
+        
+        return mimeType
+
+    def save(self):
+        '''Writes any newly-sniffed results, and when the entries read from the database were used, to the database'''
+
+        if self.db is None or not (self.pending or self.used):
+            return
+        try:
+            with self.db:
+                self.db.executemany('INSERT OR REPLACE INTO mime (key, mime, used) VALUES (?, ?, ?)', self.pending)
+                self.db.executemany('UPDATE mime SET used = ? WHERE key = ?', self.used)
+        except sqlite3.Error as e:
+            self._dbError(e)
+        self.pending = []
+        self.used = []
+
+    def prune(self):
+        '''Drops all but the maxEntries most recently used entries from the database'''
+
+        if self.db is None:
+            return
+        try:
+            with self.db:
+                if self.db.execute('SELECT COUNT(*) FROM mime').fetchone()[0] > self.maxEntries:
+                    self.db.execute('DELETE FROM mime WHERE key IN (SELECT key FROM mime ORDER BY used DESC LIMIT -1 OFFSET ?)', (self.maxEntries,))
+        except sqlite3.Error as e:
+            self._dbError(e)
+
+    def close(self):
+        self.save()
+        self.prune()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def _dbError(self, e: Exception):
+        # The cache is only an optimization.  If the database can't be used, carry on with the in-memory cache.
+        if self.logger:
+            self.logger.info('MIME cache database disabled: %s', str(e))
+        try:
+            self.db.close()
+        except Exception:
+            pass
+        self.db = None
+
 def main():
     if testMagic():
         for arg in sys.argv[1:]:
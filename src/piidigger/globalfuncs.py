@@ -3,6 +3,7 @@ from queue import Empty
 import os
 import ctypes
 import platform
+from itertools import islice
 from time import sleep
 
 
@@ -10,7 +11,10 @@ from piidigger import console
 from piidigger import filehandlers as fh
 from piidigger import datahandlers as dh
 from piidigger import outputhandlers as oh
+from piidigger.globalvars import defaultChunkCount
+from piidigger.globalvars import encodingSampleBytes
 from piidigger.globalvars import maxChunkSize
+from piidigger.globalvars import rangeOverlap
 
 
 # Dynamically build the supported file handlers based on the contents of the filehandlers package.
@@ -20,6 +24,11 @@ from piidigger.globalvars import maxChunkSize
 
 fileHandlers={ handler: getattr(getattr(fh, handler), 'handles') for handler in fh.__dir__() if not handler.startswith('_') }
 
+# Supported values for [performance]schedule.  The first one is the default.
+#   largest:    Hand out the largest files discovered so far first (see scheduler.py)
+#   fifo:       Scan files in the order they are discovered
+scheduleModes=['largest', 'fifo',]
+
 # Leave these in here as reference until I write more file handlers.
 # fileHandlers={
 #     'archive': {
@@ -127,6 +136,23 @@ def getDefaultConfig() -> dict:
             'windows': ['C:\\Windows', 'C:\\Program Files (x86)', 'C:\\Program Files',], 
             'linux': ['/boot', '/dev', '/etc', '/proc', '/run', '/snap', '/sys', '/usr/bin', '/usr/lib', '/usr/lib32', '/usr/lib64', '/usr/libx32', '/usr/local', '/usr/sbin', '/usr/share', '/usr/src/', '*/.vscode-server', '/mnt/c', '/mnt/d', '/mnt/wslg', '/wsl'],
             'darwin': ["/dev", '/etc', '/usr/bin', '/usr/local/Homebrew', '/usr/lib', '/usr/sbin', '/Applications', '/Library/Developer', '/Library/Documentation', '/System',]},
+        'performance': {'checkpointFile': '',
+                        'checkpointInterval': 60,
+                        'chunkAutoTune': False,
+                        'chunkCount': defaultChunkCount,
+                        'chunkSize': maxChunkSize,
+                        'dedup': True,
+                        'dedupMinBytes': 4096,
+                        'discoveryProcs': 0,
+                        'encodingSampleBytes': encodingSampleBytes,
+                        'filesBatchSize': 100,
+                        'maxMatchesPerFile': 0,
+                        'mimeCacheFile': 'logs/mimecache.db',
+                        'scanIndexFile': '',
+                        'schedule': 'largest',
+                        'scheduleBatchBytes': 16_777_216,
+                        'splitFileBytes': 268_435_456,
+                        'splitRangeBytes': 67_108_864,},
         'logging': {'logLevel': 'INFO', 
                     'logFile': 'logs/piidigger.log'}
         }
@@ -139,6 +165,24 @@ def getEnabledDataHandlerModules(moduleNames: list):
     return [getDataHandlerModule(name) for name in moduleNames]
 
 
+def getDataHandlersForFile(dataHandlerModules: list, fileHandlerName: str) -> list:
+    '''
+    Returns the data handlers that can find something in the text from a file handler.  Each data handler can limit itself to some
+    file handlers with "fileHandlers".
+    '''
+
+    return [handler for handler in dataHandlerModules if getattr(handler, 'fileHandlers', None) is None or fileHandlerName in handler.fileHandlers]
+
+
+def getMaxMatchLength(dataHandlerModules: list) -> int:
+    '''
+    Returns the length of the longest text that any of the data handlers can match.  Each data handler declares this in 
+    "maxMatchLength".  Data handlers that don't are given the same overlap as the byte ranges of a split file.
+    '''
+
+    return max((getattr(handler, 'maxMatchLength', rangeOverlap) for handler in dataHandlerModules), default=0)
+
+
 def getFileHandlerName(ext: str, mime: str) -> str:
     '''
     Receives a file extension and MIME type
@@ -184,7 +228,12 @@ def getOSType() -> str:
 
 
 def getSupportedDataHandlerNames() -> list:
-    return [n for n in dh.__dir__() if not n.startswith("__")]
+    '''
+    Returns the names of the data handlers in the datahandlers package.  A data handler is a module with at least a "dhName" and a
+    "findMatch" function (see datahandlers/__init__.py).
+    '''
+
+    return [n for n in dh.__dir__() if not n.startswith('_') and hasattr(getattr(dh, n), 'dhName') and callable(getattr(getattr(dh, n), 'findMatch', None))]
 
 
 def getSupportedFileExts() -> list:
@@ -221,40 +270,39 @@ def isAdmin() -> bool:
     return check
 
 
-def makeChunks(s: str, chunkSize: int=maxChunkSize) -> list:
-    '''Breaks up a string into smaller strings not larger than chunkSize'''
-
-    words = s.split()
-    wordNum = 0
-    chunks=list()
-
-    while wordNum<len(words):
-        chunk=str()
-        while len(chunk) < chunkSize and wordNum < len(words):
-            if len(words[wordNum]) > chunkSize:
-                # Break up super-long strings into shorter words and add them to the word list
-                chunkList = [words[wordNum][i:i+chunkSize] for i in range(0, len(words[wordNum]), chunkSize)]
-                words = [*words, *chunkList]
-            else:
-                # Add the next word to the current chunk
-                chunk+=words[wordNum] + ' '
-            wordNum+=1
-            
-        # Add the current chunk to the list of chunks
-        chunks+=[chunk.strip()]
+def getOverlap(content: str, overlap: int) -> str:
+    '''
+    Returns the words at the end of content that have to be carried over to the next chunk.  Any match that starts in the last 
+    overlap characters is complete in the words that are returned.
+    '''
 
-    return chunks
+    if overlap <= 0:
+        return ''
+    return content[content.rfind(' ', 0, max(len(content) - overlap, 0)) + 1:]
 
 
 def processMatches(results: dict, 
                    matches: dict, 
-                   dhName: str) -> dict:
+                   dhName: str,
+                   maxMatches: int = 0,) -> dict:
     
-    '''Process the results from RE matches and add them to the results dictionary'''
+    '''
+    Process the results from RE matches and add them to the results dictionary.  If maxMatches is set, no more than that many distinct
+    matches are kept for the data handler ([performance]maxMatchesPerFile).  If any are left out, the data handler is added to
+    results['truncated'].
+    '''
 
     for key in matches.keys():
         value = matches[key]
         if value:
+            if maxMatches:
+                room = maxMatches - countMatches(results['matches'].get(dhName, {}))
+                new = set(value).difference(results['matches'].get(dhName, {}).get(key, ()))
+                if len(new) > room:
+                    results.setdefault('truncated', set()).add(dhName)
+                    if room <= 0:
+                        break
+                    value = set(islice(new, room))
             if not dhName in results['matches']:
                 results['matches'][dhName]=dict()
             if not key in results['matches'][dhName]:
@@ -264,6 +312,12 @@ def processMatches(results: dict,
     return results
 
 
+def countMatches(matches: dict) -> int:
+    '''Returns the number of distinct matches that one data handler found, from its dictionary of 'brand': set(matches) (or lists)'''
+
+    return sum(len(values) for values in matches.values())
+
+
 def progressLine(*pargs, **kwargs):
     '''
     Prints a status line that includes details about directories, files, and results
@@ -335,6 +389,11 @@ def writeDefaultConfig(tomlFile: str):
     for key in ['windows', 'linux', 'darwin']:
         lines.append(_tomlfy(key, defaultConfig['excludeDirs'][key]))
     
+    lines.append('')
+    lines.append('[performance]')
+    for key in defaultConfig['performance'].keys():
+        lines.append(_tomlfy(key, defaultConfig['performance'][key]))
+    
     lines.append('')
     lines.append('[logging]')
     for key in ['logLevel', 'logFile']:
@@ -6,7 +6,11 @@ errorCodes={
 }
 
 defaultChunkCount=100_000
+# Encoding detection only reads this much of each file
+encodingSampleBytes = 65_536
 excelBlankRowLimit=250
 excelBlankColLimit=500
 maxChunkSize = 650
+# When a large file is split into byte ranges, each range is read this far into the next one so that matches across the seam are still found
+rangeOverlap = 4096
 SENTINEL = '!!!STOPQUEUE!!!'
\ No newline at end of file
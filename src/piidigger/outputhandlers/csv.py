@@ -10,7 +10,8 @@ from piidigger.logmanager import LogManager
 def processResult(outFilename: str,
                   queue: mp.Queue,
                   stopEvent: mp.Event,
-                  logManager: LogManager,):
+                  logManager: LogManager,
+                  truncatedColumn: bool = False,):
     
     
     try:
@@ -20,6 +21,9 @@ def processResult(outFilename: str,
         with open(outFilename, 'w', newline='', encoding='utf-8') as of:
             # Create a CSV writer object
             field_names = ['filename', 'datatype', 'value',]
+            # Only if [performance]maxMatchesPerFile is set.  "truncated" is True for the data handlers whose results it cut short.
+            if truncatedColumn:
+                field_names.append('truncated')
             writer = csv.DictWriter(of, quoting=csv.QUOTE_MINIMAL, fieldnames=field_names)
             writer.writeheader()
             while True:
@@ -31,8 +35,11 @@ def processResult(outFilename: str,
                 if item ==  None:
                     continue
                 filename = item['filename']
+                truncated = item.get('truncated', [])
                 flattened_list: list[dict] = flatten_matches(matches = item['matches'], filename=filename,)
                 for flattened_item in flattened_list:
+                    if truncatedColumn:
+                        flattened_item['truncated'] = flattened_item['datatype'] in truncated
                     writer.writerow(flattened_item)
     except KeyboardInterrupt:
         pass
@@ -19,10 +19,17 @@ except ImportError:
     pass
 
 import piidigger.classes as classes
+from piidigger import checkpoint
+from piidigger import chunktuner
+from piidigger import collector
 from piidigger import console
+from piidigger import dedup
 from piidigger import filescan
+from piidigger import getencoding
 from piidigger import globalfuncs
 from piidigger import queuefuncs
+from piidigger import scanengine
+from piidigger import scheduler
 from piidigger import __version__
 from piidigger.globalvars import errorCodes
 from piidigger.globalvars import SENTINEL
@@ -78,6 +85,39 @@ def commandLineParser() -> argparse.ArgumentParser:
         type=int,
         help='Override the number processes to use for searching files.  Will use the lesser of CPU cores or this value.  On production servers, consider setting this to less than the number of physical CPUs.  See \'--cpu-count\' below.',
         )
+    configControl.add_argument(
+        '--discovery-process',
+        dest='discoveryProc',
+        default=0,
+        type=int,
+        help='Override the number of processes used to discover directories and files.  By default, one discovery process is started for every four file handler processes.  Wide network shares may benefit from more.',
+        )
+    configControl.add_argument(
+        '--resume',
+        dest='resume',
+        action='store_true',
+        help='Resume an interrupted scan from the checkpoint file ([performance]checkpointFile).  Use the same configuration file as the interrupted scan.',
+        )
+    configControl.add_argument(
+        '--chunk-size',
+        dest='chunkSize',
+        default=0,
+        type=int,
+        help='Override [performance]chunkSize.  File handlers pass up to chunkSize * chunkCount characters of text to the data handlers at a time.',
+        )
+    configControl.add_argument(
+        '--chunk-count',
+        dest='chunkCount',
+        default=0,
+        type=int,
+        help='Override [performance]chunkCount.  See \'--chunk-size\' above.',
+        )
+    configControl.add_argument(
+        '--auto-tune-chunks',
+        dest='autoTuneChunks',
+        action='store_true',
+        help='Benchmark the enabled data handlers on a sample of the text files to be scanned and set chunkCount to the fastest chunk size for this computer.  Same as [performance]chunkAutoTune.',
+        )
     
     miscInfoControl = parser.add_argument_group(title='Misc. Info')
     miscInfoControl.add_argument(
@@ -120,96 +160,400 @@ def fileHandlerDispatcher(config: classes.Config,
         with activeFilesQProcesses.get_lock():
             activeFilesQProcesses.value+=1
         dataHandlerModules=globalfuncs.getEnabledDataHandlerModules(config.getDataHandlers())
+        getencoding.setSampleBytes(config.getEncodingSampleBytes())
 
         logger = logManager.getLogger(name=mp.current_process().name)
         logger.debug('Process %s (%s) started (Active=%d)', mp.current_process().name, mp.current_process().pid, activeFilesQProcesses.value)
-        resultsQs = [qName for qName in queues.keys() if qName.endswith('_resultsQ')]
         
         while True:
             if stopEvent.is_set():
                 break
-            item=queuefuncs.getItem(queues['filesQ'])
-            if item == SENTINEL:
-                break
-            if item == None:
+
+            # Byte ranges of a large file that another file handler has split up go ahead of any new files
+            fileRange=queuefuncs.getItem(queues['rangeQ'], timeout=0)
+            if fileRange is not None:
+                queues['collectQ'].put([tryScanRange(fileRange, config, totals, dataHandlerModules, logger, logManager)])
                 continue
 
-            # Set some variables for this item
-            filename=item.getFullPath()
-            fileHandlerModule=globalfuncs.getFileHandlerModule(item.getFileHandlerName())
-            results={
-                'filename': filename,
-                'matches': {}
-            }
-            
-            logger.info('[%s]Processing %s with %s', mp.current_process().name, filename, fileHandlerModule.__name__)
-            
-            for content in fileHandlerModule.readFile(filename, logManager):
-                logger.debug('%s: Received %d bytes from file hander', filename, len(content))
+            batch=queuefuncs.getItem(queues['scanQ'])
+            if batch == SENTINEL:
+                break
+            if batch == None:
+                continue
 
-                if content == '':
+            # The discovery workers send File objects in batches.  The results go to the collector in the same batches.
+            records=list()
+            for item in batch:
+                if stopEvent.is_set():
                     break
-                
-                # chunks=globalfuncs.makeChunks(content)
-                # logger.debug('%s: Created %d chunks', filename, len(chunks))
-
-                # We only need chunks from here out.  Conserve a little memory by deleting "content"
-                #del content
-
-                for handler in dataHandlerModules:
-                    #logger.debug('%s: Processing %d chunks with %s', filename, len(chunks), handler.dhName)
-                    # for chunk in chunks:
-                    #     results=globalfuncs.processMatches(results, handler.findMatch(chunk), handler.dhName)
-                    results=globalfuncs.processMatches(results, handler.findMatch(content), handler.dhName)
-                    # logger.debug('%s: %d chunks processed with %s', filename, len(chunks), handler.dhName)
-
-            # Update the status counters
-            with totals['filesScanned'].get_lock():
-                totals['filesScanned'].value+=1
-            with totals['bytesScanned'].get_lock():
-                totals['bytesScanned'].value+=item.getFileSize()
-            
-            # Submit the results to outputhandlers
-            if len(results['matches']) > 0:
-                logger.debug('%s: %s matches found', filename, str(results['matches'].keys()))
-                
-                # Since Python sets aren't serializable as a JSON object type, we'll convert our results to Lists now.
-                logger.debug('%s: Rebuilding result sets into lists', filename)
-                for handler in results['matches']:
-                    for key in results['matches'][handler]:
-                        l=list(results['matches'][handler][key])
-                        results['matches'][handler][key]=l
-
-                # Update the results totals
-                with totals['totalResults'].get_lock():
-                    totals['totalResults'].value += globalfuncs.countResults(results['matches'])
-                for q in resultsQs:
-                    queues[q].put(results)
-
-            logger.debug('%s: Processing complete', filename)
+                # One bad file mustn't cost the results for the rest of the batch
+                try:
+                    record=scanFile(item, config, queues, totals, dataHandlerModules, logger, logManager)
+                    # The collector holds on to these results in case a copy of the file is found later
+                    if item.getKeepResults():
+                        record['keepResults']=True
+                    records.append(record)
+                except Exception as e:
+                    logger.error('%s: Unexpected error.  File skipped.  Error message: %s', item.getFullPath(), str(e))
+                    records.append({
+                        'filename': item.getFullPath(),
+                        'matches': {},
+                    })
+            queues['collectQ'].put(records)
+
+        # All files have been handed out, but parts of a split file might still be waiting on rangeQ.  Help finish them before stopping.
+        while not stopEvent.is_set() and totals['rangesPending'].value > 0:
+            fileRange=queuefuncs.getItem(queues['rangeQ'])
+            if fileRange is not None:
+                queues['collectQ'].put([tryScanRange(fileRange, config, totals, dataHandlerModules, logger, logManager)])
 
     except KeyboardInterrupt:
         pass
     finally:
+        # How many repeated matches each data handler's cache saved it from checking again in this process
+        for dataHandler in dataHandlerModules:
+            matchCache=getattr(dataHandler, 'matchCache', None)
+            if matchCache is not None:
+                logger.info('[%s]%s match cache: %d hits, %d misses', mp.current_process().name, dataHandler.dhName, matchCache.hits, matchCache.misses)
         logger.info('Stopping %s (PID=%d)', mp.current_process().name, mp.current_process().pid)
         with activeFilesQProcesses.get_lock():
             activeFilesQProcesses.value-=1
             logger.info('FileHandler processes remaining: %d', activeFilesQProcesses.value)
+        # Every file handler tells the collector when it's done.  Coming after this process' own results, the sentinel can't overtake them.
+        queues['collectQ'].put(SENTINEL)
         if activeFilesQProcesses.value==0:
-            # Put the sentinel on the results queues
-            for q in [qName for qName in queues.keys() if qName.endswith('_resultsQ')]:
-                queues[q].put(SENTINEL)
-            
-            # To allow the queue to shutdown properly, remove the last item from the filesQ if we're the last filesQ processor still running
-            logger.info('[%s]Last FileHandler process terminated.  Clearing filesQ.', mp.current_process().name)
-            queuefuncs.clearQ(queues['filesQ'])
+            # To allow the queue to shutdown properly, remove the last item from the scanQ if we're the last scanQ processor still running
+            logger.info('[%s]Last FileHandler process terminated.  Clearing scanQ.', mp.current_process().name)
+            queuefuncs.clearQ(queues['scanQ'])
+            queuefuncs.clearQ(queues['rangeQ'])
         else:
             logger.info('[%s]FileHandler process terminated.  %d FileHandler processes remaining.', mp.current_process().name, activeFilesQProcesses.value)
-            # Put another sentinel on the filesQ to signal the next fileHandler process to terminate
-            queues['filesQ'].put(SENTINEL)
+            # Put another sentinel on the scanQ to signal the next fileHandler process to terminate
+            queues['scanQ'].put(SENTINEL)
         del logger
 
 
+def scanFile(item: classes.File,
+             config: classes.Config,
+             queues: dict,
+             totals: dict,
+             dataHandlerModules: list,
+             logger,
+             logManager: LogManager,
+            ) -> dict:
+    '''
+    Reads a single file with its file handler and runs the data handlers over the content.  Returns the results record for the collector.
+
+    Files of at least [performance]splitFileBytes are split into byte ranges if the file handler supports it.  This process scans the
+    first part and the rest are put on rangeQ for any file handler to pick up.
+    '''
+
+    filename=item.getFullPath()
+
+    # The scan index already has the results for files that haven't changed since the last scan
+    if item.getCachedMatches() is not None:
+        logger.debug('%s: Unchanged since the last scan', filename)
+        with totals['bytesScanned'].get_lock():
+            totals['bytesScanned'].value+=item.getFileSize()
+        record={
+            'filename': filename,
+            'matches': item.getCachedMatches(),
+            'cached': True,
+        }
+        if item.getCachedTruncated():
+            record['truncated']=set(item.getCachedTruncated())
+        return record
+
+    # Exact copies of another file get that file's results from the collector.  The fileScheduler only compared the sizes and the ends
+    # of the two files, so a file that turns out to be different is scanned as usual.
+    if item.getDuplicateOf() is not None:
+        if dedup.isDuplicate(filename, item.getDuplicateOf(), logger):
+            with totals['bytesScanned'].get_lock():
+                totals['bytesScanned'].value+=item.getFileSize()
+            return {
+                'filename': filename,
+                'matches': {},
+                'duplicateOf': item.getDuplicateOf(),
+                'fileKey': item.getIndexKey(),
+            }
+        logger.debug('%s: Not a copy of %s', filename, item.getDuplicateOf())
+
+    fileHandlerModule=globalfuncs.getFileHandlerModule(item.getFileHandlerName())
+
+    # Only the data handlers that could find something in this type of file.  If there are none, the file doesn't need to be read.
+    dataHandlerModules=globalfuncs.getDataHandlersForFile(dataHandlerModules, item.getFileHandlerName())
+    if not dataHandlerModules:
+        logger.debug('%s: None of the data handlers apply to %s files', filename, item.getFileHandlerName())
+        with totals['bytesScanned'].get_lock():
+            totals['bytesScanned'].value+=item.getFileSize()
+        return {
+            'filename': filename,
+            'matches': {},
+            'fileKey': item.getIndexKey(),
+        }
+
+    splitFileBytes=config.getSplitFileBytes()
+    if splitFileBytes > 0 and item.getFileSize() >= splitFileBytes and config.getMaxProcs() > 1 and hasattr(fileHandlerModule, 'splitFile'):
+        fileRanges=fileHandlerModule.splitFile(item, config.getSplitRangeBytes(), logManager)
+        if fileRanges:
+            with totals['rangesPending'].get_lock():
+                totals['rangesPending'].value+=len(fileRanges)
+            for fileRange in fileRanges[1:]:
+                queues['rangeQ'].put(fileRange)
+            return tryScanRange(fileRanges[0], config, totals, dataHandlerModules, logger, logManager)
+
+    logger.info('[%s]Processing %s with %s', mp.current_process().name, filename, fileHandlerModule.__name__)
+    mappedText=getMappedText(filename, fileHandlerModule, dataHandlerModules, logManager, fObj=item)
+    if mappedText is not None:
+        results=scanMapped(filename, mappedText, dataHandlerModules, logger, config.getMaxMatchesPerFile())
+    else:
+        # Only the file handlers that detect the encoding set it, and they can be given it back instead of detecting it again
+        encoding={'encoding': item.getEncoding()} if item.getEncoding() is not None else {}
+        results=scanContent(filename, fileHandlerModule.readFile(filename, logManager, maxChunkCount=config.getChunkCount(), maxChunkSize=config.getChunkSize(), **encoding), dataHandlerModules, logger, config.getMaxMatchesPerFile())
+    results['fileKey']=item.getIndexKey()
+
+    # Update the status counters
+    with totals['bytesScanned'].get_lock():
+        totals['bytesScanned'].value+=item.getFileSize()
+
+    logger.debug('%s: Processing complete', filename)
+    return results
+
+
+def scanRange(fileRange: classes.FileRange,
+              config: classes.Config,
+              totals: dict,
+              dataHandlerModules: list,
+              logger,
+              logManager: LogManager,
+             ) -> dict:
+    '''Reads one byte range of a split file and runs the data handlers over the content.  Returns the results record for the part.'''
+
+    fileHandlerModule=globalfuncs.getFileHandlerModule(fileRange.getFileHandlerName())
+    dataHandlerModules=globalfuncs.getDataHandlersForFile(dataHandlerModules, fileRange.getFileHandlerName())
+    filename=fileRange.getFullPath()
+    logger.info('[%s]Processing %s (part %d of %d) with %s', mp.current_process().name, filename, fileRange.part+1, fileRange.parts, fileHandlerModule.__name__)
+
+    mappedText=getMappedText(filename, fileHandlerModule, dataHandlerModules, logManager, fileRange)
+    if mappedText is not None:
+        results=scanMapped(filename, mappedText, dataHandlerModules, logger, config.getMaxMatchesPerFile())
+    else:
+        results=scanContent(filename, fileHandlerModule.readRange(fileRange, logManager, maxChunkCount=config.getChunkCount(), maxChunkSize=config.getChunkSize()), dataHandlerModules, logger, config.getMaxMatchesPerFile())
+    results['fileKey']=fileRange.file.getIndexKey()
+    results['part']=fileRange.part
+    results['parts']=fileRange.parts
+    # For the collector to tell when every data handler has reached [performance]maxMatchesPerFile in the merged results
+    results['dataHandlers']=[handler.dhName for handler in dataHandlerModules]
+
+    # Update the status counters
+    with totals['bytesScanned'].get_lock():
+        totals['bytesScanned'].value+=fileRange.getRangeSize()
+    with totals['rangesPending'].get_lock():
+        totals['rangesPending'].value-=1
+
+    return results
+
+
+def tryScanRange(fileRange: classes.FileRange,
+                 config: classes.Config,
+                 totals: dict,
+                 dataHandlerModules: list,
+                 logger,
+                 logManager: LogManager,
+                ) -> dict:
+    '''
+    Same as scanRange, but if the part can't be scanned, the error is logged and the part comes back without matches.  The other parts
+    of the file are still merged, and the part is no longer pending.
+
+    Parts of a file that already has [performance]maxMatchesPerFile for every data handler aren't scanned at all.  They come back
+    marked as skipped.
+    '''
+
+    if fileRange.getFullPath() in totals['cappedFiles']:
+        logger.debug('%s: Part %d of %d skipped ([performance]maxMatchesPerFile)', fileRange.getFullPath(), fileRange.part+1, fileRange.parts)
+        with totals['bytesScanned'].get_lock():
+            totals['bytesScanned'].value+=fileRange.getRangeSize()
+        with totals['rangesPending'].get_lock():
+            totals['rangesPending'].value-=1
+        return {
+            'filename': fileRange.getFullPath(),
+            'matches': {},
+            'fileKey': fileRange.file.getIndexKey(),
+            'part': fileRange.part,
+            'parts': fileRange.parts,
+            'skipped': True,
+        }
+
+    try:
+        return scanRange(fileRange, config, totals, dataHandlerModules, logger, logManager)
+    except Exception as e:
+        logger.error('%s: Unexpected error.  Part %d of %d skipped.  Error message: %s', fileRange.getFullPath(), fileRange.part+1, fileRange.parts, str(e))
+        with totals['rangesPending'].get_lock():
+            totals['rangesPending'].value-=1
+        return {
+            'filename': fileRange.getFullPath(),
+            'matches': {},
+            'part': fileRange.part,
+            'parts': fileRange.parts,
+        }
+
+
+def scanContent(filename: str,
+                contents,
+                dataHandlerModules: list,
+                logger,
+                maxMatches: int = 0,
+               ) -> dict:
+    '''
+    Runs the data handlers over the content returned by a file handler with the scan engine, and collects the matches.
+
+    The end of each chunk is carried over to the start of the next one, so that a match that's cut in half by the file handler is 
+    still found.  Matches in the overlap can be found twice, which doesn't matter as the results are sets.
+
+    If maxMatches is set, a data handler stops once it has found that many distinct matches in the file, and is marked as truncated if
+    there's any more of the file.  Once they all have, the file handler is stopped and the rest of the file isn't read.
+    '''
+
+    results={
+        'filename': filename,
+        'matches': {}
+    }
+    overlap=globalfuncs.getMaxMatchLength(dataHandlerModules)
+    carry=''
+    # The data handlers that have found maxMatches
+    finished=set()
+    
+    for content in contents:
+        logger.debug('%s: Received %d bytes from file hander', filename, len(content))
+
+        if content == '':
+            break
+
+        if finished:
+            results.setdefault('truncated', set()).update(finished)
+            if not dataHandlerModules:
+                logger.info('%s: Stopped after %d matches for each data handler ([performance]maxMatchesPerFile)', filename, maxMatches)
+                contents.close()
+                break
+
+        # The file handlers cut the chunks at a space
+        if carry:
+            content=carry + ' ' + content
+        
+        for dhName, matches in scanengine.findMatches(content, dataHandlerModules).items():
+            results=globalfuncs.processMatches(results, matches, dhName, maxMatches)
+
+        if maxMatches:
+            dataHandlerModules=getUnfinishedDataHandlers(results, dataHandlerModules, maxMatches, finished)
+
+        carry=globalfuncs.getOverlap(content, overlap)
+
+    return results
+
+
+def getMappedText(filename: str,
+                  fileHandlerModule,
+                  dataHandlerModules: list,
+                  logManager: LogManager,
+                  fileRange: classes.FileRange = None,
+                  fObj: classes.File = None,):
+    '''
+    Returns the memory-mapped file (or byte range) if the file handler supports it and every enabled data handler can match raw bytes 
+    with findMatchBytes.  Otherwise returns None and the file is read as text.
+    '''
+
+    if not hasattr(fileHandlerModule, 'mapFile') or not all(hasattr(handler, 'findMatchBytes') for handler in dataHandlerModules):
+        return None
+    return fileHandlerModule.mapFile(filename, logManager, fileRange, fObj)
+
+
+def scanMapped(filename: str,
+               mappedText,
+               dataHandlerModules: list,
+               logger,
+               maxMatches: int = 0,
+              ) -> dict:
+    '''
+    Runs the data handlers' findMatchBytes over a memory-mapped file with the scan engine, one window at a time, and collects the 
+    matches.  Stops early like scanContent if maxMatches is set.
+    '''
+
+    results={
+        'filename': filename,
+        'matches': {}
+    }
+    finished=set()
+
+    try:
+        with mappedText:
+            for start, end in mappedText.windows():
+                if finished:
+                    results.setdefault('truncated', set()).update(finished)
+                    if not dataHandlerModules:
+                        logger.info('%s: Stopped after %d matches for each data handler ([performance]maxMatchesPerFile)', filename, maxMatches)
+                        break
+                logger.debug('%s: Scanning bytes %d-%d', filename, start, end)
+                for dhName, matches in scanengine.findMatchesBytes(mappedText.buffer, start, end, mappedText.decode, dataHandlerModules).items():
+                    results=globalfuncs.processMatches(results, matches, dhName, maxMatches)
+
+                if maxMatches:
+                    dataHandlerModules=getUnfinishedDataHandlers(results, dataHandlerModules, maxMatches, finished)
+    except (OSError, ValueError) as e:
+        logger.error('%s: Error scanning mapped file.  Results may be incomplete.  Error message: %s', filename, str(e))
+
+    return results
+
+
+def getUnfinishedDataHandlers(results: dict,
+                              dataHandlerModules: list,
+                              maxMatches: int,
+                              finished: set,) -> list:
+    '''Returns the data handlers that haven't found maxMatches in the file yet.  The names of the others are added to finished.'''
+
+    unfinished=list()
+    for handler in dataHandlerModules:
+        if globalfuncs.countMatches(results['matches'].get(handler.dhName, {})) < maxMatches:
+            unfinished.append(handler)
+        else:
+            finished.add(handler.dhName)
+    return unfinished
+
+
+def getCheckpoint(config: classes.Config,
+                  resume: bool,) -> checkpoint.Checkpoint:
+    '''
+    Opens the checkpoint file, if enabled.  A new scan starts a fresh checkpoint.  With --resume, the checkpoint has to belong to an
+    unfinished scan with the same settings.
+    '''
+
+    if not config.getCheckpointFile():
+        if resume:
+            console.error('Unable to resume.  Checkpoints are disabled ([performance]checkpointFile).')
+            sys.exit(errorCodes['invalidConfig'])
+        return None
+
+    fingerprint=checkpoint.getFingerprint(config.getDataHandlers(), config.getStartDirs())
+    if resume and not Path(config.getCheckpointFile()).exists():
+        console.error('Unable to resume.  Checkpoint file %s not found.' % config.getCheckpointFile())
+        sys.exit(errorCodes['invalidConfig'])
+
+    scanCheckpoint=checkpoint.Checkpoint(config.getCheckpointFile(), config.getCheckpointInterval())
+    if not resume:
+        scanCheckpoint.reset(fingerprint, config.getStartDirs())
+        return scanCheckpoint
+
+    if scanCheckpoint.getFingerprint() != fingerprint:
+        console.error('Unable to resume.  The checkpoint in %s is for a scan with different data handlers or start directories.' % config.getCheckpointFile())
+        sys.exit(errorCodes['invalidConfig'])
+    if scanCheckpoint.isComplete():
+        console.normal('The scan in %s already completed.  Nothing to resume.' % config.getCheckpointFile())
+        sys.exit(errorCodes['ok'])
+
+    console.normal('Resuming the scan from %s' % config.getCheckpointFile())
+    config.setResume(True)
+    return scanCheckpoint
+
+
 def getOutputHandlers(config: classes.Config,
                       queues: dict,
                       stopEvent: mp.Event,
@@ -226,14 +570,18 @@ def getOutputHandlers(config: classes.Config,
             except Exception as e:
                 console.error(str(e))
                 stopEvent.set()
+            args=(config.getOutputFile(resultsType), 
+                  queues[resultsType+'_resultsQ'], 
+                  stopEvent,
+                  logManager,)
+            if resultsType == 'csv':
+                # The CSV results only have a "truncated" column if there's a limit on the matches per file
+                args+=(config.getMaxMatchesPerFile() > 0,)
             yield {
                     'target': globalfuncs.getOutputHandlerModule(resultsType).processResult,
                     'name': resultsType+'_handler', 
                     'num_processes': 1,
-                    'args': (config.getOutputFile(resultsType), 
-                             queues[resultsType+'_resultsQ'], 
-                             stopEvent,
-                             logManager,),
+                    'args': args,
                   }
     except KeyboardInterrupt:
         pass
@@ -334,6 +682,20 @@ def main():
     if args.maxProc>0:
         config.setMaxProcs(min(cpu_count(), args.maxProc))
 
+    if args.discoveryProc>0:
+        config.setMaxFilesScanProcs(args.discoveryProc)
+
+    if args.chunkSize>0:
+        config.setChunkSize(args.chunkSize)
+
+    if args.chunkCount>0:
+        config.setChunkCount(args.chunkCount)
+
+    if args.autoTuneChunks:
+        config.setChunkAutoTune(True)
+
+    scanCheckpoint=getCheckpoint(config, args.resume)
+
     try:
         # Create queues and other structures needed for asynchronous implementation
         totals={k: mp.Value(c_uint64, 0) for k in [
@@ -343,8 +705,19 @@ def main():
             'filesFound', 
             'bytesScanned', 
             'bytesFound',
-            'totalResults']}
-        queues={name: mp.Queue() for name in ['logQ', 'dirsQ', 'filesQ', 'totalsQ',]}
+            'totalResults',
+            'dirsPending',
+            'discoveryWorkersDone',
+            'rangesPending',]}
+        # Split files that don't need the rest of their byte ranges scanned
+        totals['cappedFiles']=classes.CappedFiles()
+        queues={name: mp.Queue() for name in ['logQ', 'crawlQ', 'filesQ', 'totalsQ', 'rangeQ', 'collectQ',]}
+        if config.getSchedule() == 'fifo' and not config.getDedup():
+            # Without a scheduler, the file handlers work straight from the discovery workers' queue
+            queues['scanQ']=queues['filesQ']
+        else:
+            # Keep scanQ short so the scheduler can still move newly-discovered large files to the front
+            queues['scanQ']=mp.Queue(maxsize=config.getMaxProcs())
         activeFilesQProcesses=mp.Value(c_int, 0)
         for resultsType in config.getEnabledOutputTypes():
             name=resultsType+'_resultsQ'
@@ -384,6 +757,15 @@ def main():
         if globalfuncs.getOSType() == 'linux':
             console.warn('Sleep prevention disabled on Linux. Consider using \'screen\' or \'tmux\' to ensure that PIIDigger survives an SSH disconnect.')
         
+        if config.getChunkAutoTune():
+            console.normal('Benchmarking chunk sizes')
+            # The samples are read in this process
+            getencoding.setSampleBytes(config.getEncodingSampleBytes())
+            if chunktuner.autoTuneChunks(config, globalfuncs.getEnabledDataHandlerModules(config.getDataHandlers()), logManager):
+                console.normal('Using %d characters per chunk' % (config.getChunkSize() * config.getChunkCount()))
+            else:
+                console.warn('Not enough text found in files that are read in chunks.  Using the configured chunk size.')
+
         console.normal('Scanning %s for files matching %s' % (config.getStartDirs(), config.getDataHandlers()))
         
         #####################################
@@ -398,19 +780,28 @@ def main():
                         name=outputHandler['name'],
                         num_processes=outputHandler['num_processes'],
                         args=outputHandler['args'],)
-        mainPM.register(target=filescan.findFilesWorker, 
-                    name='findFilesWorker',
-                    num_processes=config.getMaxFilesScanProcs(), 
+        mainPM.register(target=collector.resultsCollector,
+                    name='resultsCollector',
+                    num_processes=1,
                     args=(config, queues, totals, stopEvent, logManager,),)
         mainPM.register(target=fileHandlerDispatcher, 
                     name='fileHandler',
                     num_processes=config.getMaxProcs(),
                     args=(config, queues, totals, stopEvent, activeFilesQProcesses, logManager,),)
-        mainPM.register(target=filescan.findDirsWorker, 
-                    name='findDirsWorker',
-                    num_processes=1,
+        if queues['scanQ'] is not queues['filesQ']:
+            mainPM.register(target=scheduler.fileScheduler,
+                        name='fileScheduler',
+                        num_processes=1,
+                        args=(config, queues, stopEvent, logManager,),)
+        mainPM.register(target=filescan.discoveryWorker, 
+                    name='discoveryWorker',
+                    num_processes=config.getMaxFilesScanProcs(),
                     args=(config, queues, totals, stopEvent, logManager,),)
-        console.normal('Starting %d file scanner processes' % (config.getMaxFilesScanProcs()))
+        filescan.seedDirs(config, queues, totals, scanCheckpoint if config.getResume() else None)
+        if scanCheckpoint is not None:
+            # The discovery workers and the collector open their own connections
+            scanCheckpoint.close()
+        console.normal('Starting %d file discovery processes' % (config.getMaxFilesScanProcs()))
         console.normal('Starting %d file handler processes' % (config.getMaxProcs()))
 
         # Start the progress line worker in a separate process manager
@@ -443,6 +834,11 @@ def main():
         console.error('An unknown error was encountered.  Error message was captured in %s.' % config.getLogFile())
         logger.error(traceback.print_exc())
     else:
+        # The scan ran to the end, so there's nothing left to resume
+        if scanCheckpoint is not None and not mainPM.interrupted and not stopEvent.is_set():
+            scanCheckpoint=checkpoint.Checkpoint(config.getCheckpointFile())
+            scanCheckpoint.markComplete()
+            scanCheckpoint.close()
         queues['logQ'].put(SENTINEL)
         # If the logger hasn't already been shutdown by a KeyboardInterrupt or other event
         stopEvent.set()
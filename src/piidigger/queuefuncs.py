@@ -14,10 +14,10 @@ def clearQ(q: Queue):
         except KeyboardInterrupt:
             continue 
     
-def getItem(q: Queue):
+def getItem(q: Queue, timeout: float = TIMEOUT):
     '''Returns the next item in the queue.  Uses a timeout to prevent blocking indefinitely'''
     try:
-        return q.get(timeout=TIMEOUT)
+        return q.get(timeout=timeout)
     except Empty:
         return None
 
@@ -0,0 +1,396 @@
+import re
+from collections import OrderedDict
+from functools import lru_cache
+
+try:
+    import numpy
+except ImportError:
+    # Without NumPy, anchors are found with str.find/bytes.find and runs of characters (see Prefilter) with a regex
+    numpy=None
+
+# Text shorter than this is prefiltered without NumPy, as setting up the arrays would take longer than it saves
+_NUMPYMINCHARS = 65_536
+# NumPy works through the text in blocks, to limit the memory it uses
+_BLOCKSIZE = 1_048_576
+# Without NumPy, runs closer together than this share a window, as each window costs another call to the data handler's regex
+_RUNGAP = 256
+# Without NumPy, text where the runs take up more than half of this many characters isn't prefiltered at all (see _findRunsPython)
+_RUNSAMPLE = 65_536
+# The number of distinct matches that each data handler remembers the result for (see MatchCache)
+_MATCHCACHESIZE = 16_384
+
+
+class Prefilter:
+    '''
+    Tells the scan engine where a data handler's matches can be, so that its regex only has to run over those parts of the text.  A
+    data handler declares it as a module-level "prefilter".
+
+    anchors:    Characters that every match contains (at least minAnchors of them), such as the "@" of an email address.
+    runChars:   If set, the characters that a match is made of, such as the digits and separators of a PAN.  A match can only be in
+                a run of these characters with at least minAnchors anchors.
+    span:       Otherwise, how far a match can reach either side of an anchor (usually the data handler's maxMatchLength).
+    stopChars:  Characters that a match can't contain, such as whitespace.  The window around an anchor stops at the nearest one
+                either side, so that the regex only sees the word that the anchor is in.
+    '''
+
+    def __init__(self, anchors: str, runChars: str = '', minAnchors: int = 1, span: int = 0, stopChars: str = ''):
+        self.anchors = anchors
+        self.runChars = runChars
+        self.minAnchors = minAnchors
+        self.span = span
+        self.stopChars = stopChars
+
+
+class MatchCache:
+    '''
+    Remembers the result of validating and redacting the most recently seen matches, so that a match that's repeated throughout a file
+    (as card numbers and email addresses in log files are) is only checked once.  A data handler keeps one as a module-level
+    "matchCache", so each process has its own.
+
+    The cache is keyed by the raw match, and holds the redacted match, or '' if it isn't valid.  Once it holds maxSize matches, the
+    least recently used one is dropped.  hits and misses count the lookups.
+    '''
+
+    def __init__(self, maxSize: int = _MATCHCACHESIZE):
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, match: str) -> str:
+        '''Returns the redacted match ('' if it isn't valid), or None if it isn't in the cache'''
+
+        redacted = self._entries.get(match)
+        if redacted is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(match)
+        return redacted
+
+    def put(self, match: str, redacted: str):
+        '''Stores the redacted match, or '' if it isn't valid'''
+
+        self._entries[match] = redacted
+        self._entries.move_to_end(match)
+        if len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+
+
+def findMatches(content: str, dataHandlerModules: list) -> dict:
+    '''
+    Runs all of the data handlers over a chunk of text.  Data handlers whose hints (see datahandlers/__init__.py) rule out a match in
+    this chunk are skipped.  The parts of the text that each of the others needs to look at are found in a single pass for all of 
+    them (see findWindows).  A data handler is only called if there's something for it to look at, and then only over those parts.
+
+    Returns a dictionary of:
+        dhName: {brand: set(matches)}
+    '''
+
+    handlers = [handler for handler in dataHandlerModules if mightMatch(content, 0, len(content), handler)]
+    windows = findWindows(content, 0, len(content), getPrefilters(handlers))
+
+    results = dict()
+    for handler, handlerWindows in zip(handlers, windows):
+        if handlerWindows:
+            results[handler.dhName] = handler.findMatch(content, windows=handlerWindows) if hasattr(handler, 'prefilter') else handler.findMatch(content)
+    return results
+
+
+def findMatchesBytes(buffer,
+                     start: int,
+                     end: int,
+                     decode,
+                     dataHandlerModules: list,) -> dict:
+    '''Same as findMatches, but runs the data handlers' findMatchBytes over the raw bytes of buffer from start to end'''
+
+    handlers = [handler for handler in dataHandlerModules if mightMatch(buffer, start, end, handler)]
+    windows = findWindows(buffer, start, end, getPrefilters(handlers))
+
+    results = dict()
+    for handler, handlerWindows in zip(handlers, windows):
+        if handlerWindows:
+            if hasattr(handler, 'prefilter'):
+                results[handler.dhName] = handler.findMatchBytes(buffer, start, end, decode, windows=handlerWindows)
+            else:
+                results[handler.dhName] = handler.findMatchBytes(buffer, start, end, decode)
+    return results
+
+
+def mightMatch(buffer,
+               start: int,
+               end: int,
+               handler,) -> bool:
+    '''
+    Returns False if the data handler's minMatchLength and requiredChars rule out a match in buffer between start and end.  Both
+    checks stop at the first required character, so they cost next to nothing.
+    '''
+
+    if end - start < getattr(handler, 'minMatchLength', 0):
+        return False
+    requiredChars = getattr(handler, 'requiredChars', '')
+    if not requiredChars:
+        return True
+    if isinstance(buffer, str):
+        return any(buffer.find(ch, start, end) != -1 for ch in requiredChars)
+    return any(buffer.find(ch.encode('latin-1'), start, end) != -1 for ch in requiredChars)
+
+
+def getPrefilters(dataHandlerModules: list) -> tuple:
+    '''Returns the prefilter of each data handler, or None for data handlers that don't have one'''
+
+    return tuple(getattr(handler, 'prefilter', None) for handler in dataHandlerModules)
+
+
+def findWindows(buffer,
+                start: int,
+                end: int,
+                prefilters: tuple,) -> list:
+    '''
+    Returns, for each of the prefilters, a list of the (start, end) spans of buffer (a str, or bytes-like) between start and end that
+    could hold a match.  Each span of a run also includes the character after it, for the regexes' boundary checks.  (They can look
+    behind the start of a span by themselves.)  A prefilter of None gets the whole of the text.
+
+    With NumPy, the text is compared a block at a time against the character ranges that make up the anchors and runChars of all of
+    the prefilters.  Each range is only compared once per block, however many prefilters share it (such as the digits of a PAN), so
+    adding a data handler costs a few array comparisons rather than another pass of its regex.  The windows are then worked out from
+    the results.
+    '''
+
+    if numpy is None or end - start < _NUMPYMINCHARS:
+        return [_findWindowsPython(buffer, start, end, prefilter) for prefilter in prefilters]
+
+    if isinstance(buffer, str):
+        # Latin-1 keeps one byte per character, so the offsets don't change.  The characters it can't encode become "?".
+        buffer = buffer.encode('latin-1', errors='replace')
+
+    runs = [_RunFinder(start, end, prefilter) if prefilter is not None and prefilter.runChars else None for prefilter in prefilters]
+    anchors = [[] for _ in prefilters]
+    stops = [[] for _ in prefilters]
+
+    for blockStart in range(start, end, _BLOCKSIZE):
+        blockEnd = min(blockStart + _BLOCKSIZE, end)
+        chars = numpy.frombuffer(buffer, dtype=numpy.uint8, count=blockEnd - blockStart, offset=blockStart)
+        # The comparisons for this block, by character range
+        masks = dict()
+        for i, prefilter in enumerate(prefilters):
+            if prefilter is None:
+                continue
+            anchorBits = _getMask(chars, prefilter.anchors, masks)
+            if runs[i] is not None:
+                runs[i].addBlock(blockStart, blockEnd, anchorBits, _getMask(chars, prefilter.runChars, masks))
+            else:
+                positions = numpy.flatnonzero(anchorBits)
+                anchors[i].append(positions + blockStart)
+                # Stops are only needed near an anchor.  Without the ones from a neighbouring block, a window is just wider.
+                if prefilter.stopChars and len(positions):
+                    stops[i].append(numpy.flatnonzero(_getMask(chars, prefilter.stopChars, masks)) + blockStart)
+
+    windows = list()
+    for i, prefilter in enumerate(prefilters):
+        if prefilter is None:
+            windows.append([(start, end)])
+        elif runs[i] is not None:
+            windows.append(runs[i].getWindows())
+        else:
+            windows.append(_mergeAnchors(numpy.concatenate(anchors[i]), start, end, prefilter.span, numpy.concatenate(stops[i]) if stops[i] else None))
+    return windows
+
+
+def _getMask(chars, charSet: str, masks: dict):
+    '''Returns a boolean array that's True wherever chars is one of the characters in charSet.  masks holds the ranges compared so far.'''
+
+    mask = None
+    for first, count in _getRanges(charSet):
+        if (first, count) not in masks:
+            # Subtracting wraps the values below the range around to the top, so a single comparison checks both ends
+            masks[first, count] = chars == first if count == 1 else chars - numpy.uint8(first) < count
+        mask = masks[first, count] if mask is None else mask | masks[first, count]
+    return mask
+
+
+@lru_cache(maxsize=64)
+def _getRanges(charSet: str) -> tuple:
+    '''Returns the characters of charSet as (first, count) ranges of consecutive byte values'''
+
+    ranges = list()
+    for value in sorted(set(charSet.encode('latin-1'))):
+        if ranges and ranges[-1][0] + ranges[-1][1] == value:
+            ranges[-1][1] += 1
+        else:
+            ranges.append([value, 1])
+    return tuple((first, count) for first, count in ranges)
+
+
+def _findWindowsPython(buffer,
+                       start: int,
+                       end: int,
+                       prefilter: Prefilter,) -> list:
+    '''
+    The windows for a single prefilter, without NumPy.  Windows that overlap are merged before they're cut short at the stops, so that
+    text with many anchors costs a few searches per window rather than per anchor.
+    '''
+
+    if prefilter is None:
+        return [(start, end)]
+    if prefilter.runChars:
+        return _findRunsPython(buffer, start, end, prefilter)
+
+    anchors, stops = prefilter.anchors, prefilter.stopChars
+    if not isinstance(buffer, str):
+        anchors, stops = [ch.encode('latin-1') for ch in anchors], [ch.encode('latin-1') for ch in stops]
+
+    positions = list()
+    for anchor in anchors:
+        pos = buffer.find(anchor, start, end)
+        while pos != -1:
+            positions.append(pos)
+            pos = buffer.find(anchor, pos + 1, end)
+    positions.sort()
+
+    # [windowStart, windowEnd, first anchor, last anchor]
+    windows = list()
+    for pos in positions:
+        windowStart, windowEnd = max(pos - prefilter.span, start), min(pos + prefilter.span + 1, end)
+        if windows and windowStart <= windows[-1][1]:
+            windows[-1][1], windows[-1][3] = windowEnd, pos
+        else:
+            windows.append([windowStart, windowEnd, pos, pos])
+
+    clipped = list()
+    for windowStart, windowEnd, first, last in windows:
+        for stop in stops:
+            windowStart = max(windowStart, buffer.rfind(stop, windowStart, first) + 1)
+            found = buffer.find(stop, last + 1, windowEnd)
+            if found != -1:
+                windowEnd = found
+        clipped.append((windowStart, windowEnd))
+    return clipped
+
+
+def _findRunsPython(buffer,
+                    start: int,
+                    end: int,
+                    prefilter: Prefilter,) -> list:
+    '''
+    The same runs as _RunFinder, without NumPy.  The runs of runChars that are at least minAnchors long are found with a regex, and the
+    anchors in each are counted by deleting the other runChars.  Each window includes the character after the run.  Runs that are
+    close together share a window, as every window costs another call to the data handler's regex.
+
+    In text that's full of matches, such as a list of card numbers, finding the runs would only add to the time the regex takes anyway.
+    If the windows cover more than half of the first _RUNSAMPLE characters, the whole of the text is returned instead.
+    '''
+
+    pattern, others = _getRunPattern(prefilter.runChars, prefilter.anchors, prefilter.minAnchors, isinstance(buffer, str))
+    isStr = isinstance(buffer, str)
+    sampleEnd = start + _RUNSAMPLE if end - start > 2 * _RUNSAMPLE else None
+
+    windows = list()
+    for m in pattern.finditer(buffer, start, end):
+        if sampleEnd is not None and m.start() >= sampleEnd:
+            if sum(windowEnd - windowStart for windowStart, windowEnd in windows) > (m.start() - start) // 2:
+                return [(start, end)]
+            sampleEnd = None
+        # The runChars are ASCII, and bytes.translate is much quicker than str.translate
+        run = m.group().encode('ascii') if isStr else m.group()
+        if len(run.translate(None, others)) < prefilter.minAnchors:
+            continue
+        if windows and m.start() - windows[-1][1] < _RUNGAP:
+            windows[-1][1] = min(m.end() + 1, end)
+        else:
+            windows.append([m.start(), min(m.end() + 1, end)])
+    return [tuple(window) for window in windows]
+
+
+@lru_cache(maxsize=64)
+def _getRunPattern(runChars: str, anchors: str, minAnchors: int, isStr: bool) -> tuple:
+    '''Returns the regex for the runs (for str or for bytes) and the runChars that aren't anchors'''
+
+    pattern = '[%s]{%d,}' % (''.join('\\x%02x' % ord(ch) for ch in runChars), minAnchors)
+    others = ''.join(ch for ch in runChars if ch not in anchors).encode('ascii')
+    return re.compile(pattern if isStr else pattern.encode('ascii')), others
+
+
+def _mergeAnchors(positions,
+                  start: int,
+                  end: int,
+                  span: int,
+                  stops = None,) -> list:
+    '''
+    Returns the windows of span characters either side of each of the (sorted) anchor positions, cut short at the nearest of the
+    (sorted) stop positions, with any that overlap merged
+    '''
+
+    if len(positions) == 0:
+        return []
+
+    windowStarts = numpy.maximum(positions - span, start)
+    windowEnds = numpy.minimum(positions + span + 1, end)
+    if stops is not None and len(stops):
+        nextStop = numpy.searchsorted(stops, positions)
+        windowStarts = numpy.maximum(windowStarts, numpy.where(nextStop > 0, stops[nextStop - 1] + 1, start))
+        windowEnds = numpy.minimum(windowEnds, numpy.where(nextStop < len(stops), stops[numpy.minimum(nextStop, len(stops) - 1)], end))
+
+    # The starts and the ends both go up with the anchor positions.  A new window starts where there's a gap.
+    gaps = numpy.flatnonzero(windowStarts[1:] > windowEnds[:-1])
+    windowStarts = windowStarts[numpy.concatenate(([0], gaps + 1))]
+    windowEnds = windowEnds[numpy.concatenate((gaps, [len(positions) - 1]))]
+    return list(zip(windowStarts.tolist(), windowEnds.tolist()))
+
+
+class _RunFinder:
+    '''
+    Finds the runs of a prefilter's runChars with at least minAnchors anchors, one block of text at a time.  A run that reaches the
+    end of a block is carried over into the next one.
+    '''
+
+    def __init__(self, start: int, end: int, prefilter: Prefilter):
+        self.end = end
+        self.minAnchors = prefilter.minAnchors
+        self.windows: list = []
+        # A run that carried on past the end of the previous block: (start, anchors so far)
+        self.carry = None
+
+    def addBlock(self, blockStart: int, blockEnd: int, anchorBits, runBits):
+        # The boundaries of the runs alternate between the start of one run and the end of it
+        bounds = numpy.flatnonzero(runBits[1:] != runBits[:-1]) + 1
+        if runBits[0]:
+            bounds = numpy.concatenate(([0], bounds))
+        if runBits[-1]:
+            bounds = numpy.concatenate((bounds, [len(runBits)]))
+        bounds = bounds.reshape(-1, 2)
+
+        # Only count the anchors in the runs that are long enough.  The first and last run could be part of a longer one that crosses
+        # into the next or previous block.
+        candidates = bounds[:, 1] - bounds[:, 0] >= self.minAnchors
+        if len(bounds):
+            candidates[[0, -1]] = True
+        bounds = bounds[candidates]
+        runStarts = bounds[:, 0] + blockStart
+        runEnds = bounds[:, 1] + blockStart
+        if len(bounds):
+            # One extra (False) anchor at the end, so that a run that reaches the end of the block can be counted by reduceat
+            counts = numpy.add.reduceat(numpy.append(anchorBits, False), bounds.ravel(), dtype=numpy.int64)[0::2]
+        else:
+            counts = runStarts
+
+        if self.carry is not None:
+            if len(runStarts) and runStarts[0] == blockStart:
+                runStarts[0] = self.carry[0]
+                counts[0] += self.carry[1]
+            elif self.carry[1] >= self.minAnchors:
+                self.windows.append((self.carry[0], blockStart))
+            self.carry = None
+        if len(runStarts) and runEnds[-1] == blockEnd and blockEnd < self.end:
+            self.carry = (int(runStarts[-1]), int(counts[-1]))
+            runStarts, runEnds, counts = runStarts[:-1], runEnds[:-1], counts[:-1]
+
+        hits = counts >= self.minAnchors
+        self.windows.extend(zip(runStarts[hits].tolist(), runEnds[hits].tolist()))
+
+    def getWindows(self) -> list:
+        # Include the character after each run for the boundary check
+        return [(runStart, min(runEnd + 1, self.end)) for runStart, runEnd in self.windows]
@@ -0,0 +1,116 @@
+import json
+import os
+import sqlite3
+
+from piidigger import __version__
+
+
+def getFingerprint(dataHandlers: list, maxMatches: int = 0) -> str:
+    '''
+    Identifies the settings that the stored results depend on.  Results from a different PIIDigger version, set of data handlers or
+    [performance]maxMatchesPerFile can't be reused.
+    '''
+
+    return json.dumps({'version': __version__, 'dataHandlers': sorted(dataHandlers), 'maxMatchesPerFile': maxMatches})
+
+
+class ScanIndex:
+    '''
+    Keeps the results for every scanned file so that files that haven't changed since the last scan don't have to be read again.
+
+    Files are keyed by path.  A file is unchanged if its size, mtime and inode still match the stored entry.  The whole index is
+    discarded if the fingerprint (see getFingerprint) doesn't match the one it was written with.
+
+    The resultsCollector is the only writer.  The discoveryWorkers open the index with readOnly=True to look up files as they find them.
+    '''
+
+    _SAVEINTERVAL = 1000
+
+    def __init__(self, dbFile: str, fingerprint: str, readOnly: bool = True, logger = None):
+        self.pending: list = []
+        self.logger = logger
+        self.db = None
+
+        try:
+            if readOnly:
+                # Nothing to look up on the first run
+                if not os.path.exists(dbFile):
+                    return
+                self.db = sqlite3.connect('file:%s?mode=ro' % os.path.abspath(dbFile), uri=True, timeout=30)
+                row = self.db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+                if row is None or row[0] != fingerprint:
+                    self._dbError('Scan index was created with different settings.  All files will be scanned.')
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(dbFile)), exist_ok=True)
+                self.db = sqlite3.connect(dbFile, timeout=30)
+                self.db.execute('PRAGMA journal_mode=WAL')
+                self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+                row = self.db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+                if row is None or row[0] != fingerprint:
+                    # Dropped rather than emptied, as an index from another version might not have the same columns
+                    with self.db:
+                        self.db.execute('DROP TABLE IF EXISTS files')
+                        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('fingerprint', ?)", (fingerprint,))
+                self.db.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, ino INTEGER, matches TEXT, truncated TEXT)')
+                self.db.commit()
+        except (OSError, sqlite3.Error) as e:
+            self._dbError(e)
+
+    def lookup(self, path: str, fStat: os.stat_result) -> tuple:
+        '''
+        Returns the stored (matches, truncated) if the file hasn't changed since it was last scanned, otherwise None.  truncated lists
+        the data handlers that stopped at [performance]maxMatchesPerFile.
+        '''
+
+        if self.db is None:
+            return None
+
+        try:
+            row = self.db.execute('SELECT size, mtime, ino, matches, truncated FROM files WHERE path = ?', (path,)).fetchone()
+        except sqlite3.Error as e:
+            self._dbError(e)
+            return None
+
+        if row is None or tuple(row[:3]) != (fStat.st_size, fStat.st_mtime_ns, fStat.st_ino):
+            return None
+        return json.loads(row[3]), json.loads(row[4]) if row[4] else []
+
+    def store(self, path: str, fileKey: tuple, matches: dict, truncated: list = None):
+        '''
+        Records the matches for a scanned file.  fileKey is the (size, mtime_ns, inode) of the file when it was discovered, so a file
+        that changed while it was being scanned will be scanned again next time.
+        '''
+
+        if self.db is None:
+            return
+        self.pending.append((path, *fileKey, json.dumps(matches), json.dumps(truncated) if truncated else None))
+        if len(self.pending) >= self._SAVEINTERVAL:
+            self.save()
+
+    def save(self):
+        '''Writes any new results to the database'''
+
+        if self.db is None or not self.pending:
+            return
+        try:
+            with self.db:
+                self.db.executemany('INSERT OR REPLACE INTO files (path, size, mtime, ino, matches, truncated) VALUES (?, ?, ?, ?, ?, ?)', self.pending)
+        except sqlite3.Error as e:
+            self._dbError(e)
+        self.pending = []
+
+    def close(self):
+        self.save()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def _dbError(self, e):
+        # The index is only an optimization.  If it can't be used, every file is scanned as usual.
+        if self.logger:
+            self.logger.info('Scan index disabled: %s', str(e))
+        try:
+            self.db.close()
+        except Exception:
+            pass
+        self.db = None
@@ -0,0 +1,124 @@
+import heapq
+import multiprocessing as mp
+from queue import Full
+
+from piidigger import classes
+from piidigger import queuefuncs
+from piidigger.dedup import DuplicateFinder
+from piidigger.globalvars import SENTINEL
+from piidigger.logmanager import LogManager
+
+# Limits how much of filesQ is pulled into the heap before the scheduler goes back to feeding the file handlers
+_MAXDRAIN = 100
+
+
+def fileScheduler(config: classes.Config,
+                  queues: dict,
+                  stopEvent: mp.Event,
+                  logManager: LogManager,):
+    '''
+    Sits between the discovery workers (filesQ) and the file handlers (scanQ) and hands out the largest files first.
+
+    Every File received from filesQ goes on a heap ordered by size.  scanQ is bounded to about one batch per file handler, so the 
+    scheduler only commits a batch when a file handler is ready for it.  Until then, newly discovered files keep flowing into the heap.
+    That way, a multi-GB file discovered late in the scan is still picked up ahead of the small files, instead of being the last
+    thing a single file handler works on after every other one has gone idle.  With schedule = "fifo", files keep the order they were 
+    discovered in.
+
+    If [performance]dedup is enabled, files that look like copies of a file seen before are marked as duplicates (see dedup.py).  They're
+    passed along with the next batch.  The file handler makes sure that they really are copies, and if so, the collector copies the 
+    original file's results to them.
+    '''
+
+    try:
+        logger = logManager.getLogger(name=mp.current_process().name,)
+        logger.info('Starting %s', mp.current_process().name)
+
+        heap=list()
+        seq=0
+        batch=None
+        discoveryDone=False
+        batchSize=config.getFilesBatchSize()
+        batchBytes=config.getScheduleBatchBytes()
+        largestFirst=config.getSchedule() == 'largest'
+        duplicateFinder=DuplicateFinder(config.getDedupMinBytes(), logger) if config.getDedup() else None
+        duplicates=list()
+        # Files that haven't been sent to the file handlers yet, which can still be marked to keep their results for a duplicate
+        waiting=dict()
+
+        while not stopEvent.is_set():
+            # Only wait on filesQ if there's nothing else to do
+            for _ in range(_MAXDRAIN):
+                if discoveryDone:
+                    break
+                item=queuefuncs.getItem(queues['filesQ'], timeout=0 if (heap or batch or duplicates) else queuefuncs.TIMEOUT)
+                if item is None:
+                    break
+                if item == SENTINEL:
+                    discoveryDone=True
+                    break
+                for fObj in item:
+                    # Files from the scan index won't be read anyway
+                    if duplicateFinder is not None and fObj.getCachedMatches() is None:
+                        original=duplicateFinder.findOriginal(fObj.getFullPath(), fObj.getFileSize(), waiting)
+                        if original is not None:
+                            logger.debug('%s: Duplicate of %s', fObj.getFullPath(), original)
+                            if original in waiting:
+                                waiting[original].setKeepResults(True)
+                            fObj.setDuplicateOf(original)
+                            duplicates.append(fObj)
+                            continue
+                        waiting[fObj.getFullPath()]=fObj
+                    # seq keeps the heap from ever comparing two File objects directly and keeps equal-sized files in discovery order
+                    heapq.heappush(heap, (-fObj.getFileSize() if largestFirst else 0, seq, fObj))
+                    seq+=1
+
+            if batch is None and (heap or duplicates):
+                batch=makeBatch(heap, batchSize, batchBytes)
+                batch.extend(duplicates)
+                duplicates=list()
+
+            if batch is not None:
+                try:
+                    queues['scanQ'].put(batch, timeout=queuefuncs.TIMEOUT)
+                except Full:
+                    # All of the file handlers are busy.  Hold on to the batch and check for new files in the meantime.
+                    continue
+                # The queue pickles the files in the background after put() returns, so they mustn't be changed any more
+                for fObj in batch:
+                    waiting.pop(fObj.getFullPath(), None)
+                batch=None
+            elif discoveryDone:
+                break
+
+        if duplicateFinder is not None:
+            logger.info('%d possible duplicate files found', duplicateFinder.duplicates)
+
+        # All files have been scheduled.  Put the sentinel on the queue for the fileHandlers
+        queues['scanQ'].put(SENTINEL)
+        queuefuncs.waitOnQ(queues['scanQ'])
+    except KeyboardInterrupt:
+        logger.info('KeyboardInterrupt received in %s', mp.current_process().name)
+        queuefuncs.clearQ(queues['filesQ'])
+        queuefuncs.clearQ(queues['scanQ'])
+    finally:
+        logger.info('Stopping %s (PID=%d)', mp.current_process().name, mp.current_process().pid)
+
+
+def makeBatch(heap: list, 
+              batchSize: int, 
+              batchBytes: int,) -> list:
+    '''
+    Pops the largest files from the heap into a batch.  The batch is closed once it holds batchSize files or batchBytes bytes, so 
+    large files are handed out on their own while small files are still grouped together to keep the IPC overhead down.
+    '''
+
+    batch=list()
+    totalBytes=0
+
+    while heap and len(batch) < batchSize and totalBytes < batchBytes:
+        _, _, fObj=heapq.heappop(heap)
+        batch.append(fObj)
+        totalBytes+=fObj.getFileSize()
+
+    return batch
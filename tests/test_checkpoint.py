@@ -0,0 +1,67 @@
+import pytest
+
+from piidigger.checkpoint import Checkpoint, getFingerprint
+
+matches={'Primary Account Number': {'visa': ['4893 01** **** 6137']}}
+
+@pytest.mark.utils
+def test_checkpoint_progress(tmp_path):
+    dbFile=str(tmp_path / 'logs' / 'checkpoint.db')
+    fingerprint=getFingerprint(['pan'], ['/data'])
+
+    checkpoint=Checkpoint(dbFile, interval=60)
+    checkpoint.reset(fingerprint, ['/data'])
+    checkpoint.addDir('/data', ['/data/a', '/data/b'], ['/data/1.txt', '/data/2.txt'])
+    checkpoint.addDir('/data/a', [], ['/data/a/3.txt', '/data/a/4.txt'])
+    checkpoint.completeFile('/data/1.txt', matches)
+    checkpoint.completeFile('/data/a/4.txt', matches, ['Primary Account Number'])
+    checkpoint.completeFile('/data/a/3.txt', {})
+    checkpoint.close()
+
+    checkpoint=Checkpoint(dbFile)
+    assert checkpoint.getFingerprint() == fingerprint
+    assert not checkpoint.isComplete()
+    assert checkpoint.getPendingDirs() == ['/data/b']
+    assert checkpoint.getPartialDirs() == ['/data']
+    assert checkpoint.isDirDone('/data/a')
+    assert not checkpoint.isDirDone('/data/b')
+    assert checkpoint.isDone('/data/1.txt')
+    assert not checkpoint.isDone('/data/2.txt')
+    assert sorted(checkpoint.getResults()) == [('/data/1.txt', matches, []), ('/data/a/4.txt', matches, ['Primary Account Number'])]
+
+    checkpoint.markComplete()
+    assert checkpoint.isComplete()
+    checkpoint.close()
+
+@pytest.mark.utils
+def test_checkpoint_completed_before_found(tmp_path):
+    # The collector and the discovery workers save on their own schedules.  A completed file must stay completed.
+    dbFile=str(tmp_path / 'checkpoint.db')
+    Checkpoint(dbFile).reset(getFingerprint(['pan'], ['/data']), ['/data'])
+
+    collector=Checkpoint(dbFile)
+    discovery=Checkpoint(dbFile)
+    collector.completeFile('/data/1.txt', matches)
+    collector.close()
+    discovery.addDir('/data', [], ['/data/1.txt'])
+    discovery.close()
+
+    checkpoint=Checkpoint(dbFile)
+    assert checkpoint.isDone('/data/1.txt')
+    assert checkpoint.getPartialDirs() == []
+    checkpoint.close()
+
+@pytest.mark.utils
+def test_checkpoint_reset(tmp_path):
+    dbFile=str(tmp_path / 'checkpoint.db')
+    checkpoint=Checkpoint(dbFile)
+    checkpoint.reset(getFingerprint(['pan'], ['/data']), ['/data'])
+    checkpoint.addDir('/data', [], ['/data/1.txt'])
+    checkpoint.markComplete()
+    checkpoint.reset(getFingerprint(['pan', 'email'], ['/home']), ['/home'])
+
+    assert checkpoint.getFingerprint() == getFingerprint(['email', 'pan'], ['/home'])
+    assert not checkpoint.isComplete()
+    assert checkpoint.getPendingDirs() == ['/home']
+    assert checkpoint.getPartialDirs() == []
+    checkpoint.close()
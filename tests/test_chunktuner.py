@@ -0,0 +1,70 @@
+import shutil
+from queue import Queue
+
+import pytest
+
+from piidigger import chunktuner
+from piidigger import classes
+from piidigger import globalfuncs
+from piidigger.datahandlers import email, pan
+from piidigger.logmanager import LogManager
+
+def makeConfig(startDir: str) -> classes.Config:
+    config=classes.Config(configFile='', useDefault=True)
+    config.config['includeFiles']['startDirs'][globalfuncs.getOSType()]=[startDir]
+    return config
+
+@pytest.mark.unit
+@pytest.mark.parametrize('text, size, expected_result', [
+                                ('lorem ipsum dolor sit amet', 5, ['lorem', 'ipsum', 'dolor', 'sit amet']),
+                                ('lorem ipsum dolor sit amet', 9, ['lorem ipsum', 'dolor sit', 'amet']),
+                                ('lorem ipsum dolor sit amet', 100, ['lorem ipsum dolor sit amet']),
+                                ('', 5, []),
+                            ]
+                        )
+def test_split_text(text, size, expected_result):
+    assert chunktuner.splitText(text, size) == expected_result
+
+@pytest.mark.unit
+def test_auto_tune_chunks(tmp_path):
+    (tmp_path / 'subdir').mkdir()
+    (tmp_path / 'subdir' / 'file1.txt').write_text('lorem ipsum 4893 0133 3538 6137 dolor jdoe@example.com sit amet\n' * 200, encoding='utf-16')
+    shutil.copy('testdata/docx/lorem-ipsum-2paragraph.docx', tmp_path / 'file2.docx')
+    (tmp_path / 'file3.log').write_text('quisquam est qui dolorem\n' * 200)
+    (tmp_path / 'file4.bin').write_bytes(b'\x00' * 10_000)
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+    config=makeConfig(str(tmp_path))
+
+    # The ASCII log file is memory-mapped during the scan, so the chunk settings don't apply to it
+    samples=chunktuner.getSample(config, [pan, email], logManager)
+    assert sorted(fileHandlerName for fileHandlerName, _ in samples) == ['docx', 'plaintext']
+    assert ' '.join(text for _, text in samples).count('4893 0133 3538 6137') == 200
+    assert ' '.join(text for _, text in samples).count('quisquam') == 0
+
+    size=chunktuner.autoTuneChunks(config, [pan, email], logManager)
+
+    # The default content size is larger than any of the candidates, so it's kept if the largest candidate was the fastest
+    assert size in chunktuner.candidateSizes[:-1] + [globalfuncs.getDefaultConfig()['performance']['chunkSize'] * globalfuncs.getDefaultConfig()['performance']['chunkCount']]
+    assert config.getChunkCount() == size // config.getChunkSize()
+
+@pytest.mark.unit
+def test_auto_tune_chunks_without_text(tmp_path):
+    (tmp_path / 'file1.bin').write_bytes(b'\x00' * 10_000)
+    (tmp_path / 'file2.log').write_text('lorem ipsum 4893 0133 3538 6137 dolor jdoe@example.com sit amet\n' * 200)
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+    config=makeConfig(str(tmp_path))
+
+    assert chunktuner.autoTuneChunks(config, [pan, email], logManager) == 0
+    assert config.getChunkCount() == globalfuncs.getDefaultConfig()['performance']['chunkCount']
+
+@pytest.mark.utils
+def test_invalid_chunk_settings(tmp_path):
+    configFile=tmp_path / 'piidigger.toml'
+    assert globalfuncs.writeDefaultConfig(str(configFile)) == 'Success'
+    configFile.write_text(configFile.read_text().replace('chunkSize = 650', 'chunkSize = 0').replace('chunkCount = 100000', 'chunkCount = 1000'))
+
+    config=classes.Config(configFile=str(configFile))
+
+    assert config.getChunkSize() == globalfuncs.getDefaultConfig()['performance']['chunkSize']
+    assert config.getChunkCount() == 1000
+    assert config.getChunkAutoTune() is False
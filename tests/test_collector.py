@@ -0,0 +1,106 @@
+import pytest
+
+from piidigger import globalfuncs
+from piidigger.collector import DuplicateResults, isCapped, mergePart
+
+@pytest.mark.unit
+def test_merge_parts():
+    pending=dict()
+    parts=[
+        {'filename': 'big.log', 'matches': {'Primary Account Number': {'visa': {'4893 01** **** 6137'}}}, 'part': 1, 'parts': 3},
+        {'filename': 'big.log', 'matches': {}, 'part': 2, 'parts': 3},
+        {'filename': 'big.log', 'matches': {'Primary Account Number': {'visa': {'4893 01** **** 6137', '468439******4835'}},
+                                            'Email': {'example.com': {'jdoe@example.com'}}}, 'part': 0, 'parts': 3},
+    ]
+
+    assert mergePart(pending, parts[0]) is None
+    assert mergePart(pending, parts[1]) is None
+    result=mergePart(pending, parts[2])
+
+    assert pending == {}
+    assert result['filename'] == 'big.log'
+    assert result['matches'] == {
+        'Primary Account Number': {'visa': {'4893 01** **** 6137', '468439******4835'}},
+        'Email': {'example.com': {'jdoe@example.com'}},
+    }
+
+@pytest.mark.unit
+def test_merge_parts_max_matches():
+    pending=dict()
+    parts=[
+        {'filename': 'big.log', 'matches': {'Primary Account Number': {'visa': {'4893 01** **** 6137', '468439******4835'}},
+                                            'Email': {'example.com': {'jdoe@example.com'}}}, 'part': 0, 'parts': 3},
+        {'filename': 'big.log', 'matches': {'Primary Account Number': {'amex': {'3782-82****-*0005'}}}, 'part': 1, 'parts': 3},
+        {'filename': 'big.log', 'matches': {'Email': {'example.com': {'jdoe@example.com', 'asmith@example.com'}}}, 'part': 2, 'parts': 3,
+         'truncated': {'Email'}},
+    ]
+
+    assert mergePart(pending, parts[0], 2) is None
+    assert mergePart(pending, parts[1], 2) is None
+    result=mergePart(pending, parts[2], 2)
+
+    # Each part stops at the limit on its own, so the merged results are cut down to it again.  The email addresses fit, but the part
+    # that found them stopped before the end of its range.
+    assert result['matches'] == {
+        'Primary Account Number': {'visa': {'4893 01** **** 6137', '468439******4835'}},
+        'Email': {'example.com': {'jdoe@example.com', 'asmith@example.com'}},
+    }
+    assert result['truncated'] == {'Primary Account Number', 'Email'}
+
+@pytest.mark.unit
+def test_merge_parts_at_max_matches():
+    pending=dict()
+    parts=[
+        {'filename': 'big.log', 'matches': {'Primary Account Number': {'visa': {'4893 01** **** 6137'}}}, 'part': 0, 'parts': 2},
+        {'filename': 'big.log', 'matches': {'Primary Account Number': {'visa': {'4893 01** **** 6137', '468439******4835'}}}, 'part': 1, 'parts': 2},
+    ]
+
+    assert mergePart(pending, parts[0], 2) is None
+    result=mergePart(pending, parts[1], 2)
+
+    # Reaching the limit isn't enough to be truncated.  Nothing was left out.
+    assert globalfuncs.countMatches(result['matches']['Primary Account Number']) == 2
+    assert 'truncated' not in result
+
+@pytest.mark.unit
+def test_merge_parts_capped():
+    pending=dict()
+    dataHandlers=['Primary Account Number', 'Email']
+    parts=[
+        {'filename': 'big.log', 'matches': {'Primary Account Number': {'visa': {'4893 01** **** 6137', '468439******4835'}}}, 'part': 0, 'parts': 3,
+         'dataHandlers': dataHandlers},
+        {'filename': 'big.log', 'matches': {'Email': {'example.com': {'jdoe@example.com', 'asmith@example.com'}}}, 'part': 2, 'parts': 3,
+         'dataHandlers': dataHandlers},
+        {'filename': 'big.log', 'matches': {}, 'part': 1, 'parts': 3, 'skipped': True},
+    ]
+
+    assert mergePart(pending, parts[0], 2) is None
+    assert not isCapped(pending['big.log'], 2)
+    assert mergePart(pending, parts[1], 2) is None
+    # Only once, as the file handlers only need to be told once
+    assert isCapped(pending['big.log'], 2)
+    assert not isCapped(pending['big.log'], 2)
+    result=mergePart(pending, parts[2], 2)
+
+    # The part that was skipped could have had more matches for every data handler
+    assert result['truncated'] == {'Primary Account Number', 'Email'}
+
+@pytest.mark.unit
+def test_duplicate_results():
+    duplicates=DuplicateResults()
+    matches={'Primary Account Number': {'visa': ['4893 01** **** 6137']}}
+
+    # The duplicate can arrive before or after its original
+    assert duplicates.addDuplicate({'filename': 'copy1.csv', 'matches': {}, 'duplicateOf': 'report.csv'}) == []
+    assert duplicates.addOriginal('report.csv', matches) == [{'filename': 'copy1.csv', 'matches': matches, 'duplicateOf': 'report.csv'}]
+    assert duplicates.addDuplicate({'filename': 'copy2.csv', 'matches': {}, 'duplicateOf': 'report.csv'}) == [{'filename': 'copy2.csv', 'matches': matches, 'duplicateOf': 'report.csv'}]
+
+    # Originals without matches aren't kept, so their duplicates wait until the end
+    assert duplicates.addOriginal('empty.txt', {}) == []
+    assert duplicates.addDuplicate({'filename': 'copy.txt', 'matches': {}, 'duplicateOf': 'empty.txt'}) == []
+    assert duplicates.getWaiting() == [{'filename': 'copy.txt', 'matches': {}, 'duplicateOf': 'empty.txt'}]
+
+    # Copies of a file whose results were cut short are marked the same way
+    duplicates.addOriginal('big.log', matches, ['Primary Account Number'])
+    assert duplicates.addDuplicate({'filename': 'copy.log', 'matches': {}, 'duplicateOf': 'big.log'}) == [
+        {'filename': 'copy.log', 'matches': matches, 'duplicateOf': 'big.log', 'truncated': ['Primary Account Number']}]
@@ -0,0 +1,73 @@
+import random
+from collections import deque
+
+import pytest
+
+from piidigger.filehandlers._sharedfuncs import ContentHandler
+
+
+class WordContentHandler:
+    '''The original word-by-word ContentHandler, kept as the reference for the chunks that ContentHandler has to return'''
+
+    def __init__(self, maxContentSize: int):
+        self.maxContentSize = maxContentSize
+        self.contentBuffer = deque()
+        self.bufferLength = 0
+
+    def appendContent(self, line: str) -> None:
+        line = line.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ').strip()
+        for word in line.split():
+            self.contentBuffer.append(word)
+            self.bufferLength += len(word) + 1
+
+    def contentBufferFull(self) -> bool:
+        return self.bufferLength >= self.maxContentSize
+
+    def getContent(self) -> str:
+        content: list = []
+        contentLength: int = 0
+        while self.contentBuffer and contentLength < self.maxContentSize:
+            word = self.contentBuffer.popleft()
+            content.append(word)
+            self.bufferLength -= len(word) + 1
+            contentLength += len(word) + 1
+        return ' '.join(content)
+
+    def finalizeContent(self) -> str:
+        content = ' '.join(self.contentBuffer)
+        self.bufferLength = 0
+        self.contentBuffer = []
+        return content
+
+
+def getChunks(handler, lines: list) -> list:
+    chunks=list()
+    for line in lines:
+        handler.appendContent(line)
+        if handler.contentBufferFull():
+            chunks.append(handler.getContent())
+    chunks.append(handler.finalizeContent())
+    return chunks
+
+
+@pytest.mark.filehandlers
+@pytest.mark.parametrize('maxContentSize', [1, 10, 650, 1300, 65_000])
+@pytest.mark.parametrize('seed', range(3))
+def test_content_handler_matches_reference(maxContentSize, seed):
+    rnd=random.Random(seed)
+    words=['4111', '1111-1111', 'user@example.com', 'café', 'x' * 700, 'lorem', 'ipsum', '']
+    spaces=[' ', '  ', '\t', '\r\n', '\n', '\x0b', ' ', ' ']
+    lines=[''.join(rnd.choice(words) + rnd.choice(spaces) for _ in range(rnd.randrange(0, 200))) for _ in range(100)]
+
+    assert getChunks(ContentHandler(maxContentSize), lines) == getChunks(WordContentHandler(maxContentSize), lines)
+
+@pytest.mark.filehandlers
+def test_content_handler_keeps_lines():
+    handler=ContentHandler(maxContentSize=20)
+    handler.appendContent('  4111 1111\t1111\r\n')
+    handler.appendContent('1111  user@example.com\n')
+
+    assert handler.contentBuffer == ['4111 1111 1111', '1111 user@example.com']
+    assert handler.contentBufferFull()
+    assert handler.getContent() == '4111 1111 1111 1111'
+    assert handler.finalizeContent() == 'user@example.com'
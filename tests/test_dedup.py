@@ -0,0 +1,93 @@
+import pytest
+
+from piidigger import dedup
+from piidigger.dedup import DuplicateFinder, isDuplicate
+
+@pytest.mark.utils
+def test_duplicate_finder(tmp_path):
+    original=tmp_path / 'report.csv'
+    original.write_bytes(b'4893 0133 3538 6137\n' * 500)
+    sameSize=tmp_path / 'other.csv'
+    sameSize.write_bytes(b'x' * original.stat().st_size)
+    copies=[tmp_path / 'backup' / 'report.csv', tmp_path / 'backup' / 'report-copy.csv', tmp_path / 'backup' / 'report-copy2.csv']
+    copies[0].parent.mkdir()
+    for copy in copies:
+        copy.write_bytes(original.read_bytes())
+    size=original.stat().st_size
+    duplicateFinder=DuplicateFinder(minBytes=1)
+
+    # The first file of each size isn't an original, as its results were sent on before anything else of that size was found
+    assert duplicateFinder.findOriginal(str(original), size) is None
+    assert duplicateFinder.findOriginal(str(sameSize), size) is None
+
+    # So its first copy is scanned too, and becomes the original for the rest while it's still waiting to be sent
+    assert duplicateFinder.findOriginal(str(copies[0]), size) is None
+    assert duplicateFinder.findOriginal(str(copies[1]), size, {str(copies[0])}) == str(copies[0])
+    assert duplicateFinder.findOriginal(str(copies[2]), size) == str(copies[0])
+    assert duplicateFinder.duplicates == 2
+    assert duplicateFinder.kept == {str(copies[0])}
+
+@pytest.mark.utils
+def test_duplicate_finder_sent_original(tmp_path):
+    for name in ['first.csv', 'report.csv', 'copy1.csv', 'copy2.csv']:
+        (tmp_path / name).write_text('4893 0133 3538 6137\n' if name != 'first.csv' else 'x' * 20)
+    size=(tmp_path / 'first.csv').stat().st_size
+    duplicateFinder=DuplicateFinder(minBytes=1)
+
+    # report.csv was sent without keeping its results, so its first copy is scanned and takes its place
+    assert duplicateFinder.findOriginal(str(tmp_path / 'first.csv'), size) is None
+    assert duplicateFinder.findOriginal(str(tmp_path / 'report.csv'), size) is None
+    assert duplicateFinder.findOriginal(str(tmp_path / 'copy1.csv'), size) is None
+    assert duplicateFinder.findOriginal(str(tmp_path / 'copy2.csv'), size, {str(tmp_path / 'copy1.csv')}) == str(tmp_path / 'copy1.csv')
+
+@pytest.mark.utils
+def test_duplicate_finder_same_size(monkeypatch):
+    compared=[0]
+    class PartialHash(bytes):
+        def __eq__(self, other):
+            compared[0]+=1
+            return bytes.__eq__(self, other)
+        __hash__=bytes.__hash__
+
+    hashed=list()
+    def hashFile(path, partial=False, logger=None):
+        hashed.append(path)
+        return PartialHash(path.encode())
+    monkeypatch.setattr(dedup, 'hashFile', hashFile)
+    duplicateFinder=DuplicateFinder(minBytes=1)
+
+    # Thousands of different files of the same size.  Each one is hashed once, except for the first, and isn't compared with the others.
+    for i in range(20_000):
+        assert duplicateFinder.findOriginal('/share/file%d.dat' % i, 4096) is None
+    assert len(hashed) == 19_999
+    assert compared[0] < 100
+
+@pytest.mark.utils
+def test_is_duplicate(tmp_path):
+    # Same size and the same first and last 64KB, so only the full hash can tell them apart
+    first=tmp_path / 'first.log'
+    second=tmp_path / 'second.log'
+    third=tmp_path / 'third.log'
+    first.write_bytes(b'a' * 100_000 + b'b' + b'a' * 100_000)
+    second.write_bytes(b'a' * 100_000 + b'c' + b'a' * 100_000)
+    third.write_bytes(first.read_bytes())
+    size=first.stat().st_size
+    duplicateFinder=DuplicateFinder(minBytes=1)
+
+    assert duplicateFinder.findOriginal(str(first), size) is None
+    assert duplicateFinder.findOriginal(str(second), size) is None
+    assert duplicateFinder.findOriginal(str(third), size, {str(second)}) == str(second)
+    assert not isDuplicate(str(third), str(second))
+    assert isDuplicate(str(third), str(first))
+    assert not isDuplicate(str(third), str(tmp_path / 'missing.log'))
+
+@pytest.mark.utils
+def test_duplicate_finder_small_files(tmp_path):
+    first=tmp_path / 'first.txt'
+    second=tmp_path / 'second.txt'
+    first.write_text('hello')
+    second.write_text('hello')
+    duplicateFinder=DuplicateFinder(minBytes=4096)
+
+    assert duplicateFinder.findOriginal(str(first), 5) is None
+    assert duplicateFinder.findOriginal(str(second), 5) is None
@@ -0,0 +1,111 @@
+import multiprocessing as mp
+from queue import Queue
+
+import pytest
+
+from piidigger import classes
+from piidigger import piidigger
+from piidigger.globalvars import SENTINEL
+from piidigger.logmanager import LogManager
+
+def makeTotals() -> dict:
+    return {
+        'bytesScanned': mp.Value('Q', 0),
+        'rangesPending': mp.Value('i', 0),
+        'cappedFiles': classes.CappedFiles(),
+    }
+
+@pytest.mark.unit
+def test_dispatcher_skips_failed_files(tmp_path, monkeypatch):
+    files=list()
+    for name in ['good1.txt', 'bad.txt', 'good2.txt']:
+        (tmp_path / name).write_text('lorem ipsum 4893 0133 3538 6137 dolor sit amet\n')
+        files.append(classes.File(str(tmp_path / name), 'text/plain'))
+
+    realScanFile=piidigger.scanFile
+    def scanFile(item, *args):
+        if item.getFullPath().endswith('bad.txt'):
+            raise ValueError('Corrupt file')
+        return realScanFile(item, *args)
+    monkeypatch.setattr(piidigger, 'scanFile', scanFile)
+
+    config=classes.Config(configFile='', useDefault=True)
+    config.config['dataHandlers']=['pan']
+    queues={'scanQ': Queue(), 'rangeQ': Queue(), 'collectQ': Queue()}
+    queues['scanQ'].put(files)
+    queues['scanQ'].put(SENTINEL)
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+
+    piidigger.fileHandlerDispatcher(config, queues, makeTotals(), mp.Event(), mp.Value('i', 0), logManager)
+
+    # The rest of the batch is still scanned, and the failed file is reported without matches
+    records=queues['collectQ'].get()
+    assert [record['filename'] for record in records] == [f.getFullPath() for f in files]
+    assert [bool(record['matches']) for record in records] == [True, False, True]
+    assert queues['collectQ'].get() == SENTINEL
+
+@pytest.mark.unit
+def test_failed_range_is_no_longer_pending(tmp_path, monkeypatch):
+    (tmp_path / 'big.log').write_text('lorem ipsum\n' * 100)
+    fileRange=classes.FileRange(classes.File(str(tmp_path / 'big.log'), 'text/plain'), 1, 3, 400, 800, 0, 'ascii')
+    def scanRange(*args):
+        raise OSError('Disk error')
+    monkeypatch.setattr(piidigger, 'scanRange', scanRange)
+    totals=makeTotals()
+    totals['rangesPending'].value=2
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+    config=classes.Config(configFile='', useDefault=True)
+
+    record=piidigger.tryScanRange(fileRange, config, totals, [], logManager.getLogger('test'), logManager)
+
+    assert record == {'filename': fileRange.getFullPath(), 'matches': {}, 'part': 1, 'parts': 3}
+    assert totals['rangesPending'].value == 1
+
+@pytest.mark.unit
+def test_capped_range_is_skipped(tmp_path, monkeypatch):
+    (tmp_path / 'big.log').write_text('lorem ipsum\n' * 100)
+    fileRange=classes.FileRange(classes.File(str(tmp_path / 'big.log'), 'text/plain'), 2, 3, 800, 1200, 0, 'ascii')
+    def scanRange(*args):
+        raise AssertionError('Part was scanned')
+    monkeypatch.setattr(piidigger, 'scanRange', scanRange)
+    totals=makeTotals()
+    totals['rangesPending'].value=1
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+    config=classes.Config(configFile='', useDefault=True)
+
+    # Other files that reached the limit don't matter
+    totals['cappedFiles'].add(str(tmp_path / 'other.log'))
+    assert fileRange.getFullPath() not in totals['cappedFiles']
+    totals['cappedFiles'].add(fileRange.getFullPath())
+    record=piidigger.tryScanRange(fileRange, config, totals, [], logManager.getLogger('test'), logManager)
+
+    assert record['skipped'] and record['matches'] == {} and record['part'] == 2
+    assert totals['rangesPending'].value == 0
+    assert totals['bytesScanned'].value == 400
+
+@pytest.mark.unit
+def test_dispatcher_checks_duplicates(tmp_path):
+    (tmp_path / 'report.csv').write_text('lorem ipsum 4893 0133 3538 6137 dolor sit amet\n')
+    (tmp_path / 'copy.csv').write_text('lorem ipsum 4893 0133 3538 6137 dolor sit amet\n')
+    (tmp_path / 'other.csv').write_text('lorem ipsum 4684 3992 9367 4835 dolor sit amet\n')
+    original=classes.File(str(tmp_path / 'report.csv'), 'text/plain')
+    original.setKeepResults(True)
+    files=[original]
+    for name in ['copy.csv', 'other.csv']:
+        files.append(classes.File(str(tmp_path / name), 'text/plain'))
+        files[-1].setDuplicateOf(original.getFullPath())
+
+    config=classes.Config(configFile='', useDefault=True)
+    config.config['dataHandlers']=['pan']
+    queues={'scanQ': Queue(), 'rangeQ': Queue(), 'collectQ': Queue()}
+    queues['scanQ'].put(files)
+    queues['scanQ'].put(SENTINEL)
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+
+    piidigger.fileHandlerDispatcher(config, queues, makeTotals(), mp.Event(), mp.Value('i', 0), logManager)
+
+    # The fileScheduler only compared the sizes and the ends of the files, so a file that isn't a real copy is scanned as usual
+    original, copy, other=queues['collectQ'].get()
+    assert original['keepResults'] and original['matches']
+    assert copy['duplicateOf'] == str(tmp_path / 'report.csv') and not copy['matches']
+    assert 'duplicateOf' not in other and other['matches']
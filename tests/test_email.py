@@ -35,6 +35,17 @@ def test_email_match_and_redaction(data, expected_result):
     result = email.findMatch(data)
     assert result == expected_result
 
+@pytest.mark.datahandlers
+@pytest.mark.parametrize('data', [
+    'Send your resume to hr@bigcorp.org or careers@bigcorp.org by Friday.',
+    'quoted"email"@example.com is valid per RFC5322',
+    'Invalid emails: a@, @example.com, plaintext',
+    'caf\u00e9 user@example.com\r\n\tvery.long.email.address@company-name.com',
+])
+def test_email_match_bytes(data):
+    """Matching the raw bytes gives the same results as matching the text"""
+    assert email.findMatchBytes(data.encode('utf-8')) == email.findMatch(data)
+
 class TestEmailFunctions:
     def test_is_valid(self):
         """Test email validation function"""
@@ -42,6 +53,7 @@ class TestEmailFunctions:
         assert email._isValid('user@example.com') is True
         assert email._isValid('a@b.co') is True
         assert email._isValid('complex+email.address123@sub-domain.example.co.uk') is True
+        assert email._isValid('x' * 64 + '@' + 'y' * 63 + '.com') is True       # Longest local part and domain label
         
         # Invalid emails
         assert email._isValid('not_an_email') is False
@@ -55,6 +67,8 @@ class TestEmailFunctions:
         assert email._isValid('user@thisisasuperlongdomainlabelofexactlysixtysevencharactersinlengthxxx.com') is False  # Invalid domain label length
         assert email._isValid('user@invalid.0tld') is False  # Invalid TLD
         assert email._isValid('user@example.thisisaverylongdomainnamethatexceedsthemaximumallowedlengthforadomainpartof253charactersandshouldbeusedtotestemailvalidationroutines.com') is False  # Domain part too long
+        assert email._isValid('x' * 65 + '@example.com') is False              # Local part too long
+        assert email._isValid('user@' + 'y' * 64 + '.com') is False             # Domain label too long
     
 
     def test_redact_rule1(self):
@@ -0,0 +1,33 @@
+import pytest
+
+from piidigger.classes import ExcludeMatcher
+
+patterns=['/proc', '/usr/lib', '/USR/Share', '*/.vscode-server', '**/node_modules', 'C:\\Windows', '*\\.git']
+
+@pytest.mark.unit
+@pytest.mark.parametrize('path, expected_result', [
+                            ('/proc', '/proc'),
+                            ('/proc/1/fd', '/proc'),
+                            ('/usr/lib32', '/usr/lib'),
+                            ('/usr/share/doc', '/USR/Share'),
+                            ('/usr', None),
+                            ('/pro', None),
+                            ('/home/user/.vscode-server', '*/.vscode-server'),
+                            ('/home/user/project/node_modules', '**/node_modules'),
+                            ('/home/user/project/node_modules_backup', None),
+                            ('c:\\windows\\system32', 'C:\\Windows'),
+                            ('D:\\src\\project\\.git', '*\\.git'),
+                            ('/home/user/project/.git', '*\\.git'),
+                            ('/home/user/project/.github', None),
+                          ]
+                  )
+def test_exclude_matcher(path, expected_result):
+    matcher=ExcludeMatcher(patterns)
+
+    assert matcher.match(path) == expected_result
+
+@pytest.mark.unit
+def test_exclude_matcher_no_patterns():
+    matcher=ExcludeMatcher([])
+
+    assert matcher.match('/home/user') is None
@@ -0,0 +1,57 @@
+import os
+import pickle
+from queue import Queue
+
+import pytest
+
+from piidigger import classes
+from piidigger.filescan import scanDir
+from piidigger.logmanager import LogManager
+
+@pytest.mark.unit
+def test_scan_dir(tmp_path):
+    (tmp_path / 'subdir').mkdir()
+    (tmp_path / 'file1.txt').write_text('hello')
+    (tmp_path / 'file2.log').write_text('')
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+    logger=logManager.getLogger('test_scan_dir')
+
+    subDirs, files = scanDir(str(tmp_path), logger)
+
+    assert subDirs == [str(tmp_path / 'subdir')]
+    assert sorted(f.name for f, _ in files) == ['file1.txt', 'file2.log']
+    assert {f.name: fStat.st_size for f, fStat in files} == {'file1.txt': 5, 'file2.log': 0}
+
+@pytest.mark.unit
+def test_scan_dir_missing(tmp_path):
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+    logger=logManager.getLogger('test_scan_dir')
+
+    assert scanDir(str(tmp_path / 'does-not-exist'), logger) == ([], [])
+
+@pytest.mark.unit
+def test_file_uses_provided_stat(tmp_path):
+    f=tmp_path / 'file1.txt'
+    f.write_text('hello')
+    fStat=os.stat(f)
+
+    fObj=classes.File(str(f), 'text/plain', fStat)
+
+    assert fObj.getFullPath() == str(f)
+    assert fObj.getExtension() == '.txt'
+    assert fObj.getFileSize() == 5
+    assert fObj.getTimeStamps() == (fStat.st_atime, fStat.st_mtime)
+    assert fObj.getFileHandlerName() == 'plaintext'
+
+@pytest.mark.unit
+def test_file_is_compact_and_picklable(tmp_path):
+    f=tmp_path / 'file1.txt'
+    f.write_text('hello')
+    fObj=classes.File(str(f), None)
+
+    assert not hasattr(fObj, '__dict__')
+
+    copy=pickle.loads(pickle.dumps([fObj]))[0]
+    assert copy.getFullPath() == fObj.getFullPath()
+    assert copy.getFileSize() == 5
+    assert copy.getFileHandlerName() == 'plaintext'
@@ -1,7 +1,11 @@
 import pytest
 from queue import Queue
 
-from piidigger.getencoding import getEncoding
+from piidigger import classes
+from piidigger import globalfuncs
+from piidigger import getencoding
+from piidigger.getencoding import detectEncoding, getEncoding, setSampleBytes
+from piidigger.globalvars import encodingSampleBytes
 from piidigger.logmanager import LogManager
 
 @pytest.mark.filehandlers
@@ -14,4 +18,69 @@ def test_getEncoding(testFile, expected_result):
     logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
     result=getEncoding(testFile, logManager)
 
-    assert result==expected_result
\ No newline at end of file
+    assert result==expected_result
+
+@pytest.mark.filehandlers
+@pytest.mark.parametrize('sample, complete, expected_result', [
+                                (b'', True, None),
+                                (b'4111 1111 1111 1111\r\n', True, 'ascii'),
+                                (b'4111 1111 1111 1111\r\n', False, 'utf-8'),
+                                ('caf\u00e9 4111 1111 1111 1111'.encode('utf-8'), True, 'utf-8'),
+                                ('caf\u00e9'.encode('utf-8')[:-1], False, 'utf-8'),
+                                ('\ufeffcaf\u00e9'.encode('utf-8'), True, 'UTF-8-SIG'),
+                                ('caf\u00e9'.encode('utf-16'), True, 'UTF-16'),
+                                ('caf\u00e9'.encode('utf-32'), True, 'UTF-32'),
+                            ]
+                        )
+def test_detectEncoding(sample, complete, expected_result):
+    assert detectEncoding(sample, complete) == expected_result
+
+@pytest.mark.filehandlers
+def test_getEncoding_reads_sample(tmp_path):
+    # Only the sample is used, so the Latin-1 character at the end doesn't change the result
+    testFile=tmp_path / 'sample.txt'
+    testFile.write_bytes(b'4111 1111 1111 1111\n' * 1000 + b'caf\xe9\n')
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+
+    assert getEncoding(str(testFile), logManager, sampleBytes=4096) == 'utf-8'
+    assert getEncoding(str(testFile), logManager) == 'ISO-8859-1'
+
+    # [performance]encodingSampleBytes
+    setSampleBytes(4096)
+    try:
+        assert getEncoding(str(testFile), logManager) == 'utf-8'
+    finally:
+        setSampleBytes(encodingSampleBytes)
+
+@pytest.mark.utils
+def test_invalid_encoding_sample_bytes(tmp_path):
+    configFile=tmp_path / 'piidigger.toml'
+    assert globalfuncs.writeDefaultConfig(str(configFile)) == 'Success'
+    configFile.write_text(configFile.read_text().replace('encodingSampleBytes = %d' % encodingSampleBytes, 'encodingSampleBytes = 0'))
+
+    config=classes.Config(configFile=str(configFile))
+
+    assert config.getEncodingSampleBytes() == encodingSampleBytes
+
+@pytest.mark.utils
+@pytest.mark.parametrize('encoding, expected_result', [
+                                ('ascii', True),
+                                ('UTF-8-SIG', True),
+                                ('Windows-1252', True),
+                                ('UTF-16', False),
+                                ('SHIFT_JIS', False),
+                                ('ISO-2022-JP', False),
+                                ('not-an-encoding', False),
+                                (None, False),
+                            ]
+                        )
+def test_isAsciiCompatible(encoding, expected_result):
+    assert getencoding.isAsciiCompatible(encoding) == expected_result
+
+@pytest.mark.utils
+def test_isAsciiCompatible_cached():
+    # Aliases of the same codec are only checked once
+    getencoding._isAsciiCompatible.cache_clear()
+    for encoding in ['Windows-1252', 'cp1252', 'windows_1252'] * 10:
+        assert getencoding.isAsciiCompatible(encoding)
+    assert getencoding._isAsciiCompatible.cache_info().misses == 1
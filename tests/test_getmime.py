@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from piidigger import getmime
+from piidigger.getmime import MimeCache
+
+@pytest.fixture
+def sniffCount(monkeypatch):
+    calls=[]
+    realFromFile=getmime._fromFile
+
+    def countingFromFile(filename):
+        calls.append(filename)
+        return realFromFile(filename)
+
+    monkeypatch.setattr(getmime, '_fromFile', countingFromFile)
+    return calls
+
+@pytest.mark.utils
+def test_mime_cache_sniffs_once(tmp_path, sniffCount):
+    f=tmp_path / 'sample.pdf'
+    f.write_bytes(open('testdata/pdf/lorem-ipsum.pdf', 'rb').read())
+    link=tmp_path / 'hardlink.pdf'
+    os.link(f, link)
+    mimeCache=MimeCache()
+
+    assert mimeCache.getMime(str(f), os.stat(f)) == 'application/pdf'
+    assert mimeCache.getMime(str(link), os.stat(link)) == 'application/pdf'
+    assert len(sniffCount) == 1
+
+@pytest.mark.utils
+def test_mime_cache_persists(tmp_path, sniffCount):
+    f=tmp_path / 'sample.pdf'
+    f.write_bytes(open('testdata/pdf/lorem-ipsum.pdf', 'rb').read())
+    dbFile=str(tmp_path / 'cache' / 'mimecache.db')
+
+    mimeCache=MimeCache(dbFile)
+    mimeCache.getMime(str(f), os.stat(f))
+    mimeCache.close()
+
+    mimeCache=MimeCache(dbFile)
+    assert mimeCache.getMime(str(f), os.stat(f)) == 'application/pdf'
+    mimeCache.close()
+
+    assert len(sniffCount) == 1
+
+@pytest.mark.utils
+def test_mime_cache_invalidated_by_change(tmp_path, sniffCount):
+    f=tmp_path / 'sample.txt'
+    f.write_text('hello')
+    mimeCache=MimeCache()
+
+    mimeCache.getMime(str(f), os.stat(f))
+    f.write_text('hello world')
+    mimeCache.getMime(str(f), os.stat(f))
+
+    assert len(sniffCount) == 2
+
+@pytest.mark.utils
+def test_mime_cache_pruned(tmp_path, sniffCount, monkeypatch):
+    files=list()
+    for i in range(3):
+        f=tmp_path / ('sample%d.txt' % i)
+        f.write_text('hello %d' % i)
+        files.append(f)
+    dbFile=str(tmp_path / 'mimecache.db')
+
+    monkeypatch.setattr(getmime.time, 'time', lambda: 1000)
+    mimeCache=MimeCache(dbFile, maxEntries=3)
+    for f in files:
+        mimeCache.getMime(str(f), os.stat(f))
+    mimeCache.close()
+
+    # The next run uses the first file again and leaves an unused entry behind for the second one, which changed.  Only the two
+    # entries that were used in this run are kept.
+    monkeypatch.setattr(getmime.time, 'time', lambda: 2000)
+    mimeCache=MimeCache(dbFile, maxEntries=2)
+    mimeCache.getMime(str(files[0]), os.stat(files[0]))
+    files[1].write_text('changed again')
+    mimeCache.getMime(str(files[1]), os.stat(files[1]))
+    mimeCache.close()
+
+    mimeCache=MimeCache(dbFile, maxEntries=2)
+    for f in files:
+        mimeCache.getMime(str(f), os.stat(f))
+    mimeCache.close()
+
+    assert sniffCount == [str(f) for f in files] + [str(files[1]), str(files[2])]
@@ -0,0 +1,94 @@
+import logging
+import multiprocessing as mp
+from queue import Queue
+
+import pytest
+
+from piidigger import globalfuncs
+from piidigger import piidigger
+from piidigger.datahandlers import email, pan
+from piidigger.globalvars import SENTINEL
+from piidigger.logmanager import LogManager
+from piidigger.outputhandlers import csv
+
+@pytest.mark.utils
+def test_process_matches_max_matches():
+    results={'matches': {}}
+    results=globalfuncs.processMatches(results, {'visa': {'4893 01** **** 6137', '468439******4835'}}, pan.dhName, 3)
+    results=globalfuncs.processMatches(results, {'visa': {'4893 01** **** 6137'}, 'amex': {'3782-82****-*0005', '3714-49****-*8431'}}, pan.dhName, 3)
+    results=globalfuncs.processMatches(results, {'mc': {'5555 55** **** 4444'}}, pan.dhName, 3)
+
+    # Matches that are already there don't count twice, and no brand is added once the limit is reached
+    assert globalfuncs.countMatches(results['matches'][pan.dhName]) == 3
+    assert len(results['matches'][pan.dhName]['visa']) == 2
+    assert 'mc' not in results['matches'][pan.dhName]
+    assert results['truncated'] == {pan.dhName}
+
+@pytest.mark.utils
+@pytest.mark.parametrize('maxMatches, expected_result', [
+                                (0, False),
+                                (1, True),
+                                (2, False),
+                                (3, False),
+                            ]
+                        )
+def test_process_matches_truncated(maxMatches, expected_result):
+    results={'matches': {}}
+    results=globalfuncs.processMatches(results, {'visa': {'4893 01** **** 6137'}}, pan.dhName, maxMatches)
+    results=globalfuncs.processMatches(results, {'visa': {'4893 01** **** 6137'}, 'amex': {'3782-82****-*0005'}}, pan.dhName, maxMatches)
+
+    # Only matches that were left out make the results truncated, not reaching the limit
+    assert (pan.dhName in results.get('truncated', ())) == expected_result
+
+@pytest.mark.unit
+def test_scan_content_stops_at_max_matches():
+    read=list()
+    def readFile():
+        try:
+            for i in range(1000):
+                read.append(i)
+                yield 'lorem 4684399293674835 ipsum 4893 0133 3538 6137 dolor jdoe@example%d.com sit amet' % i
+        finally:
+            read.append('closed')
+
+    results=piidigger.scanContent('big.log', readFile(), [pan, email], logging.getLogger('test'), maxMatches=2)
+
+    # The PANs fill up in the first chunk and the email addresses in the second.  The file isn't read any further once the next chunk
+    # shows that there's more of it.
+    assert results['matches'][pan.dhName] == {'visa': {'468439******4835', '4893 01** **** 6137'}}
+    assert results['matches'][email.dhName] == {'email': {'j***@example0.com', 'j***@example1.com'}}
+    assert read == [0, 1, 2, 'closed']
+    assert results['truncated'] == {email.dhName, pan.dhName}
+
+@pytest.mark.unit
+def test_scan_content_ends_at_max_matches():
+    contents=('lorem 4893 0133 3538 6137 ipsum jdoe@example%d.com' % i for i in range(2))
+    results=piidigger.scanContent('big.log', contents, [pan, email], logging.getLogger('test'), maxMatches=2)
+
+    # Both data handlers reached the limit at the end of the file, so nothing was left out
+    assert globalfuncs.countMatches(results['matches'][email.dhName]) == 2
+    assert 'truncated' not in results
+
+@pytest.mark.unit
+def test_scan_content_without_max_matches():
+    contents=('lorem 4893 0133 3538 6137 ipsum jdoe@example%d.com' % i for i in range(100))
+    results=piidigger.scanContent('big.log', contents, [pan, email], logging.getLogger('test'))
+
+    assert globalfuncs.countMatches(results['matches'][email.dhName]) == 100
+
+@pytest.mark.unit
+@pytest.mark.parametrize('truncatedColumn, expected_result', [
+                                (False, ['filename,datatype,value', 'big.log,Primary Account Number,visa: 4893 01** **** 6137']),
+                                (True, ['filename,datatype,value,truncated', 'big.log,Primary Account Number,visa: 4893 01** **** 6137,True']),
+                            ]
+                        )
+def test_csv_truncated_column(tmp_path, truncatedColumn, expected_result):
+    queue=Queue()
+    queue.put({'filename': 'big.log', 'matches': {pan.dhName: {'visa': ['4893 01** **** 6137']}}, 'truncated': [pan.dhName]})
+    queue.put(SENTINEL)
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=Queue())
+
+    # The column is only there if [performance]maxMatchesPerFile is set, so the results of a scan without a limit don't change
+    csv.processResult(str(tmp_path / 'results.csv'), queue, mp.Event(), logManager, truncatedColumn)
+
+    assert (tmp_path / 'results.csv').read_text().splitlines() == expected_result
@@ -0,0 +1,49 @@
+import pytest
+
+from piidigger import globalfuncs
+from piidigger.datahandlers import email, pan
+from piidigger.filehandlers._sharedfuncs import ContentHandler
+
+@pytest.mark.utils
+@pytest.mark.parametrize('content, overlap, expected_result', [
+                                ('lorem ipsum 4893 0133 3538 6137', 21, 'ipsum 4893 0133 3538 6137'),
+                                ('lorem ipsum 4893 0133 3538 6137', 19, '4893 0133 3538 6137'),
+                                ('lorem ipsum 4893 0133 3538 6137', 14, '0133 3538 6137'),
+                                ('lorem ipsum', 318, 'lorem ipsum'),
+                                ('lorem ipsum', 0, ''),
+                            ]
+                        )
+def test_get_overlap(content, overlap, expected_result):
+    assert globalfuncs.getOverlap(content, overlap) == expected_result
+
+@pytest.mark.utils
+def test_get_max_match_length():
+    assert globalfuncs.getMaxMatchLength([pan, email]) == email.maxMatchLength
+    assert globalfuncs.getMaxMatchLength([]) == 0
+
+@pytest.mark.utils
+@pytest.mark.parametrize('maxContentSize', range(1, 60, 3))
+def test_overlap_finds_matches_across_chunks(maxContentSize):
+    # Wherever the chunks are cut, the PAN and the email address are found once the overlap is added
+    handler=ContentHandler(maxContentSize)
+    chunks=list()
+    for line in ['lorem ipsum dolor 4893 0133', '3538 6137 sit amet jdoe@example.com consectetur']:
+        handler.appendContent(line)
+        if handler.contentBufferFull():
+            chunks.append(handler.getContent())
+    chunks.append(handler.finalizeContent())
+
+    overlap=globalfuncs.getMaxMatchLength([pan, email])
+    results={'matches': {}}
+    carry=''
+    for content in chunks:
+        if carry:
+            content=carry + ' ' + content
+        for handler in [pan, email]:
+            results=globalfuncs.processMatches(results, handler.findMatch(content), handler.dhName)
+        carry=globalfuncs.getOverlap(content, overlap)
+
+    assert results['matches'] == {
+        pan.dhName: {'visa': {'4893 01** **** 6137'}},
+        email.dhName: {'email': {'j***@example.com'}},
+    }
@@ -19,8 +19,63 @@ from piidigger.datahandlers import pan
                             ('3579964259818823', {'jcb': {'357996******8823'}}),
                             ('3559390822709303', {'jcb': {'355939******9303'}}),
                             ('3578488152861707', {'jcb': {'357848******1707'}}),
+                            ('213100000000001', {'jcb': {'213100*****0001'}}),
+                            ('6011111111111117', {'discover': {'601111******1117'}}),
+                            ('5105 1051 0510 5100', {'mc': {'5105 10** **** 5100'}}),
+                            ('4893 0133 3538 6137 3782-822463-10005', {'visa': {'4893 01** **** 6137'}, 'amex': {'3782-82****-*0005'}}),
+                            ('4893 0133 3538 6137,4684399293674835', {'visa': {'4893 01** **** 6137,', ',468439******4835'}}),
+                            ('1111 4684 3992 9367 4835', {'visa': {'4684 39** **** 4835'}}),
+                            ('4893-0133-3538-6137-4684', {}),
                           ]
                   )
 def testIsValidPan(data, expected_result):
     result = pan.findMatch(data)
-    assert result == expected_result
\ No newline at end of file
+    assert result == expected_result
+
+@pytest.mark.datahandlers
+def testFindMatchEveryPanOfABrand():
+    # Up to version 1.2.1, each brand's results were reset for every match, so only the last PAN of each brand in the text was reported
+    data='visa 4893 0133 3538 6137 then 4684399293674835 and 4556-7375-8689-9855, amex 3782-822463-10005 or 371449635398431'
+    expected_result={
+        'visa': {'4893 01** **** 6137', '468439******4835', '4556-73**-****-9855,'},
+        'amex': {'3782-82****-*0005', '371449*****8431'},
+    }
+
+    assert pan.findMatch(data) == expected_result
+    assert pan.findMatchBytes(data.encode('ascii')) == expected_result
+
+@pytest.mark.datahandlers
+@pytest.mark.parametrize('data, expected_result', [
+                            (b'4893 0133 3538 6137', {'visa': {'4893 01** **** 6137'}}),
+                            (b'4893\r\n0133  3538\t6137', {'visa': {'4893 01** **** 6137'}}),
+                            (b'3782-822463-10005,\n371449635398431', {'amex': {'3782-82****-*0005,', '371449*****8431'}}),
+                            (b'4012001037140001514E100010003220121800000011150', {}),
+                            (b'4893 -0133 3538 6137', {}),
+                            (b'4893 0133 3538 6137,4684399293674835', {'visa': {'4893 01** **** 6137,', ',468439******4835'}}),
+                          ]
+                  )
+def testFindMatchBytes(data, expected_result):
+    # Whitespace in the raw bytes counts as a single space, as it does in the text from the file handlers
+    result = pan.findMatchBytes(data)
+    assert result == expected_result
+
+@pytest.mark.datahandlers
+def testFindMatchBytesDecodesWholeCharacters():
+    data='caf\u00e94893 0133 3538 6137\u00e9'.encode('utf-8')
+    decode=lambda s, e: data[max(s - 1, 0):e + 1].decode('utf-8')
+
+    assert pan.findMatchBytes(data, decode=decode) == pan.findMatch(data.decode('utf-8')) == {'visa': {'\u00e94893 01** **** 6137\u00e9'}}
+
+@pytest.mark.datahandlers
+@pytest.mark.parametrize('withNumpy', [True, False])
+def testIsValidBatch(monkeypatch, withNumpy):
+    if withNumpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(pan, 'numpy', None)
+    texts=['4893 0133 3538 6137', '4098724854267035', ',468439929367483', '3782-822463-10005,', '371449635398431', '345606077182423'] * 20
+    expected=[True, False, False, True, True, False] * 20
+
+    assert pan._isValidBatch(texts) == expected
+    assert pan._isValidBatch(texts[:6]) == expected[:6]
+    assert pan._isValidBatch([]) == []
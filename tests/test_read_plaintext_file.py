@@ -2,6 +2,10 @@ from queue import Queue
 
 import pytest
 
+from piidigger import classes
+from piidigger import globalfuncs
+from piidigger.datahandlers import email, pan
+from piidigger.filehandlers._sharedfuncs import ContentHandler
 from piidigger.filehandlers import plaintext
 from piidigger.queuefuncs import clearQ
 from piidigger.logmanager import LogManager
@@ -74,4 +78,193 @@ def test_read_plaintext_file(filename, expected_result):
 
     assert result == expected_result
 
-    
\ No newline at end of file
+    
+
+@pytest.mark.filehandlers
+@pytest.mark.parametrize('blockSize', [64, 4096, 1_048_576])
+def test_read_plaintext_blocks(tmp_path, monkeypatch, blockSize):
+    # Reading in blocks has to give the same chunks as reading line by line, wherever the blocks happen to end (even between "\r" and "\n")
+    f=tmp_path / 'blocks.log'
+    f.write_bytes(b''.join(b'line %d caf\xc3\xa9 4111 1111 1111 1111\r\n' % i + b'x' * (i % 7) + b'\n' for i in range(5000)))
+    logQ = Queue()
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=logQ)
+
+    handler=ContentHandler(maxContentSize=1300)
+    expected=list()
+    for line in f.read_text(encoding='utf-8').splitlines(keepends=True):
+        handler.appendContent(line)
+        if handler.contentBufferFull():
+            expected.append(handler.getContent())
+    expected.append(handler.finalizeContent())
+
+    monkeypatch.setattr(plaintext, '_BLOCKSIZE', blockSize)
+    result=list(plaintext.readFile(str(f), logManager, 2))
+
+    clearQ(logQ)
+
+    assert result == expected
+
+@pytest.mark.filehandlers
+@pytest.mark.parametrize('rangeBytes', [1000, 65_536, 300_000])
+def test_read_plaintext_ranges(rangeBytes):
+    # Without the overlap, the byte ranges should return exactly the same words as reading the whole file
+    filename='testdata/plaintext/lorem-ipsum-700kb-utf8-crlf.txt'
+    logQ = Queue()
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=logQ)
+
+    expected=' '.join(plaintext.readFile(filename, logManager, 2)).split()
+
+    fileRanges=plaintext.splitFile(classes.File(filename, None), rangeBytes, logManager)
+    result=list()
+    for fileRange in fileRanges:
+        fileRange.overlap=0
+        result.extend(' '.join(plaintext.readRange(fileRange, logManager, 2)).split())
+
+    clearQ(logQ)
+
+    assert len(fileRanges) > 1
+    assert sum(fileRange.getRangeSize() for fileRange in fileRanges) == len(open(filename, 'rb').read())
+    assert result == expected
+
+@pytest.mark.filehandlers
+def test_read_plaintext_range_seam(tmp_path):
+    # The range boundary falls between the groups of the PAN.  The first part has to read past its end to find it.
+    f=tmp_path / 'seam.log'
+    f.write_text('lorem ' * 200 + '4893 0133 3538 6137 ' + 'ipsum ' * 200)
+    logQ = Queue()
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=logQ)
+
+    fileRanges=plaintext.splitFile(classes.File(str(f), None), 1205, logManager)
+    result=[pan.findMatch(' '.join(plaintext.readRange(fileRange, logManager))) for fileRange in fileRanges]
+
+    clearQ(logQ)
+
+    assert result[0] == {'visa': {'4893 01** **** 6137'}}
+    assert all(r == {} for r in result[1:])
+
+@pytest.mark.utils
+@pytest.mark.parametrize('setting, value', [
+                            ('splitRangeBytes', 0),
+                            ('splitFileBytes', -1),
+                          ]
+                  )
+def test_invalid_split_settings(tmp_path, setting, value):
+    # splitFile divides the file size by splitRangeBytes
+    configFile=tmp_path / 'piidigger.toml'
+    assert globalfuncs.writeDefaultConfig(str(configFile)) == 'Success'
+    defaultValue=globalfuncs.getDefaultConfig()['performance'][setting]
+    configFile.write_text(configFile.read_text().replace('%s = %d' % (setting, defaultValue), '%s = %d' % (setting, value)))
+
+    config=classes.Config(configFile=str(configFile))
+
+    assert config.getConfig()['performance'][setting] == defaultValue
+
+@pytest.mark.filehandlers
+@pytest.mark.parametrize('filename', [
+                            'testdata/plaintext/lorem-ipsum-1line-with-blank-ending-line-utf16le-crlf.txt',
+                            'testdata/plaintext/random-data-700-bytes.txt',
+                          ]
+                  )
+def test_read_plaintext_not_split(filename):
+    # UTF-16 can't be split on whitespace bytes and files smaller than one range aren't worth splitting
+    logQ = Queue()
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=logQ)
+
+    result=plaintext.splitFile(classes.File(filename, None), 1000, logManager)
+
+    clearQ(logQ)
+
+    assert result == []
+
+@pytest.mark.filehandlers
+@pytest.mark.parametrize('windowBytes', [100, 4096, 16_777_216])
+def test_map_plaintext_windows(tmp_path, windowBytes):
+    # Every match is found, including the ones that cross from one window into the next
+    f=tmp_path / 'windows.log'
+    f.write_text(''.join('line %d caf\u00e9 4893 0133 3538 %04d user%d@example.com\r\n' % (i, i, i) for i in range(2000)), encoding='utf-8')
+    logQ = Queue()
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=logQ)
+
+    expected={'pan': {}, 'email': {}}
+    for i in range(2000):
+        for brand, matches in pan.findMatch('4893 0133 3538 %04d' % i).items():
+            expected['pan'].setdefault(brand, set()).update(matches)
+        expected['email'].setdefault('email', set()).update(email.findMatch('user%d@example.com' % i)['email'])
+
+    result={'pan': {}, 'email': {}}
+    mappedText=plaintext.mapFile(str(f), logManager)
+    mappedText.windowBytes=windowBytes
+    mappedText.overlap=min(windowBytes, 4096)
+    with mappedText:
+        for start, end in mappedText.windows():
+            for brand, matches in pan.findMatchBytes(mappedText.buffer, start, end, mappedText.decode).items():
+                result['pan'].setdefault(brand, set()).update(matches)
+            for brand, matches in email.findMatchBytes(mappedText.buffer, start, end, mappedText.decode).items():
+                result['email'].setdefault(brand, set()).update(matches)
+
+    clearQ(logQ)
+
+    assert mappedText.encoding == 'utf-8'
+    assert result['pan'] and result['email']
+    assert result == expected
+
+@pytest.mark.filehandlers
+def test_map_plaintext_range(tmp_path):
+    # Each part of a split file is mapped from the whitespace at its start to the whitespace after its overlap
+    f=tmp_path / 'seam.log'
+    f.write_text('lorem ' * 200 + '4893 0133 3538 6137 ' + 'ipsum ' * 200)
+    logQ = Queue()
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=logQ)
+
+    result=list()
+    for fileRange in plaintext.splitFile(classes.File(str(f), None), 1205, logManager):
+        with plaintext.mapFile(str(f), logManager, fileRange) as mappedText:
+            result.append(pan.findMatchBytes(mappedText.buffer, mappedText.start, mappedText.end, mappedText.decode))
+
+    clearQ(logQ)
+
+    assert result[0] == {'visa': {'4893 01** **** 6137'}}
+    assert all(r == {} for r in result[1:])
+
+@pytest.mark.filehandlers
+@pytest.mark.parametrize('filename', [
+                            'testdata/plaintext/lorem-ipsum-1line-with-blank-ending-line-utf16le-crlf.txt',
+                            'testdata/plaintext/zero-byte-file.txt',
+                            'testdata/plaintext/does-not-exist.txt',
+                          ]
+                  )
+def test_map_plaintext_not_mapped(filename):
+    # UTF-16 isn't ASCII-compatible, and empty or missing files can't be mapped.  These are read with readFile instead.
+    logQ = Queue()
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=logQ)
+
+    result=plaintext.mapFile(filename, logManager)
+
+    clearQ(logQ)
+
+    assert result is None
+
+@pytest.mark.filehandlers
+def test_encoding_detected_once(monkeypatch):
+    # A UTF-16 file can't be split or mapped, but the encoding that splitFile found is used by mapFile and readFile
+    filename='testdata/plaintext/lorem-ipsum-1line-with-blank-ending-line-utf16le-crlf.txt'
+    logQ = Queue()
+    logManager=LogManager(logFile='test.log', logLevel='INFO', logQueue=logQ)
+    expected=list(plaintext.readFile(filename, logManager))
+
+    detected=list()
+    realGetEncoding=plaintext.getEncoding
+    realReadSample=plaintext.readSample
+    monkeypatch.setattr(plaintext, 'getEncoding', lambda *args, **kwargs: detected.append('getEncoding') or realGetEncoding(*args, **kwargs))
+    monkeypatch.setattr(plaintext, 'readSample', lambda *args, **kwargs: detected.append('readSample') or realReadSample(*args, **kwargs))
+    fObj=classes.File(filename, 'text/plain')
+
+    assert plaintext.splitFile(fObj, 16, logManager) == []
+    assert plaintext.mapFile(filename, logManager, None, fObj) is None
+    result=list(plaintext.readFile(filename, logManager, encoding=fObj.getEncoding()))
+
+    clearQ(logQ)
+
+    assert detected == ['getEncoding']
+    assert fObj.getEncoding() == 'UTF-16'
+    assert result == expected
@@ -0,0 +1,160 @@
+from types import SimpleNamespace
+
+import pytest
+
+from piidigger import globalfuncs
+from piidigger import scanengine
+from piidigger.datahandlers import email, pan
+
+filler='lorem ipsum 12:34 10.0.0.1 2024-01-31 dolor sit amet '
+
+@pytest.fixture(params=[True, False], ids=['numpy', 'python'])
+def withNumpy(request, monkeypatch):
+    if request.param:
+        pytest.importorskip('numpy')
+        # Small blocks, so that runs cross from one block into the next
+        monkeypatch.setattr(scanengine, '_BLOCKSIZE', 1000)
+    else:
+        monkeypatch.setattr(scanengine, 'numpy', None)
+    return request.param
+
+@pytest.mark.unit
+def test_find_windows(withNumpy):
+    data=(filler * 1000 + '4893 0133 3538 6137 ' + filler * 1000 + 'jdoe@example.com ' + '3782-822463-10005' + ' ' * 2000 + filler * 1000
+          + '4684399293674835\n' + '4893 ' * 400 + '0133 3538 6137')
+    panWindows, emailWindows, wholeWindows=scanengine.findWindows(data, 0, len(data), (pan.prefilter, email.prefilter, None))
+
+    # The last PAN and the long run after it are in the same window
+    assert len(panWindows) == 3
+    assert sum(windowEnd - windowStart for windowStart, windowEnd in panWindows) < len(data) // 10
+    # Each run of digits and separators, plus the character after it
+    assert panWindows[0] == (data.index(' 4893'), data.index('4893 0133') + len('4893 0133 3538 6137 ') + 1)
+    # Just the word that the "@" is in
+    assert emailWindows == [(data.index('jdoe@'), data.index(' 3782'))]
+    assert wholeWindows == [(0, len(data))]
+
+@pytest.mark.unit
+def test_find_windows_runs(withNumpy):
+    # A run needs minAnchors digits, not just minAnchors characters, and a run that's cut off by the end of the text still counts
+    data=filler * 2000 + '4893 0133 353 61 ' + filler + '12-34-56-78-90-12-34 ' + filler + '4893 0133 3538 6137'
+    runStart=data.rindex(' 4893')
+
+    assert scanengine.findWindows(data, 0, len(data), (pan.prefilter,)) == [[(runStart, len(data))]]
+    assert scanengine.findWindows(data.encode('ascii'), 0, len(data), (pan.prefilter,)) == [[(runStart, len(data))]]
+    assert scanengine.findWindows(data, 0, len(data) - 2, (pan.prefilter,)) == [[]]
+
+@pytest.mark.unit
+def test_find_runs_python(monkeypatch):
+    monkeypatch.setattr(scanengine, 'numpy', None)
+    data=filler * 2000 + '4893 0133 3538 6137 lorem 4684399293674835 ' + filler * 2000
+
+    # Runs that are close together share a window
+    assert scanengine.findWindows(data, 0, len(data), (pan.prefilter,)) == [[(data.index(' 4893'), data.index('4835 ') + 6)]]
+
+    # Text that's full of card numbers isn't worth prefiltering
+    data='4893 0133 3538 6137 lorem ' * 10_000
+    assert scanengine.findWindows(data, 0, len(data), (pan.prefilter,)) == [[(0, len(data))]]
+
+@pytest.mark.unit
+def test_find_windows_merges_anchors(withNumpy):
+    data=filler * 2000 + 'a@b.co c@d.co ' + filler * 10 + 'e@f.co'
+    positions=[i for i, ch in enumerate(data) if ch == '@']
+    wide=scanengine.Prefilter(anchors='@', span=email.maxMatchLength)
+
+    assert scanengine.findWindows(data, 0, len(data), (wide,)) == [[(positions[0] - email.maxMatchLength, len(data))]]
+    assert scanengine.findWindows(data, 0, positions[0], (wide,)) == [[]]
+
+@pytest.mark.unit
+def test_find_windows_stops(withNumpy):
+    # Away from the start of a block, where a stop in the previous block isn't looked for and the window can be wider
+    data=filler * 2000 + 'lorem a@b.co c@d.co\te@f.co@g.co ' + 'x' * 400 + 'h@i.co' + 'y' * 400 + ' ' + filler * 2000
+    positions=[i for i, ch in enumerate(data) if ch == '@']
+    span=email.maxMatchLength
+
+    if withNumpy:
+        assert scanengine.findWindows(data, 0, len(data), (email.prefilter,)) == [[
+            (positions[0] - 1, positions[0] + 5),
+            (positions[1] - 1, positions[1] + 5),
+            # Anchors in the same word share a window
+            (positions[2] - 1, positions[3] + 5),
+            # A word that's longer than the span is still cut short at the span
+            (positions[4] - span, positions[4] + span + 1),
+        ]]
+    else:
+        # Anchors within the span of each other share a window, which is only cut short at its ends
+        assert scanengine.findWindows(data, 0, len(data), (email.prefilter,)) == [[(positions[0] - 1, positions[4] + span + 1)]]
+    # The ends of the buffer stop a window too
+    assert scanengine.findWindows(data, positions[0] + 3, positions[0] + 5, (email.prefilter,)) == [[]]
+    assert scanengine.findWindows(data, positions[0], positions[0] + 3, (email.prefilter,)) == [[(positions[0], positions[0] + 3)]]
+
+@pytest.mark.unit
+def test_find_matches(withNumpy):
+    data=(filler * 1000 + '4893 0133 3538 6137 ' + filler * 1000 + 'jdoe@example.com ' + '3782-822463-10005' + ' ' * 2000 + filler * 1000
+          + '4684399293674835\n' + '4893 ' * 400 + '0133 3538 6137')
+    expected={
+        pan.dhName: {'visa': {'4893 01** **** 6137', '468439******4835'}, 'amex': {'3782-82****-*0005'}},
+        email.dhName: {'email': {'j***@example.com'}},
+    }
+
+    assert scanengine.findMatches(data, [pan, email]) == expected
+    assert scanengine.findMatchesBytes(data.encode('ascii'), 0, len(data), None, [pan, email]) == expected
+    assert {handler.dhName: handler.findMatch(data) for handler in [pan, email]} == expected
+
+@pytest.mark.unit
+def test_find_matches_skips_handlers():
+    # A data handler isn't called at all if there's nothing for it to look at
+    assert scanengine.findMatches(filler * 10, [pan, email]) == {}
+    assert scanengine.findMatches('', [pan, email]) == {}
+
+@pytest.mark.unit
+def test_match_cache():
+    cache=scanengine.MatchCache(maxSize=2)
+    cache.put('jdoe@example.com', 'j***@example.com')
+    cache.put('a@b', '')
+
+    assert cache.get('jdoe@example.com') == 'j***@example.com'
+    assert cache.get('a@b') == ''
+    assert cache.get('x@y.co') is None
+    # The least recently used match is dropped to make room
+    cache.put('x@y.co', '*@y.co')
+    assert len(cache) == 2
+    assert cache.get('jdoe@example.com') is None
+    assert cache.get('a@b') == ''
+    assert (cache.hits, cache.misses) == (3, 2)
+
+@pytest.mark.unit
+def test_match_cache_repeated_matches(monkeypatch):
+    for handler in [pan, email]:
+        monkeypatch.setattr(handler, 'matchCache', scanengine.MatchCache())
+    data='lorem 4893 0133 3538 6137 ipsum jdoe@example.com a@b.c\n' * 100
+    expected={
+        pan.dhName: {'visa': {'4893 01** **** 6137'}},
+        email.dhName: {'email': {'j***@example.com'}},
+    }
+
+    assert scanengine.findMatches(data, [pan, email]) == expected
+    assert scanengine.findMatches(data, [pan, email]) == expected
+    # PAN matches are checked once per chunk, email matches every time they're found.  Invalid ones are remembered too.
+    assert (pan.matchCache.hits, pan.matchCache.misses) == (1, 1)
+    assert (email.matchCache.hits, email.matchCache.misses) == (398, 2)
+
+@pytest.mark.unit
+@pytest.mark.parametrize('data, expected_result', [
+                                ('lorem ipsum dolor sit amet', [False, False]),
+                                ('lorem ipsum 1 dolor sit amet', [True, False]),
+                                ('lorem @ ipsum 1 dolor sit amet', [True, True]),
+                                ('1@b.co', [False, True]),
+                                ('1@b.c', [False, False]),
+                            ]
+                        )
+def test_might_match(data, expected_result):
+    assert [scanengine.mightMatch(data, 0, len(data), handler) for handler in [pan, email]] == expected_result
+    assert [scanengine.mightMatch(data.encode('ascii'), 0, len(data), handler) for handler in [pan, email]] == expected_result
+
+@pytest.mark.unit
+def test_data_handlers_for_file():
+    docsOnly=SimpleNamespace(dhName='Docs only', findMatch=lambda line: {}, fileHandlers=['docx', 'pdf'])
+
+    assert globalfuncs.getDataHandlersForFile([pan, email, docsOnly], 'plaintext') == [pan, email]
+    assert globalfuncs.getDataHandlersForFile([pan, email, docsOnly], 'pdf') == [pan, email, docsOnly]
+    assert globalfuncs.getSupportedDataHandlerNames() == ['email', 'pan']
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from piidigger.scanindex import ScanIndex, getFingerprint
+
+matches={'Primary Account Number': {'visa': ['4893 01** **** 6137']}}
+
+@pytest.fixture
+def indexedFile(tmp_path):
+    f=tmp_path / 'sample.txt'
+    f.write_text('4893 0133 3538 6137')
+    fStat=os.stat(f)
+    dbFile=str(tmp_path / 'logs' / 'scanindex.db')
+
+    scanIndex=ScanIndex(dbFile, getFingerprint(['pan']), readOnly=False)
+    scanIndex.store(str(f), (fStat.st_size, fStat.st_mtime_ns, fStat.st_ino), matches)
+    scanIndex.store(str(f) + '.truncated', (fStat.st_size, fStat.st_mtime_ns, fStat.st_ino), matches, ['Primary Account Number'])
+    scanIndex.close()
+
+    return f, dbFile
+
+@pytest.mark.utils
+def test_scan_index_unchanged(indexedFile):
+    f, dbFile=indexedFile
+    scanIndex=ScanIndex(dbFile, getFingerprint(['pan']))
+
+    assert scanIndex.lookup(str(f), os.stat(f)) == (matches, [])
+    assert scanIndex.lookup(str(f) + '.truncated', os.stat(f)) == (matches, ['Primary Account Number'])
+    assert scanIndex.lookup(str(f) + '.missing', os.stat(f)) is None
+    scanIndex.close()
+
+@pytest.mark.utils
+def test_scan_index_changed_file(indexedFile):
+    f, dbFile=indexedFile
+    f.write_text('nothing to see here')
+    scanIndex=ScanIndex(dbFile, getFingerprint(['pan']))
+
+    assert scanIndex.lookup(str(f), os.stat(f)) is None
+    scanIndex.close()
+
+@pytest.mark.utils
+def test_scan_index_different_settings(indexedFile):
+    f, dbFile=indexedFile
+    fingerprint=getFingerprint(['pan', 'email'])
+
+    scanIndex=ScanIndex(dbFile, fingerprint)
+    assert scanIndex.lookup(str(f), os.stat(f)) is None
+    scanIndex.close()
+
+    # Opening the index for writing with the new settings throws away the old results
+    ScanIndex(dbFile, fingerprint, readOnly=False).close()
+    ScanIndex(dbFile, getFingerprint(['pan']), readOnly=False).close()
+    scanIndex=ScanIndex(dbFile, getFingerprint(['pan']))
+    assert scanIndex.lookup(str(f), os.stat(f)) is None
+    scanIndex.close()
+
+@pytest.mark.utils
+def test_scan_index_different_max_matches(indexedFile):
+    f, dbFile=indexedFile
+
+    # The stored results may have been cut short by a different limit
+    scanIndex=ScanIndex(dbFile, getFingerprint(['pan'], 10))
+    assert scanIndex.lookup(str(f), os.stat(f)) is None
+    scanIndex.close()
+
+@pytest.mark.utils
+def test_scan_index_first_run(tmp_path):
+    scanIndex=ScanIndex(str(tmp_path / 'scanindex.db'), getFingerprint(['pan']))
+
+    assert scanIndex.lookup(str(tmp_path), os.stat(tmp_path)) is None
+    assert not (tmp_path / 'scanindex.db').exists()
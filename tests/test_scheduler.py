@@ -0,0 +1,53 @@
+import heapq
+
+import pytest
+
+from piidigger import classes
+from piidigger import globalfuncs
+from piidigger.scheduler import makeBatch
+
+class FakeFile:
+    def __init__(self, name: str, size: int):
+        self.name=name
+        self.size=size
+
+    def getFileSize(self):
+        return self.size
+
+@pytest.mark.unit
+@pytest.mark.parametrize('sizes, batchSize, batchBytes, expected_result', [
+                            ([10, 500, 20, 30], 10, 1000, [['500', '30', '20', '10']]),
+                            ([10, 500, 20, 30], 2, 1000, [['500', '30'], ['20', '10']]),
+                            ([10, 5000, 20, 3000], 10, 1000, [['5000'], ['3000'], ['20', '10']]),
+                            ([], 10, 1000, []),
+                          ]
+                  )
+def test_make_batch(sizes, batchSize, batchBytes, expected_result):
+    heap=list()
+    for seq, size in enumerate(sizes):
+        heapq.heappush(heap, (-size, seq, FakeFile(str(size), size)))
+
+    result=list()
+    while heap:
+        result.append([f.name for f in makeBatch(heap, batchSize, batchBytes)])
+
+    assert result == expected_result
+
+@pytest.mark.utils
+@pytest.mark.parametrize('setting, value', [
+                                ('filesBatchSize', 0),
+                                ('scheduleBatchBytes', 0),
+                                ('scheduleBatchBytes', -1),
+                                ('discoveryProcs', -1),
+                                ('filesBatchSize', '"100"'),
+                            ]
+                        )
+def test_invalid_batch_settings(tmp_path, setting, value):
+    configFile=tmp_path / 'piidigger.toml'
+    assert globalfuncs.writeDefaultConfig(str(configFile)) == 'Success'
+    defaultValue=globalfuncs.getDefaultConfig()['performance'][setting]
+    configFile.write_text(configFile.read_text().replace('%s = %d' % (setting, defaultValue), '%s = %s' % (setting, value)))
+
+    config=classes.Config(configFile=str(configFile))
+
+    assert config.getConfig()['performance'][setting] == defaultValue
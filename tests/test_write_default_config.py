@@ -34,5 +34,22 @@ def test_write_default_config():
     assert savedConfig['excludeDirs']['windows'] == expectedConfig['excludeDirs']['windows']
     assert savedConfig['excludeDirs']['darwin'] == expectedConfig['excludeDirs']['darwin']
     assert savedConfig['excludeDirs']['linux'] == expectedConfig['excludeDirs']['linux']
+    assert savedConfig['performance']['checkpointFile'] == expectedConfig['performance']['checkpointFile']
+    assert savedConfig['performance']['checkpointInterval'] == expectedConfig['performance']['checkpointInterval']
+    assert savedConfig['performance']['chunkAutoTune'] == expectedConfig['performance']['chunkAutoTune']
+    assert savedConfig['performance']['chunkCount'] == expectedConfig['performance']['chunkCount']
+    assert savedConfig['performance']['chunkSize'] == expectedConfig['performance']['chunkSize']
+    assert savedConfig['performance']['dedup'] == expectedConfig['performance']['dedup']
+    assert savedConfig['performance']['dedupMinBytes'] == expectedConfig['performance']['dedupMinBytes']
+    assert savedConfig['performance']['discoveryProcs'] == expectedConfig['performance']['discoveryProcs']
+    assert savedConfig['performance']['encodingSampleBytes'] == expectedConfig['performance']['encodingSampleBytes']
+    assert savedConfig['performance']['filesBatchSize'] == expectedConfig['performance']['filesBatchSize']
+    assert savedConfig['performance']['maxMatchesPerFile'] == expectedConfig['performance']['maxMatchesPerFile']
+    assert savedConfig['performance']['mimeCacheFile'] == expectedConfig['performance']['mimeCacheFile']
+    assert savedConfig['performance']['scanIndexFile'] == expectedConfig['performance']['scanIndexFile']
+    assert savedConfig['performance']['schedule'] == expectedConfig['performance']['schedule']
+    assert savedConfig['performance']['scheduleBatchBytes'] == expectedConfig['performance']['scheduleBatchBytes']
+    assert savedConfig['performance']['splitFileBytes'] == expectedConfig['performance']['splitFileBytes']
+    assert savedConfig['performance']['splitRangeBytes'] == expectedConfig['performance']['splitRangeBytes']
     assert savedConfig['logging']['logLevel'] == expectedConfig['logging']['logLevel']
     assert savedConfig['logging']['logFile'] == expectedConfig['logging']['logFile']
\ No newline at end of file